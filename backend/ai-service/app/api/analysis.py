@@ -1,15 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
-from ..services.parser_service import ParserService
+import numpy as np
+
+from ..config import get_settings
+from ..services.concurrency import Deadline, DeadlineExceeded, Timings, fan_out
+from ..services.food_database import NUTRIENT_COLUMNS
+from ..services.parser_service import parser_service
 from ..services.supabase_service import supabase_service
 from ..models.nutrition import FoodItem, ExerciseItem
 from ..middleware.auth import auth_bearer, get_current_user_id
 
 router = APIRouter()
 
+class LogError(BaseModel):
+    index: int  # position of the item in its foods/exercises list
+    entry: Optional[int] = None  # batch entry the item belongs to
+    error: str
+
 class FoodAnalysisRequest(BaseModel):
     text: str  # e.g., "I ate an apple and two slices of bread"
     
@@ -18,6 +28,8 @@ class FoodAnalysisResponse(BaseModel):
     total_calories: float
     total_macros: dict
     suggestions: List[str]
+    logged_count: int = 0
+    log_errors: List[LogError] = []
 
 class ExerciseAnalysisRequest(BaseModel):
     text: str  # e.g., "I ran for 30 minutes and did 20 push-ups"
@@ -27,6 +39,93 @@ class ExerciseAnalysisResponse(BaseModel):
     exercises: List[ExerciseItem]
     total_calories_burned: float
     suggestions: List[str]
+    logged_count: int = 0
+    log_errors: List[LogError] = []
+
+# Largest offline sync accepted in one batch request
+MAX_BATCH_ENTRIES = 200
+
+class FoodBatchEntry(BaseModel):
+    text: str
+    logged_at: Optional[str] = None  # ISO timestamp of an entry made offline
+
+class FoodBatchRequest(BaseModel):
+    entries: List[FoodBatchEntry]
+
+class FoodBatchResult(BaseModel):
+    foods: List[FoodItem]
+    total_calories: float
+    total_macros: dict
+
+class FoodBatchResponse(BaseModel):
+    results: List[FoodBatchResult]
+    total_calories: float
+    total_macros: dict
+    suggestions: List[str]
+    logged_count: int
+    log_errors: List[LogError] = []
+
+class ExerciseBatchEntry(BaseModel):
+    text: str
+    user_weight: Optional[float] = None  # kg; falls back to the request's user_weight
+    logged_at: Optional[str] = None
+
+class ExerciseBatchRequest(BaseModel):
+    entries: List[ExerciseBatchEntry]
+    user_weight: Optional[float] = None  # kg
+
+class ExerciseBatchResult(BaseModel):
+    exercises: List[ExerciseItem]
+    total_calories_burned: float
+
+class ExerciseBatchResponse(BaseModel):
+    results: List[ExerciseBatchResult]
+    total_calories_burned: float
+    suggestions: List[str]
+    logged_count: int
+    log_errors: List[LogError] = []
+
+def _macros(totals: np.ndarray) -> dict:
+    """Macro dict from a nutrient totals vector ordered as NUTRIENT_COLUMNS"""
+    return {column: round(float(value), 1) for column, value in zip(NUTRIENT_COLUMNS, totals) if column != "calories"}
+
+def _check_batch_size(count: int):
+    if count > MAX_BATCH_ENTRIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ENTRIES} entries per batch")
+
+def _nutrition_row(description: str, food: FoodItem, logged_at: Optional[str] = None) -> dict:
+    row = {
+        "description": description,
+        "food_name": food.name,
+        "quantity": food.quantity,
+        "unit": food.unit,
+        "calories": food.calories,
+        "protein": food.protein,
+        "carbs": food.carbs,
+        "fat": food.fat,
+        "fiber": food.fiber,
+        "meal_type": food.meal_type
+    }
+    if logged_at:
+        row["logged_at"] = logged_at
+    return row
+
+def _exercise_row(description: str, exercise: ExerciseItem, logged_at: Optional[str] = None) -> dict:
+    row = {
+        "description": description,
+        "exercise_name": exercise.name,
+        "duration_minutes": exercise.duration_minutes,
+        "intensity": exercise.intensity,
+        "calories_burned": exercise.calories_burned,
+        "exercise_type": exercise.exercise_type
+    }
+    if logged_at:
+        row["logged_at"] = logged_at
+    return row
+
+def _batch_log_errors(errors: List[dict], origins: List[tuple]) -> List[LogError]:
+    """Map bulk-insert row errors back to (entry, item) positions"""
+    return [LogError(entry=origins[error["index"]][0], index=origins[error["index"]][1], error=error["error"]) for error in errors]
 
 @router.post("/food", response_model=FoodAnalysisResponse, dependencies=[Depends(auth_bearer)])
 async def analyze_food(request: FoodAnalysisRequest, req: Request):
@@ -34,10 +133,10 @@ async def analyze_food(request: FoodAnalysisRequest, req: Request):
     Analyze food intake from natural language description
     """
     try:
-        parser_service = ParserService()
+        user_id = get_current_user_id(req)
         
         # Parse food items
-        foods = await parser_service.parse_food_description(request.text)
+        foods = await parser_service.parse_food_description(request.text, user_id=user_id)
         
         # Calculate totals
         total_calories = sum(food.calories for food in foods)
@@ -51,28 +150,19 @@ async def analyze_food(request: FoodAnalysisRequest, req: Request):
         # Generate suggestions
         suggestions = parser_service.generate_food_suggestions(foods, total_macros)
         
-        # Store in database
-        user_id = get_current_user_id(req)
-        for food in foods:
-            nutrition_data = {
-                "description": request.text,
-                "food_name": food.name,
-                "quantity": food.quantity,
-                "unit": food.unit,
-                "calories": food.calories,
-                "protein": food.protein,
-                "carbs": food.carbs,
-                "fat": food.fat,
-                "fiber": food.fiber,
-                "meal_type": food.meal_type
-            }
-            await supabase_service.log_nutrition(user_id, nutrition_data)
+        # Store in database with one round-trip
+        logged = await supabase_service.log_nutrition_bulk(
+            user_id,
+            [_nutrition_row(request.text, food) for food in foods]
+        )
         
         return FoodAnalysisResponse(
             foods=foods,
             total_calories=total_calories,
             total_macros=total_macros,
-            suggestions=suggestions
+            suggestions=suggestions,
+            logged_count=len(logged.rows),
+            log_errors=[LogError(**error) for error in logged.errors]
         )
         
     except Exception as e:
@@ -84,12 +174,13 @@ async def analyze_exercise(request: ExerciseAnalysisRequest, req: Request):
     Analyze exercise from natural language description
     """
     try:
-        parser_service = ParserService()
+        user_id = get_current_user_id(req)
         
         # Parse exercise items
         exercises = await parser_service.parse_exercise_description(
             request.text, 
-            user_weight=request.user_weight
+            user_weight=request.user_weight,
+            user_id=user_id
         )
         
         # Calculate total calories burned
@@ -98,28 +189,121 @@ async def analyze_exercise(request: ExerciseAnalysisRequest, req: Request):
         # Generate suggestions
         suggestions = parser_service.generate_exercise_suggestions(exercises)
         
-        # Store in database
-        user_id = get_current_user_id(req)
-        for exercise in exercises:
-            exercise_data = {
-                "description": request.text,
-                "exercise_name": exercise.name,
-                "duration_minutes": exercise.duration_minutes,
-                "intensity": exercise.intensity,
-                "calories_burned": exercise.calories_burned,
-                "exercise_type": exercise.exercise_type
-            }
-            await supabase_service.log_exercise(user_id, exercise_data)
+        # Store in database with one round-trip
+        logged = await supabase_service.log_exercise_bulk(
+            user_id,
+            [_exercise_row(request.text, exercise) for exercise in exercises]
+        )
         
         return ExerciseAnalysisResponse(
             exercises=exercises,
             total_calories_burned=total_calories_burned,
-            suggestions=suggestions
+            suggestions=suggestions,
+            logged_count=len(logged.rows),
+            log_errors=[LogError(**error) for error in logged.errors]
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to analyze exercise: {str(e)}")
 
+@router.post("/food/batch", response_model=FoodBatchResponse, dependencies=[Depends(auth_bearer)])
+async def analyze_food_batch(request: FoodBatchRequest, req: Request):
+    """
+    Analyze many food descriptions at once, e.g. entries synced from offline
+    
+    All entries are parsed in one pass, totalled with one nutrient matrix
+    product and stored with a single insert.
+    """
+    try:
+        _check_batch_size(len(request.entries))
+        user_id = get_current_user_id(req)
+        foods_per_entry, totals = await parser_service.parse_food_batch(
+            [entry.text for entry in request.entries],
+            user_id=user_id
+        )
+        grand_totals = totals.sum(axis=0)
+        
+        results = [
+            FoodBatchResult(
+                foods=foods,
+                total_calories=round(float(entry_totals[0]), 1),
+                total_macros=_macros(entry_totals)
+            )
+            for foods, entry_totals in zip(foods_per_entry, totals)
+        ]
+        all_foods = [food for foods in foods_per_entry for food in foods]
+        total_macros = _macros(grand_totals)
+        suggestions = parser_service.generate_food_suggestions(all_foods, total_macros)
+        
+        # Store in database with one round-trip
+        rows, origins = [], []
+        for entry_index, (entry, foods) in enumerate(zip(request.entries, foods_per_entry)):
+            for food_index, food in enumerate(foods):
+                rows.append(_nutrition_row(entry.text, food, entry.logged_at))
+                origins.append((entry_index, food_index))
+        logged = await supabase_service.log_nutrition_bulk(user_id, rows)
+        
+        return FoodBatchResponse(
+            results=results,
+            total_calories=round(float(grand_totals[0]), 1),
+            total_macros=total_macros,
+            suggestions=suggestions,
+            logged_count=len(logged.rows),
+            log_errors=_batch_log_errors(logged.errors, origins)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to analyze food batch: {str(e)}")
+
+@router.post("/exercise/batch", response_model=ExerciseBatchResponse, dependencies=[Depends(auth_bearer)])
+async def analyze_exercise_batch(request: ExerciseBatchRequest, req: Request):
+    """
+    Analyze many exercise descriptions at once and store them with a single insert
+    """
+    try:
+        _check_batch_size(len(request.entries))
+        user_id = get_current_user_id(req)
+        exercises_per_entry = await parser_service.parse_exercise_batch(
+            [entry.text for entry in request.entries],
+            [entry.user_weight or request.user_weight for entry in request.entries],
+            user_id=user_id
+        )
+        
+        # Per-entry totals in one pass over every parsed exercise
+        entry_index = np.repeat(np.arange(len(exercises_per_entry)), [len(exercises) for exercises in exercises_per_entry])
+        burned = np.array([exercise.calories_burned for exercises in exercises_per_entry for exercise in exercises])
+        totals = np.bincount(entry_index, weights=burned, minlength=len(exercises_per_entry)).round(1)
+        
+        results = [
+            ExerciseBatchResult(exercises=exercises, total_calories_burned=float(total))
+            for exercises, total in zip(exercises_per_entry, totals)
+        ]
+        all_exercises = [exercise for exercises in exercises_per_entry for exercise in exercises]
+        suggestions = parser_service.generate_exercise_suggestions(all_exercises)
+        
+        # Store in database with one round-trip
+        rows, origins = [], []
+        for entry_index, (entry, exercises) in enumerate(zip(request.entries, exercises_per_entry)):
+            for exercise_index, exercise in enumerate(exercises):
+                rows.append(_exercise_row(entry.text, exercise, entry.logged_at))
+                origins.append((entry_index, exercise_index))
+        logged = await supabase_service.log_exercise_bulk(user_id, rows)
+        
+        return ExerciseBatchResponse(
+            results=results,
+            total_calories_burned=round(float(totals.sum()), 1),
+            suggestions=suggestions,
+            logged_count=len(logged.rows),
+            log_errors=_batch_log_errors(logged.errors, origins)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to analyze exercise batch: {str(e)}")
+
 @router.get("/nutrition-logs", dependencies=[Depends(auth_bearer)])
 async def get_nutrition_logs(req: Request, date: Optional[str] = None):
     """
@@ -150,14 +334,36 @@ async def get_exercise_logs(req: Request, date: Optional[str] = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get exercise logs: {str(e)}")
 
+def _daily_summary(date: str, calories: float, protein: float, carbs: float, fat: float, fiber: float,
+                   nutrition_count: int, burned: float, duration: int, exercise_count: int) -> dict:
+    return {
+        "date": date,
+        "nutrition": {
+            "total_calories": calories,
+            "total_protein": protein,
+            "total_carbs": carbs,
+            "total_fat": fat,
+            "total_fiber": fiber,
+            "log_count": nutrition_count
+        },
+        "exercise": {
+            "total_calories_burned": burned,
+            "total_duration_minutes": duration,
+            "log_count": exercise_count
+        },
+        "net_calories": calories - burned
+    }
+
 @router.get("/daily-summary", dependencies=[Depends(auth_bearer)])
-async def get_daily_summary(req: Request, date: Optional[str] = None):
+async def get_daily_summary(req: Request, response: Response, date: Optional[str] = None):
     """
     Get daily summary of nutrition and exercise
     
     Args:
         date: Date in YYYY-MM-DD format (defaults to today)
     """
+    timings = Timings()
+    deadline = Deadline(get_settings().request_deadline_seconds)
     try:
         user_id = get_current_user_id(req)
         
@@ -165,37 +371,47 @@ async def get_daily_summary(req: Request, date: Optional[str] = None):
         if not date:
             date = datetime.now().strftime("%Y-%m-%d")
         
-        # Get logs
-        nutrition_logs = await supabase_service.get_nutrition_logs(user_id, date)
-        exercise_logs = await supabase_service.get_exercise_logs(user_id, date)
+        # One primary-key read when the rollup table is available
+        rollup = (await fan_out({"daily_rollup": supabase_service.get_daily_rollup(user_id, date)}, deadline, timings))["daily_rollup"]
+        if rollup is not None:
+            return _daily_summary(
+                date,
+                calories=float(rollup.get("total_calories", 0)),
+                protein=float(rollup.get("total_protein", 0)),
+                carbs=float(rollup.get("total_carbs", 0)),
+                fat=float(rollup.get("total_fat", 0)),
+                fiber=float(rollup.get("total_fiber", 0)),
+                nutrition_count=rollup.get("nutrition_log_count", 0),
+                burned=float(rollup.get("total_calories_burned", 0)),
+                duration=rollup.get("total_duration_minutes", 0),
+                exercise_count=rollup.get("exercise_log_count", 0)
+            )
         
-        # Calculate totals
-        total_calories = sum(log.get("calories", 0) for log in nutrition_logs)
-        total_protein = sum(log.get("protein", 0) for log in nutrition_logs)
-        total_carbs = sum(log.get("carbs", 0) for log in nutrition_logs)
-        total_fat = sum(log.get("fat", 0) for log in nutrition_logs)
-        total_fiber = sum(log.get("fiber", 0) for log in nutrition_logs)
-        total_calories_burned = sum(log.get("calories_burned", 0) for log in exercise_logs)
-        
-        return {
-            "date": date,
-            "nutrition": {
-                "total_calories": total_calories,
-                "total_protein": total_protein,
-                "total_carbs": total_carbs,
-                "total_fat": total_fat,
-                "total_fiber": total_fiber,
-                "log_count": len(nutrition_logs)
-            },
-            "exercise": {
-                "total_calories_burned": total_calories_burned,
-                "total_duration_minutes": sum(log.get("duration_minutes", 0) for log in exercise_logs),
-                "log_count": len(exercise_logs)
-            },
-            "net_calories": total_calories - total_calories_burned
-        }
+        # Otherwise sum the day's logs, fetched concurrently
+        logs = await fan_out({
+            "nutrition_logs": supabase_service.get_nutrition_logs(user_id, date),
+            "exercise_logs": supabase_service.get_exercise_logs(user_id, date)
+        }, deadline, timings)
+        nutrition_logs, exercise_logs = logs["nutrition_logs"], logs["exercise_logs"]
+        return _daily_summary(
+            date,
+            calories=sum(log.get("calories", 0) for log in nutrition_logs),
+            protein=sum(log.get("protein", 0) for log in nutrition_logs),
+            carbs=sum(log.get("carbs", 0) for log in nutrition_logs),
+            fat=sum(log.get("fat", 0) for log in nutrition_logs),
+            fiber=sum(log.get("fiber", 0) for log in nutrition_logs),
+            nutrition_count=len(nutrition_logs),
+            burned=sum(log.get("calories_burned", 0) for log in exercise_logs),
+            duration=sum(log.get("duration_minutes", 0) for log in exercise_logs),
+            exercise_count=len(exercise_logs)
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Daily summary timed out: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get daily summary: {str(e)}")
+    finally:
+        response.headers["Server-Timing"] = timings.header()
+        timings.log("daily-summary")
 
 @router.get("/nutrition-database")
 async def get_nutrition_info():
@@ -205,5 +421,6 @@ async def get_nutrition_info():
     return {
         "description": "Common foods nutrition information",
         "source": "USDA FoodData Central",
-        "note": "Values are approximate and may vary based on preparation and brand"
+        "note": "Values are approximate and may vary based on preparation and brand",
+        **parser_service.food_db.info()
     }
\ No newline at end of file
@@ -1,37 +1,49 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
+import asyncio
+import json
+import logging
+import time
 import uuid
 from datetime import datetime
 
 from ..services.ai_service import AIService
+from ..services.supabase_service import supabase_service
 from ..models.chat import ChatMessage, ChatRequest, ChatResponse
 from ..config import get_settings
+from ..dependencies import get_ai_service
 from ..middleware.auth import auth_bearer, get_current_user_id
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 class MessageRequest(BaseModel):
     message: str
     user_id: Optional[str] = None
     conversation_id: Optional[str] = None
-    user_profile: Optional[dict] = None
+    user_profile: Optional[dict] = None  # Used only when no stored profile exists
 
 class MessageResponse(BaseModel):
     response: str
     conversation_id: str
     sources: Optional[List[str]] = None
     timestamp: datetime
+    cached: bool = False  # True when served from the semantic response cache
+    prompt_usage: Optional[Dict[str, int]] = None  # Prompt tokens per section
 
 @router.post("/message", response_model=MessageResponse, dependencies=[Depends(auth_bearer)])
-async def send_message(request: MessageRequest, req: Request):
+async def send_message(
+    request: MessageRequest,
+    req: Request,
+    ai_service: AIService = Depends(get_ai_service)
+):
     """
     Send a message to the AI and get a response
     """
     try:
-        # Get AI service
-        ai_service = AIService()
-        
         # Get current user ID
         user_id = get_current_user_id(req)
         
@@ -39,22 +51,106 @@ async def send_message(request: MessageRequest, req: Request):
         conversation_id = request.conversation_id or str(uuid.uuid4())
         
         # Get AI response
-        response = await ai_service.get_chat_response(
+        response, meta = await ai_service.get_chat_response_with_meta(
             message=request.message,
-            user_profile=request.user_profile,
-            conversation_id=conversation_id
+            user_profile=await _load_profile(user_id, request),
+            conversation_id=conversation_id,
+            user_id=user_id
         )
         
         return MessageResponse(
             response=response.content,
             conversation_id=conversation_id,
             sources=response.sources,
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            cached=meta.get("cached", False),
+            prompt_usage=meta.get("prompt_usage")
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
 
+async def _load_profile(user_id: str, request: MessageRequest) -> Optional[dict]:
+    """
+    The stored profile (served from the profile cache), else the client's copy
+    """
+    return await supabase_service.get_user_profile(user_id) or request.user_profile
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format a server-sent event frame
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/message/stream", dependencies=[Depends(auth_bearer)])
+async def stream_message(
+    request: MessageRequest,
+    req: Request,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Send a message to the AI and stream the response as server-sent events
+    
+    Emits `token` events as the model generates, then one `done` event with
+    sources, conversation_id and timing. If the client disconnects, Starlette
+    cancels this generator, which closes the upstream completion.
+    """
+    user_id = get_current_user_id(req)
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    user_profile = await _load_profile(user_id, request)
+    
+    async def event_stream():
+        started_at = time.perf_counter()
+        first_token_at = None
+        sources: List[str] = []
+        cached = False
+        prompt_usage = None
+        
+        try:
+            async for event in ai_service.stream_chat_response(
+                message=request.message,
+                user_profile=user_profile,
+                conversation_id=conversation_id,
+                user_id=user_id
+            ):
+                if event["type"] == "token":
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield _sse_event("token", {"content": event["content"]})
+                elif event["type"] == "done":
+                    sources = event.get("sources", [])
+                    cached = event.get("cached", False)
+                    prompt_usage = event.get("prompt_usage")
+        except asyncio.CancelledError:
+            logger.info(f"Client disconnected, cancelled stream for user {user_id}")
+            raise
+        except Exception as e:
+            logger.error(f"Error while streaming chat response: {str(e)}")
+            yield _sse_event("error", {"message": f"Failed to process message: {str(e)}"})
+            return
+        
+        finished_at = time.perf_counter()
+        yield _sse_event("done", {
+            "conversation_id": conversation_id,
+            "sources": sources,
+            "cached": cached,
+            "prompt_usage": prompt_usage,
+            "timestamp": datetime.now().isoformat(),
+            "timing": {
+                "time_to_first_token_ms": round((first_token_at - started_at) * 1000, 1) if first_token_at else None,
+                "total_ms": round((finished_at - started_at) * 1000, 1)
+            }
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Don't let proxies buffer the stream
+        }
+    )
+
 @router.get("/health")
 async def chat_health():
     """
@@ -5,6 +5,7 @@ import shutil
 from pathlib import Path
 
 from ..services.rag_service import RAGService
+from ..dependencies import get_rag_service
 from ..middleware.auth import auth_bearer, get_current_user_id
 
 router = APIRouter()
@@ -17,7 +18,8 @@ async def upload_document(
     req: Request,
     file: UploadFile = File(...),
     topic: Optional[str] = None,
-    source: Optional[str] = None
+    source: Optional[str] = None,
+    rag_service: RAGService = Depends(get_rag_service)
 ):
     """
     Upload a document to the RAG knowledge base
@@ -33,7 +35,6 @@ async def upload_document(
             shutil.copyfileobj(file.file, buffer)
         
         # Add to RAG
-        rag_service = RAGService()
         metadata = {}
         if topic:
             metadata["topic"] = topic
@@ -55,19 +56,25 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @router.get("/topics", dependencies=[Depends(auth_bearer)])
-async def get_topics():
+async def get_topics(rag_service: RAGService = Depends(get_rag_service)):
     """
     Get all available topics in the knowledge base
     """
-    rag_service = RAGService()
     topics = rag_service.get_all_topics()
     return {"topics": topics}
 
 @router.post("/clear-memory", dependencies=[Depends(auth_bearer)])
-async def clear_memory():
+async def clear_memory(
+    req: Request,
+    conversation_id: Optional[str] = None,
+    rag_service: RAGService = Depends(get_rag_service)
+):
     """
     Clear conversation memory
+    
+    Clears one conversation, or all of the current user's conversations
+    when no conversation_id is given.
     """
-    rag_service = RAGService()
-    rag_service.clear_conversation_memory()
-    return {"message": "Conversation memory cleared"}
\ No newline at end of file
+    user_id = get_current_user_id(req)
+    cleared = rag_service.clear_conversation_memory(conversation_id, user_id=user_id)
+    return {"message": "Conversation memory cleared", "conversations_cleared": cleared}
\ No newline at end of file
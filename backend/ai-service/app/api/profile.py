@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from typing import Optional
 import math
 
+from ..config import get_settings
 from ..models.user import UserProfile, TDEECalculation
+from ..services.concurrency import Deadline, DeadlineExceeded, Timings, fan_out
 from ..services.tdee_service import TDEEService
 from ..services.supabase_service import supabase_service
 from ..middleware.auth import auth_bearer, get_current_user_id
@@ -26,10 +28,15 @@ class ProfileSetupResponse(BaseModel):
     recommendations: dict
 
 @router.post("/setup", response_model=ProfileSetupResponse, dependencies=[Depends(auth_bearer)])
-async def setup_user_profile(request: ProfileSetupRequest, req: Request):
+async def setup_user_profile(request: ProfileSetupRequest, req: Request, response: Response):
     """
     Set up user profile and calculate TDEE
+    
+    The profile upsert (lookup, then update or create) and the initial
+    weight record are independent, so they run concurrently.
     """
+    timings = Timings()
+    deadline = Deadline(get_settings().request_deadline_seconds)
     try:
         # Get current user ID
         user_id = get_current_user_id(req)
@@ -71,15 +78,21 @@ async def setup_user_profile(request: ProfileSetupRequest, req: Request):
             "target_carbs": tdee_calculation.target_carbs
         }
         
-        # Check if profile exists
-        existing_profile = await supabase_service.get_user_profile(user_id)
-        if existing_profile:
-            await supabase_service.update_user_profile(user_id, profile_data)
-        else:
-            await supabase_service.create_user_profile(user_id, profile_data)
+        async def save_profile():
+            # Check if profile exists
+            with timings.measure("profile_lookup"):
+                existing_profile = await supabase_service.get_user_profile(user_id)
+            with timings.measure("profile_write"):
+                if existing_profile:
+                    await supabase_service.update_user_profile(user_id, profile_data)
+                else:
+                    await supabase_service.create_user_profile(user_id, profile_data)
         
-        # Record initial weight
-        await supabase_service.record_weight(user_id, request.weight)
+        # Record initial weight alongside the profile write
+        await fan_out({
+            "profile": save_profile(),
+            "record_weight": supabase_service.record_weight(user_id, request.weight)
+        }, deadline, timings)
         
         return ProfileSetupResponse(
             user_profile=user_profile,
@@ -87,8 +100,17 @@ async def setup_user_profile(request: ProfileSetupRequest, req: Request):
             recommendations=recommendations
         )
         
+    except DeadlineExceeded as e:
+        # The writes keep running in their executor threads, so they may still land
+        raise HTTPException(
+            status_code=504,
+            detail=f"Profile setup timed out: {str(e)}. The profile and weight may still have been saved; check before retrying"
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to setup profile: {str(e)}")
+    finally:
+        response.headers["Server-Timing"] = timings.header()
+        timings.log("profile-setup")
 
 @router.get("/current", dependencies=[Depends(auth_bearer)])
 async def get_current_profile(req: Request):
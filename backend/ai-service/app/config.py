@@ -30,9 +30,46 @@ class Settings(BaseSettings):
     log_format: str = "json"
     
     # RAG Configuration
-    vector_store_path: str = "./knowledge_base/embeddings"
+    vector_store_backend: str = "chroma"  # "chroma" or "numpy"
+    vector_store_path: str = "./knowledge_base/embeddings"  # NumPy index directory
     max_context_length: int = 4000
     similarity_threshold: float = 0.7
+    retrieval_top_k: int = 5
+    
+    # Semantic response cache
+    response_cache_enabled: bool = True
+    response_cache_similarity: float = 0.95
+    response_cache_ttl_seconds: int = 3600
+    response_cache_max_entries: int = 2048
+    
+    # Conversation history
+    conversation_max_active: int = 1000  # Conversations kept in memory
+    conversation_ttl_seconds: int = 86400
+    conversation_max_messages: int = 40
+    conversation_history_tokens: int = 1500  # History window sent to the model
+    conversation_spill_dir: Optional[str] = None  # Disk tier for evicted conversations
+    
+    # Food database (built from the CSV on first start)
+    food_database_csv: str = "./data/foods.csv"
+    food_database_path: str = "./data/food_db"  # Memory-mapped database directory
+    food_aliases_csv: str = "./data/food_aliases.csv"
+    food_fuzzy_min_score: float = 0.75  # Edit similarity needed to accept a misspelled name
+    
+    # Exercise energy (MET compendium, activity x intensity)
+    met_compendium_csv: str = "./data/met_compendium.csv"
+    exercise_aliases_csv: str = "./data/exercise_aliases.csv"
+    parse_cache_entries: int = 10000  # Per kind (food, exercise)
+    
+    # LLM fallback for descriptions the rule parser can't read
+    llm_extraction_enabled: bool = True
+    llm_extraction_min_confidence: float = 0.6  # Escalate parses with any item below this
+    llm_extraction_per_minute: int = 10  # Per user
+    llm_extraction_cache_entries: int = 4096
+    llm_extraction_cache_ttl_seconds: int = 86400
+    llm_extraction_timeout_seconds: float = 15.0
+    
+    # Deadline shared by the concurrent I/O calls of one request
+    request_deadline_seconds: float = 15.0
     
     # Rate Limiting
     max_requests_per_minute: int = 60
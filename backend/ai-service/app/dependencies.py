@@ -0,0 +1,27 @@
+"""Shared service dependencies for API routers."""
+from fastapi import Request, HTTPException, status
+
+from .services.ai_service import AIService
+from .services.rag_service import RAGService
+
+
+def get_rag_service(request: Request) -> RAGService:
+    """Get the process-wide RAG engine created at startup."""
+    rag_service = getattr(request.app.state, "rag_service", None)
+    if rag_service is None or not rag_service.is_ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Knowledge base is not ready yet"
+        )
+    return rag_service
+
+
+def get_ai_service(request: Request) -> AIService:
+    """Get the process-wide AI service bound to the shared RAG engine."""
+    ai_service = getattr(request.app.state, "ai_service", None)
+    if ai_service is None or not ai_service.rag_service.is_ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service is not ready yet"
+        )
+    return ai_service
@@ -1,12 +1,19 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 import os
+import logging
 from dotenv import load_dotenv
 
 from .api import chat, profile, analysis, documents, weight, auth
 from .config import get_settings
+from .services.rag_service import RAGService
+from .services.ai_service import AIService
+from .services.parser_service import parser_service
+from .services.supabase_service import supabase_service
 
 # Load environment variables
 load_dotenv()
@@ -14,13 +21,42 @@ load_dotenv()
 # Get configuration
 settings = get_settings()
 
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build one warmed RAG engine per process and share it across routers
+    """
+    app.state.rag_service = None
+    app.state.ai_service = None
+    
+    try:
+        # Embeddings, Chroma and the LLM clients do blocking I/O while loading
+        rag_service = await run_in_threadpool(RAGService)
+        await run_in_threadpool(rag_service.warm_up)
+        app.state.rag_service = rag_service
+        app.state.ai_service = AIService(rag_service=rag_service)
+    except Exception as e:
+        # Keep serving non-RAG routes; readiness reports the engine as down
+        logger.error(f"Failed to start RAG engine: {str(e)}")
+    
+    yield
+    
+    if app.state.rag_service is not None:
+        await run_in_threadpool(app.state.rag_service.close)
+    app.state.ai_service = None
+    app.state.rag_service = None
+    await run_in_threadpool(supabase_service.close)
+
 # Create FastAPI app
 app = FastAPI(
     title="BodyMind AI Service",
     description="AI-powered science-based fat loss expert backend",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS configuration for React Native
@@ -53,6 +89,32 @@ async def health_check():
         "environment": settings.environment
     }
 
+@app.get("/ready")
+async def readiness_check():
+    rag_service = app.state.rag_service
+    if rag_service is None or not rag_service.is_ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", "rag_engine": "not_ready"}
+        )
+    
+    return {"status": "ready", "rag_engine": "ready"}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Cache and engine counters for sizing and dashboards
+    """
+    ai_service = app.state.ai_service
+    rag_service = app.state.rag_service
+    response_cache = ai_service.response_cache if ai_service else None
+    return {
+        "response_cache": response_cache.stats() if response_cache else {"enabled": False},
+        "conversations": rag_service.conversations.stats() if rag_service else {"enabled": False},
+        "parser": parser_service.stats(),
+        "supabase": supabase_service.stats()
+    }
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     return JSONResponse(
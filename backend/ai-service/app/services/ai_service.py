@@ -1,21 +1,34 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 import json
 import logging
 import os
 
 from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
 
 from ..config import get_settings
 from ..models.chat import ChatResponse
 from .rag_service import RAGService
+from .response_cache import SemanticResponseCache, profile_bucket
+from .prompt_builder import PromptBuilder, prompt_usage_summary
+from .token_counter import count_tokens
 
 logger = logging.getLogger(__name__)
 
+RAG_PROMPT_TEMPLATE = """Based on the following scientific research, please provide a comprehensive and personalized answer to the user's question.
+
+Research Context:
+{context}
+
+User Question: {question}
+
+Please provide a detailed, actionable response that incorporates the research findings and is tailored to the user's profile."""
+
 class AIService:
-    def __init__(self):
+    def __init__(self, rag_service: Optional[RAGService] = None):
         self.settings = get_settings()
-        self.rag_service = RAGService()
+        # Reuse the process-wide engine when one is supplied
+        self.rag_service = rag_service or RAGService()
         
         # Initialize LLM with SiliconFlow API
         self.llm = ChatOpenAI(
@@ -26,58 +39,79 @@ class AIService:
             max_tokens=self.settings.max_tokens
         )
         
+        # Answers to near-duplicate questions, keyed by query embedding + profile bucket
+        self.response_cache = SemanticResponseCache(
+            similarity_threshold=self.settings.response_cache_similarity,
+            ttl_seconds=self.settings.response_cache_ttl_seconds,
+            max_entries=self.settings.response_cache_max_entries
+        ) if self.settings.response_cache_enabled else None
+        
+        # Keeps every prompt within max_context_length tokens
+        self.prompt_builder = PromptBuilder(max_tokens=self.settings.max_context_length)
+        
     async def get_chat_response(
         self, 
         message: str, 
         user_profile: Optional[Dict[str, Any]] = None,
-        conversation_id: str = ""
+        conversation_id: str = "",
+        user_id: Optional[str] = None
     ) -> ChatResponse:
         """
         Get AI response with RAG-enhanced context
         """
+        response, _ = await self.get_chat_response_with_meta(message, user_profile, conversation_id, user_id)
+        return response
+    
+    async def get_chat_response_with_meta(
+        self,
+        message: str,
+        user_profile: Optional[Dict[str, Any]] = None,
+        conversation_id: str = "",
+        user_id: Optional[str] = None
+    ) -> Tuple[ChatResponse, Dict[str, Any]]:
+        """
+        Get AI response plus metadata about how it was produced
+        
+        Near-duplicate questions from similar profiles are answered from the
+        semantic response cache. Otherwise retrieval is LLM-free, so each
+        message costs exactly one generation.
+        """
+        meta: Dict[str, Any] = {"cached": False}
         try:
-            # Get relevant knowledge from RAG
-            rag_context = await self.rag_service.get_relevant_context(message, conversation_id)
+            history = self._get_history(conversation_id, user_id)
             
-            # If RAG provided an answer, use it directly
-            if rag_context and rag_context.get("content"):
-                # Build a refined prompt to enhance the RAG answer
-                system_prompt = self._build_system_prompt(user_profile)
-                
-                messages = [
-                    SystemMessage(content=system_prompt),
-                    HumanMessage(content=f"""Based on the following scientific research, please provide a comprehensive and personalized answer to the user's question.
-
-Research Context:
-{rag_context['content']}
-
-User Question: {message}
-
-Please provide a detailed, actionable response that incorporates the research findings and is tailored to the user's profile.""")
-                ]
-                
-                # Get enhanced response
-                response = await self.llm.agenerate([messages])
-                content = response.generations[0][0].text
-                sources = rag_context.get("sources", [])
-            else:
-                # Fallback to general knowledge without RAG
-                system_prompt = self._build_system_prompt(user_profile)
-                
-                messages = [
-                    SystemMessage(content=system_prompt),
-                    HumanMessage(content=message)
-                ]
-                
-                response = await self.llm.agenerate([messages])
-                content = response.generations[0][0].text
-                sources = []
+            # One query embedding serves both the cache lookup and retrieval
+            bucket = profile_bucket(user_profile)
+            embedding = await self.rag_service.embed_query(message)
+            
+            # Follow-ups depend on earlier turns, so only fresh conversations use the cache
+            cached = None if history else self._lookup_cache(embedding, bucket)
+            if cached:
+                meta.update(cached=True, cache_similarity=round(cached["similarity"], 4))
+                return ChatResponse(
+                    content=cached["content"],
+                    sources=cached["sources"],
+                    conversation_id=conversation_id
+                ), meta
             
+            # Get relevant knowledge chunks from RAG
+            rag_context = await self.rag_service.retrieve_context(message, embedding=embedding)
+            messages, fitted = self._build_messages(message, user_profile, rag_context, history)
+            meta["prompt_usage"] = prompt_usage_summary(fitted)
+            
+            # Single generation, grounded in the retrieved chunks when there are any
+            response = await self.llm.agenerate([messages])
+            content = response.generations[0][0].text
+            sources = rag_context.get("sources", []) if rag_context else []
+            
+            if not history:
+                self._store_cache(embedding, bucket, content, sources)
+            self._remember_turn(conversation_id, user_id, message, content)
             return ChatResponse(
                 content=content,
                 sources=sources,
                 conversation_id=conversation_id
-            )
+            ), meta
             
         except Exception as e:
             logger.error(f"Error in get_chat_response: {str(e)}")
@@ -86,9 +120,161 @@ Please provide a detailed, actionable response that incorporates the research fi
                 content=f"I apologize, but I'm having trouble processing your request right now. Could you please try again? Error: {str(e)}",
                 sources=[],
                 conversation_id=conversation_id
-            )
+            ), meta
     
-    def _build_system_prompt(self, user_profile: Optional[Dict]) -> str:
+    async def stream_chat_response(
+        self,
+        message: str,
+        user_profile: Optional[Dict[str, Any]] = None,
+        conversation_id: str = "",
+        user_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the AI response token by token
+        
+        Yields {"type": "token", "content": ...} events as the model produces
+        them, then a single {"type": "done", "sources": [...], "cached": ...}
+        event. A cache hit is sent as one token event. Closing the iterator
+        early cancels the upstream completion.
+        """
+        history = self._get_history(conversation_id, user_id)
+        bucket = profile_bucket(user_profile)
+        embedding = await self.rag_service.embed_query(message)
+        
+        cached = None if history else self._lookup_cache(embedding, bucket)
+        if cached:
+            self._remember_turn(conversation_id, user_id, message, cached["content"])
+            yield {"type": "token", "content": cached["content"]}
+            yield {
+                "type": "done",
+                "sources": cached["sources"],
+                "conversation_id": conversation_id,
+                "cached": True
+            }
+            return
+        
+        rag_context = await self.rag_service.retrieve_context(message, embedding=embedding)
+        messages, fitted = self._build_messages(message, user_profile, rag_context, history)
+        sources = rag_context.get("sources", []) if rag_context else []
+        
+        tokens = []
+        async for chunk in self.llm.astream(messages):
+            if chunk.content:
+                tokens.append(chunk.content)
+                yield {"type": "token", "content": chunk.content}
+        
+        # Only complete answers are cached and remembered; a cancelled stream never gets here
+        content = "".join(tokens)
+        if not history:
+            self._store_cache(embedding, bucket, content, sources)
+        self._remember_turn(conversation_id, user_id, message, content)
+        yield {
+            "type": "done",
+            "sources": sources,
+            "conversation_id": conversation_id,
+            "cached": False,
+            "prompt_usage": prompt_usage_summary(fitted)
+        }
+    
+    def _get_history(self, conversation_id: str, user_id: Optional[str]) -> List[Dict[str, str]]:
+        """
+        Recent turns of this user's conversation, within the history token budget
+        """
+        return self.rag_service.conversations.get_history(
+            conversation_id,
+            owner=user_id,
+            max_tokens=self.settings.conversation_history_tokens
+        )
+    
+    def _remember_turn(self, conversation_id: str, user_id: Optional[str], message: str, content: str):
+        """
+        Append a completed exchange to the conversation history
+        """
+        if content:
+            self.rag_service.conversations.add_turn(conversation_id, message, content, owner=user_id)
+    
+    def _lookup_cache(self, embedding: Optional[List[float]], bucket: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer, if caching is on and the query could be embedded
+        """
+        if self.response_cache is None or embedding is None:
+            return None
+        return self.response_cache.lookup(embedding, bucket)
+    
+    def _store_cache(self, embedding: Optional[List[float]], bucket: str, content: str, sources: List[str]):
+        """
+        Remember a generated answer for near-duplicate questions
+        """
+        if self.response_cache is None or embedding is None or not content:
+            return
+        self.response_cache.store(embedding, bucket, content, sources)
+    
+    def _build_messages(
+        self,
+        message: str,
+        user_profile: Optional[Dict[str, Any]],
+        rag_context: Optional[Dict[str, Any]],
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> Tuple[List, Dict[str, Any]]:
+        """
+        Build the chat messages within max_context_length tokens
+        
+        Grounds the question in retrieved research if any. Returns the
+        messages and the prompt builder's fit, which reports tokens per section.
+        """
+        chunks = rag_context.get("chunks", []) if rag_context else []
+        fitted = self.prompt_builder.build(
+            system=self._build_system_prompt(),
+            question=message,
+            profile=self._build_profile_context(user_profile),
+            chunks=chunks,
+            history=history or [],
+            reserve_tokens=count_tokens(RAG_PROMPT_TEMPLATE) if chunks else 0
+        )
+        
+        system_prompt = self._build_system_prompt(fitted["profile"])
+        prior_turns = [
+            HumanMessage(content=turn["content"]) if turn["role"] == "user" else AIMessage(content=turn["content"])
+            for turn in fitted["history"]
+        ]
+        
+        # Fallback to general knowledge without RAG
+        if not fitted["chunks"]:
+            return [
+                SystemMessage(content=system_prompt),
+                *prior_turns,
+                HumanMessage(content=message)
+            ], fitted
+        
+        return [
+            SystemMessage(content=system_prompt),
+            *prior_turns,
+            HumanMessage(content=RAG_PROMPT_TEMPLATE.format(
+                context="\n\n".join(fitted["chunks"]),
+                question=message
+            ))
+        ], fitted
+    
+    def _build_profile_context(self, user_profile: Optional[Dict]) -> str:
+        """
+        Describe the user's profile for the system prompt
+        """
+        if not user_profile:
+            return ""
+        
+        return f"""
+
+User Profile:
+- Age: {user_profile.get('age', 'Not specified')}
+- Gender: {user_profile.get('gender', 'Not specified')}
+- Weight: {user_profile.get('weight', 'Not specified')} kg
+- Height: {user_profile.get('height', 'Not specified')} cm
+- Activity Level: {user_profile.get('activity_level', 'Not specified')}
+- Goal: {user_profile.get('goal', 'Not specified')}
+
+Personalize your advice based on this profile."""
+    
+    def _build_system_prompt(self, profile_context: str = "") -> str:
         """
         Build comprehensive system prompt for the AI
         """
@@ -110,21 +296,7 @@ Your expertise covers:
 - Metabolic adaptation management"""
 
         # Add user context
-        if user_profile:
-            user_context = f"""
-
-User Profile:
-- Age: {user_profile.get('age', 'Not specified')}
-- Gender: {user_profile.get('gender', 'Not specified')}
-- Weight: {user_profile.get('weight', 'Not specified')} kg
-- Height: {user_profile.get('height', 'Not specified')} cm
-- Activity Level: {user_profile.get('activity_level', 'Not specified')}
-- Goal: {user_profile.get('goal', 'Not specified')}
-
-Personalize your advice based on this profile."""
-
-            base_prompt += user_context
-
+        base_prompt += profile_context
 
         base_prompt += """
 
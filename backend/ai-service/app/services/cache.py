@@ -0,0 +1,108 @@
+"""Small thread-safe LRU/TTL cache shared by the service layer."""
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+from collections import OrderedDict
+import threading
+import time
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded mapping with least-recently-used eviction and optional TTL
+
+    Expired entries are dropped lazily on access. `on_evict(key, value)` is
+    called for capacity evictions only, so callers can spill them elsewhere.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+
+            stored_at, value = item
+            if self._is_expired(stored_at, time.monotonic()):
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        evicted = []
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                evicted.append(self._data.popitem(last=False))
+                self.evictions += 1
+
+        # Run callbacks outside the lock; they may do I/O
+        if self.on_evict:
+            for evicted_key, (_, evicted_value) in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def touch(self, key: Hashable):
+        """Refresh an entry's TTL without changing its value"""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                self._data[key] = (time.monotonic(), item[1])
+                self._data.move_to_end(key)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            return default if item is _MISSING else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Snapshot of live (unexpired) entries, oldest first"""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = list(self._data.items())
+        return iter([(key, value) for key, (stored_at, value) in snapshot if not self._is_expired(stored_at, now)])
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            return item is not _MISSING and not self._is_expired(item[0], time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "max_entries": self.max_entries
+        }
@@ -0,0 +1,99 @@
+"""Concurrent fan-out of independent I/O calls under one request deadline."""
+from typing import Any, Awaitable, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """A fan-out didn't finish before the request's deadline"""
+
+
+class Deadline:
+    """Absolute point in time shared by every step of one request"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+class Timings:
+    """
+    Wall-clock spans of one request's steps, for logs and Server-Timing
+
+    Each span records its start offset as well as its duration, so spans
+    that ran concurrently show up as overlapping in the log line.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []  # (name, start ms, duration ms)
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            finished_at = time.perf_counter()
+            self.spans.append((name, (started_at - self.started_at) * 1000, (finished_at - started_at) * 1000))
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def header(self) -> str:
+        """Server-Timing header value, e.g. `nutrition_logs;dur=41.2, exercise_logs;dur=38.9, total;dur=42.0`"""
+        return ", ".join([f"{name};dur={duration:.1f}" for name, _, duration in self.spans] + [f"total;dur={self.total_ms():.1f}"])
+
+    def log(self, endpoint: str):
+        spans = " ".join(f"{name}=+{start:.1f}/{duration:.1f}ms" for name, start, duration in self.spans)
+        logger.info(f"{endpoint} timing: {spans} total={self.total_ms():.1f}ms")
+
+
+async def _timed(name: str, call: Awaitable[Any], timings: Optional[Timings]) -> Any:
+    if timings is None:
+        return await call
+    with timings.measure(name):
+        return await call
+
+
+async def fan_out(calls: Dict[str, Awaitable[Any]], deadline: Deadline, timings: Optional[Timings] = None) -> Dict[str, Any]:
+    """
+    Run independent calls concurrently and return their results by name
+
+    If one call raises, the deadline passes, or the caller itself is
+    cancelled (client disconnect), every call still running is cancelled
+    and awaited before this returns. Cancelling only stops the coroutine:
+    a blocking call already handed to an executor thread (every Supabase
+    call) runs to completion in the background, so a write that missed the
+    deadline may still land afterwards.
+    """
+    if not calls:
+        # asyncio.wait() rejects an empty set; callers may build calls conditionally
+        return {}
+    tasks = {name: asyncio.ensure_future(_timed(name, call, timings)) for name, call in calls.items()}
+    try:
+        done, pending = await asyncio.wait(
+            tasks.values(),
+            timeout=deadline.remaining(),
+            return_when=asyncio.FIRST_EXCEPTION
+        )
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        if pending:
+            late = [name for name, task in tasks.items() if task in pending]
+            raise DeadlineExceeded(f"{', '.join(late)} did not finish within {deadline.seconds}s")
+        return {name: task.result() for name, task in tasks.items()}
+    finally:
+        unfinished = [task for task in tasks.values() if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
@@ -0,0 +1,203 @@
+"""Per-conversation chat history with bounded memory."""
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from .cache import LRUCache
+from .token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore:
+    """
+    Chat history keyed by conversation_id
+
+    The hot tier is an LRU/TTL cache holding at most max_conversations
+    conversations of at most max_messages messages each, so memory stays
+    flat however many conversations are open. With spill_dir set, LRU
+    evictions are written to disk and reloaded on the next access instead
+    of being forgotten. Each conversation records its owner and is only
+    returned to that owner.
+    """
+
+    def __init__(
+        self,
+        max_conversations: int = 1000,
+        ttl_seconds: int = 86400,
+        max_messages: int = 40,
+        spill_dir: Optional[str] = None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.spilled = 0
+        self.restored = 0
+        self._lock = threading.Lock()
+        self._cache = LRUCache(
+            max_entries=max_conversations,
+            ttl_seconds=ttl_seconds,
+            on_evict=self._spill
+        )
+
+    def _spill_path(self, conversation_id: str) -> Path:
+        # Conversation ids come from clients; never use them as file names
+        digest = hashlib.sha256(conversation_id.encode("utf-8")).hexdigest()
+        return self.spill_dir / f"{digest}.json"
+
+    def _spill(self, conversation_id: str, conversation: Dict[str, Any]):
+        """Write an evicted conversation to the disk tier"""
+        if not self.spill_dir:
+            return
+        try:
+            path = self._spill_path(conversation_id)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(conversation, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, path)
+            self.spilled += 1
+        except Exception as e:
+            logger.error(f"Failed to spill conversation: {str(e)}")
+
+    def _restore(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Move a spilled conversation back into memory if it hasn't expired"""
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(conversation_id)
+        try:
+            conversation = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to restore conversation: {str(e)}")
+            return None
+
+        path.unlink(missing_ok=True)
+        if time.time() - conversation.get("updated_at", 0) > self.ttl_seconds:
+            return None
+        self._cache.set(conversation_id, conversation)
+        self.restored += 1
+        return conversation
+
+    def _load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        conversation = self._cache.get(conversation_id)
+        if conversation is None:
+            conversation = self._restore(conversation_id)
+        return conversation
+
+    def get_history(
+        self,
+        conversation_id: Optional[str],
+        owner: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Most recent messages of a conversation, oldest first
+
+        With max_tokens, messages are taken from the newest backwards until
+        the budget is spent. Another owner's conversation reads as empty.
+        """
+        if not conversation_id:
+            return []
+
+        with self._lock:
+            conversation = self._load(conversation_id)
+            if conversation is None or conversation.get("owner") != owner:
+                return []
+            messages = list(conversation["messages"])
+
+        if max_tokens is None:
+            return messages
+
+        window = []
+        used = 0
+        for message in reversed(messages):
+            used += count_tokens(message["content"])
+            if used > max_tokens:
+                break
+            window.append(message)
+        window.reverse()
+        return window
+
+    def add_turn(self, conversation_id: Optional[str], user_message: str, ai_response: str, owner: Optional[str] = None) -> bool:
+        """
+        Append a user/assistant exchange to a conversation
+
+        An unknown id starts a new conversation owned by owner. A turn for
+        another owner's conversation is dropped, never written over it.
+        Returns whether the turn was stored.
+        """
+        if not conversation_id:
+            return False
+
+        with self._lock:
+            conversation = self._load(conversation_id)
+            if conversation is None:
+                conversation = {"owner": owner, "messages": []}
+            elif conversation.get("owner") != owner:
+                logger.warning("Dropped a turn for a conversation owned by another user")
+                return False
+
+            messages = conversation["messages"]
+            messages.append({"role": "user", "content": user_message})
+            messages.append({"role": "assistant", "content": ai_response})
+            del messages[:-self.max_messages]
+            conversation["updated_at"] = time.time()
+            self._cache.set(conversation_id, conversation)
+            return True
+
+    def clear(self, conversation_id: Optional[str] = None, owner: Optional[str] = None) -> int:
+        """
+        Forget one conversation, or every conversation of an owner
+
+        Returns the number of conversations removed.
+        """
+        with self._lock:
+            if conversation_id:
+                conversation = self._load(conversation_id)
+                if conversation is None or conversation.get("owner") != owner:
+                    return 0
+                self._cache.pop(conversation_id)
+                return 1
+
+            removed = 0
+            for key, conversation in list(self._cache.items()):
+                if conversation.get("owner") == owner:
+                    self._cache.pop(key)
+                    removed += 1
+
+            if self.spill_dir:
+                for path in self.spill_dir.glob("*.json"):
+                    try:
+                        if json.loads(path.read_text(encoding="utf-8")).get("owner") == owner:
+                            path.unlink(missing_ok=True)
+                            removed += 1
+                    except Exception as e:
+                        logger.error(f"Failed to clear spilled conversation: {str(e)}")
+            return removed
+
+    def clear_all(self):
+        """Drop every conversation from both tiers"""
+        with self._lock:
+            self._cache.clear()
+            if self.spill_dir:
+                for path in self.spill_dir.glob("*.json"):
+                    path.unlink(missing_ok=True)
+
+    def close(self):
+        """Release the memory tier, spilling live conversations to disk if configured"""
+        with self._lock:
+            for conversation_id, conversation in list(self._cache.items()):
+                self._spill(conversation_id, conversation)
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update({"spilled": self.spilled, "restored": self.restored})
+        return stats
@@ -0,0 +1,100 @@
+"""MET-based energy estimates backed by a compendium of activities."""
+from typing import Dict, List, Optional, Sequence
+import csv
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INTENSITIES = ("low", "moderate", "high", "very_high")
+DEFAULT_INTENSITY = "moderate"
+
+# Words that set the intensity of the activity they describe
+INTENSITY_WORDS = {
+    "easy": "low", "light": "low", "slow": "low", "slowly": "low", "gentle": "low",
+    "leisurely": "low", "relaxed": "low", "casual": "low",
+    "moderate": "moderate", "steady": "moderate", "normal": "moderate",
+    "brisk": "high", "briskly": "high", "fast": "high", "hard": "high", "vigorous": "high",
+    "intense": "high", "uphill": "high",
+    "sprint": "very_high", "sprinting": "very_high", "sprints": "very_high", "all-out": "very_high",
+    "max effort": "very_high", "competitive": "very_high",
+    "轻松": "low", "慢速": "low", "慢慢": "low", "低强度": "low",
+    "中等强度": "moderate", "中速": "moderate",
+    "快速": "high", "高强度": "high", "剧烈": "high",
+    "冲刺": "very_high", "全力": "very_high"
+}
+
+
+def intensity_for_met(met: float) -> str:
+    """Intensity band of a MET value: light < 3, moderate < 6, vigorous < 9"""
+    if met < 3:
+        return "low"
+    if met < 6:
+        return "moderate"
+    if met < 9:
+        return "high"
+    return "very_high"
+
+
+class ExerciseEngine:
+    """
+    MET lookup table with vectorized energy estimates
+
+    Activities are indexed once into an (activities x INTENSITIES) float
+    array; levels the compendium doesn't list for an activity take the
+    nearest listed level. Energy is MET x body weight (kg) x hours, so a
+    whole request or batch is priced with one array expression.
+    """
+
+    def __init__(self, mets: Dict[str, Dict[str, float]], categories: Optional[Dict[str, str]] = None):
+        self.activities: List[str] = sorted(mets)
+        self.activity_index: Dict[str, int] = {name: i for i, name in enumerate(self.activities)}
+        self.intensity_index: Dict[str, int] = {level: i for i, level in enumerate(INTENSITIES)}
+        self.categories = categories or {}
+
+        table = np.full((len(self.activities), len(INTENSITIES)), np.nan)
+        for name, levels in mets.items():
+            for level, met in levels.items():
+                table[self.activity_index[name], self.intensity_index[level]] = met
+        for row in table:
+            listed = np.flatnonzero(~np.isnan(row))
+            for level in np.flatnonzero(np.isnan(row)):
+                # Ties go to the lower level
+                row[level] = row[listed[np.argmin(np.abs(listed - level))]]
+        self.met_table = table
+
+    @classmethod
+    def from_csv(cls, path: str) -> "ExerciseEngine":
+        """Load a CSV with activity, intensity, met and category columns"""
+        mets: Dict[str, Dict[str, float]] = {}
+        categories: Dict[str, str] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                name = " ".join(record["activity"].lower().split())
+                if record["intensity"] not in INTENSITIES:
+                    logger.warning(f"Unknown intensity {record['intensity']!r} for {name!r}")
+                    continue
+                mets.setdefault(name, {})[record["intensity"]] = float(record["met"])
+                categories.setdefault(name, record.get("category") or "")
+        return cls(mets, categories)
+
+    def __contains__(self, activity: str) -> bool:
+        return activity in self.activity_index
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+    def met(self, activity: str, intensity: str = DEFAULT_INTENSITY) -> float:
+        return float(self.met_table[self.activity_index[activity], self.intensity_index[intensity]])
+
+    def mets(self, activities: Sequence[str], intensities: Sequence[str]) -> np.ndarray:
+        """MET for each (activity, intensity) pair in one fancy-indexing lookup"""
+        rows = np.fromiter((self.activity_index[name] for name in activities), dtype=np.intp, count=len(activities))
+        levels = np.fromiter((self.intensity_index[level] for level in intensities), dtype=np.intp, count=len(intensities))
+        return self.met_table[rows, levels]
+
+    @staticmethod
+    def calories(mets: np.ndarray, weight_kg: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+        """kcal = MET x kg x hours, elementwise"""
+        return np.asarray(mets, dtype=np.float64) * np.asarray(weight_kg, dtype=np.float64) * np.asarray(minutes, dtype=np.float64) / 60.0
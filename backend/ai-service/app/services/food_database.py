@@ -0,0 +1,305 @@
+"""Compact, memory-mapped food composition database."""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from pathlib import Path
+import csv
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per-100 g nutrient columns, in file order
+NUTRIENT_COLUMNS = ("calories", "protein", "carbs", "fat", "fiber")
+DEFAULT_SERVING_G = 100.0
+DEFAULT_DENSITY_G_ML = 1.0  # Water; used when a source has no density
+
+
+def normalize_food_name(name: str) -> str:
+    """Lowercase and collapse whitespace so names match parser input"""
+    return " ".join(name.lower().split())
+
+
+@contextmanager
+def _locked(path: Path, shared: bool = False) -> Iterator[None]:
+    """
+    flock on a sidecar file next to path: builders hold it exclusively,
+    readers share it while they map the files
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f"{path.name}.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class FoodDatabase:
+    """
+    Read-only food table backed by memory-mapped files
+
+    Layout of path:
+        nutrients.f32     (count x len(NUTRIENT_COLUMNS)) float32, per 100 g
+        serving_g.f32     default serving size in grams, one per row
+        piece_g.f32       weight of one piece ("an egg", "10 almonds"), 0 for foods
+                          not eaten by the piece; one per row (optional)
+        density.f32       grams per millilitre, one per row (optional)
+        names.bin         UTF-8 names concatenated; rows are sorted by name
+        name_offsets.u32  (count + 1) byte offsets into names.bin
+        meta.json         columns, count, source and content version
+
+    Rows are sorted by name, so the row number doubles as the position in
+    the name index and lookups are a binary search over mapped pages. The
+    files are only ever mapped read-only, so every worker process shares
+    the same page cache. Builds swap a complete directory into place under
+    an exclusive lock, so a worker opening the database never sees a mix of
+    old and new files, and maps it already holds stay valid.
+    """
+
+    NUTRIENTS_FILE = "nutrients.f32"
+    SERVING_FILE = "serving_g.f32"
+    PIECE_FILE = "piece_g.f32"
+    DENSITY_FILE = "density.f32"
+    NAMES_FILE = "names.bin"
+    OFFSETS_FILE = "name_offsets.u32"
+    META_FILE = "meta.json"
+    # Bumped when the meaning of a file changes (2: piece_g is 0 rather than serving_g when unset)
+    LAYOUT_REVISION = 2
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with _locked(self.path, shared=True):
+            self._open()
+
+    def _open(self):
+        self._meta_stat = self._stat_meta()
+        self.meta: Dict[str, Any] = json.loads((self.path / self.META_FILE).read_text())
+        count = self.meta["count"]
+
+        if self.meta["columns"] != list(NUTRIENT_COLUMNS):
+            raise ValueError(f"Unexpected nutrient columns in {self.path}: {self.meta['columns']}")
+
+        self._nutrients = self._map(self.NUTRIENTS_FILE, np.float32, (count, len(NUTRIENT_COLUMNS)))
+        self._serving_g = self._map(self.SERVING_FILE, np.float32, (count,))
+        if (self.path / self.PIECE_FILE).exists():
+            self._piece_g = self._map(self.PIECE_FILE, np.float32, (count,))
+        else:
+            # Databases built before piece weights were recorded
+            self._piece_g = np.zeros(count, dtype=np.float32)
+        if (self.path / self.DENSITY_FILE).exists():
+            self._density = self._map(self.DENSITY_FILE, np.float32, (count,))
+        else:
+            # Databases built before densities were recorded
+            self._density = np.full(count, DEFAULT_DENSITY_G_ML, dtype=np.float32)
+        self._offsets = self._map(self.OFFSETS_FILE, np.uint32, (count + 1,))
+        self._names = self._map(self.NAMES_FILE, np.uint8, (int(self._offsets[-1]),))
+
+    def _stat_meta(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path / self.META_FILE)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def changed_on_disk(self) -> bool:
+        """Whether a build has replaced the files this instance mapped; one stat()"""
+        current = self._stat_meta()
+        # None: a build is between moving the old directory aside and renaming the new one in
+        return current is not None and current != self._meta_stat
+
+    def _map(self, filename: str, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        if not all(shape):
+            # np.memmap can't map an empty file
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path / filename, dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def version(self) -> str:
+        """Content hash of the source data; changes whenever the data does"""
+        return self.meta["version"]
+
+    @property
+    def nutrient_matrix(self) -> np.ndarray:
+        """All per-100 g nutrient vectors, one row per food"""
+        return self._nutrients
+
+    @property
+    def serving_weights(self) -> np.ndarray:
+        """Default serving size in grams, one per food"""
+        return self._serving_g
+
+    @property
+    def piece_weights(self) -> np.ndarray:
+        """Grams per piece, one per food; 0 for foods not eaten by the piece"""
+        return self._piece_g
+
+    @property
+    def densities(self) -> np.ndarray:
+        """Grams per millilitre, one per food"""
+        return self._density
+
+    def name(self, row: int) -> str:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._names[start:end].tobytes().decode("utf-8")
+
+    def names(self) -> Iterator[Tuple[str, int]]:
+        """(name, row) for every food, in name order"""
+        for row in range(len(self)):
+            yield self.name(row), row
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Row of an exact (normalized) name, or None"""
+        target = normalize_food_name(name).encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            mid = (low + high) // 2
+            start, end = int(self._offsets[mid]), int(self._offsets[mid + 1])
+            if self._names[start:end].tobytes() < target:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self) and self.name(low).encode("utf-8") == target:
+            return low
+        return None
+
+    def nutrients(self, row: int) -> np.ndarray:
+        """Per-100 g nutrient vector, ordered as NUTRIENT_COLUMNS"""
+        # float64 so scaled values round cleanly
+        return np.asarray(self._nutrients[row], dtype=np.float64)
+
+    def serving_grams(self, row: int) -> float:
+        return float(self._serving_g[row])
+
+    def piece_grams(self, row: int) -> float:
+        return float(self._piece_g[row])
+
+    def density(self, row: int) -> float:
+        return float(self._density[row])
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "food_count": len(self),
+            "version": self.version,
+            "source": self.meta.get("source"),
+            "columns": list(NUTRIENT_COLUMNS),
+            "units": "per 100 g"
+        }
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]], path: str, source: str = "", version: str = "") -> "FoodDatabase":
+        """
+        Write a database from records with a name, NUTRIENT_COLUMNS, serving_g,
+        density_g_ml and piece_g (empty for foods not eaten by the piece)
+
+        Duplicate names keep the first record. The files are written to a
+        temporary directory and moved into place, so readers never see a
+        half-written database.
+        """
+        target = Path(path)
+        with _locked(target):
+            cls._write(records, target, source, version)
+        return cls(str(target))
+
+    @classmethod
+    def _write(cls, records: Iterable[Dict[str, Any]], target: Path, source: str, version: str):
+        """build() without the lock; callers hold it exclusively"""
+        by_name: Dict[str, Tuple[List[float], float, float, float]] = {}
+        for record in records:
+            name = normalize_food_name(record.get("name") or "")
+            if not name or name in by_name:
+                continue
+            nutrients = [float(record.get(column) or 0.0) for column in NUTRIENT_COLUMNS]
+            serving_g = float(record.get("serving_g") or DEFAULT_SERVING_G)
+            density = float(record.get("density_g_ml") or DEFAULT_DENSITY_G_ML)
+            piece_g = float(record.get("piece_g") or 0.0)
+            by_name[name] = (nutrients, serving_g, density, piece_g)
+
+        # Sort by encoded bytes, which is the order lookup() compares in
+        names = sorted(by_name, key=lambda name: name.encode("utf-8"))
+        encoded = [name.encode("utf-8") for name in names]
+        offsets = np.zeros(len(names) + 1, dtype=np.uint32)
+        offsets[1:] = np.cumsum([len(name) for name in encoded])
+        nutrients = np.array([by_name[name][0] for name in names], dtype=np.float32).reshape(-1, len(NUTRIENT_COLUMNS))
+        serving_g = np.array([by_name[name][1] for name in names], dtype=np.float32)
+        density = np.array([by_name[name][2] for name in names], dtype=np.float32)
+        piece_g = np.array([by_name[name][3] for name in names], dtype=np.float32)
+
+        tmp = target.with_name(f"{target.name}.tmp-{uuid.uuid4().hex}")
+        tmp.mkdir(parents=True)
+
+        nutrients.tofile(tmp / cls.NUTRIENTS_FILE)
+        serving_g.tofile(tmp / cls.SERVING_FILE)
+        density.tofile(tmp / cls.DENSITY_FILE)
+        piece_g.tofile(tmp / cls.PIECE_FILE)
+        offsets.tofile(tmp / cls.OFFSETS_FILE)
+        (tmp / cls.NAMES_FILE).write_bytes(b"".join(encoded))
+        (tmp / cls.META_FILE).write_text(json.dumps({
+            "columns": list(NUTRIENT_COLUMNS),
+            "count": len(names),
+            "source": source,
+            "version": version
+        }))
+
+        # A directory can only be renamed over an empty one, so move the old
+        # build aside first. Workers that mapped it keep their open files.
+        old = target.with_name(f"{target.name}.old-{uuid.uuid4().hex}")
+        if target.exists():
+            os.replace(target, old)
+        os.replace(tmp, target)
+        shutil.rmtree(old, ignore_errors=True)
+        logger.info(f"Built food database with {len(names)} foods at {target}")
+
+    @classmethod
+    def from_csv(cls, csv_path: str, path: str) -> "FoodDatabase":
+        """Build from a CSV with a name column, NUTRIENT_COLUMNS, serving_g, density_g_ml and piece_g"""
+        with _locked(Path(path)):
+            cls._write_csv(csv_path, Path(path))
+        return cls(path)
+
+    @classmethod
+    def _csv_version(cls, csv_path: str) -> str:
+        # The layout revision is hashed in too, so a format change rebuilds as a data change does
+        digest = hashlib.sha256(f"{cls.LAYOUT_REVISION}\0".encode("utf-8"))
+        digest.update(Path(csv_path).read_bytes())
+        return digest.hexdigest()[:12]
+
+    @classmethod
+    def _write_csv(cls, csv_path: str, target: Path):
+        version = cls._csv_version(csv_path)
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            cls._write(csv.DictReader(f), target, source=Path(csv_path).name, version=version)
+
+    @classmethod
+    def open_or_build(cls, csv_path: str, path: str) -> "FoodDatabase":
+        """
+        Open the database at path, building it from the CSV if needed
+
+        A database built from this CSV is rebuilt when the CSV changes; one
+        built from another source (e.g. a full USDA import) is left alone.
+        The check runs under the build lock, so when several workers start
+        together one builds and the rest open its result.
+        """
+        with _locked(Path(path)):
+            if cls._needs_build(csv_path, Path(path)):
+                cls._write_csv(csv_path, Path(path))
+        return cls(path)
+
+    @classmethod
+    def _needs_build(cls, csv_path: str, target: Path) -> bool:
+        meta_path = target / cls.META_FILE
+        if not meta_path.exists():
+            return True
+        meta = json.loads(meta_path.read_text())
+        if meta.get("source") == Path(csv_path).name and Path(csv_path).exists():
+            return meta.get("version") != cls._csv_version(csv_path)
+        return False
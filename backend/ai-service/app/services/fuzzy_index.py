@@ -0,0 +1,117 @@
+"""Trigram candidate index with edit-distance ranking for fuzzy name lookup."""
+from typing import Any, Dict, List, NamedTuple, Sequence
+import math
+
+import numpy as np
+
+
+class FuzzyCandidate(NamedTuple):
+    """A dictionary entry close to the query; score is 1.0 for an exact match"""
+    name: str
+    value: Any
+    score: float
+
+
+def trigrams(text: str) -> List[str]:
+    """Character trigrams of a word-padded string, duplicates removed"""
+    padded = f"  {text} "
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+def edit_similarity(a: str, b: str) -> float:
+    """1 - Levenshtein distance / length of the longer string"""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return 1.0 - previous[-1] / max(len(a), len(b))
+
+
+class TrigramIndex:
+    """
+    Inverted trigram index over a fixed list of names
+
+    Only names sharing a trigram with the query are ever touched. When the
+    query's rarest trigrams are selective, candidates come from those
+    posting lists alone (a name sharing none of them can't reach the Dice
+    threshold); otherwise shared counts come from one vectorized bincount.
+    Candidates above the threshold are re-ranked by edit similarity, which
+    is what the returned score reports.
+    """
+
+    # Above this many prefix postings, counting everything at once is cheaper
+    SMALL_CANDIDATE_POOL = 1024
+
+    def __init__(self, names: Sequence[str], values: Sequence[Any]):
+        if len(names) != len(values):
+            raise ValueError("names and values must be the same length")
+        self._names = list(names)
+        self._values = list(values)
+
+        postings: Dict[str, List[int]] = {}
+        gram_counts = []
+        for name_id, name in enumerate(self._names):
+            grams = trigrams(name)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(name_id)
+
+        self._gram_counts = np.asarray(gram_counts, dtype=np.float32)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def search(self, query: str, limit: int = 5, min_dice: float = 0.5, rerank: int = 20) -> List[FuzzyCandidate]:
+        """Names most similar to query, best first"""
+        query_grams = trigrams(query)
+        grams = sorted(
+            (gram for gram in query_grams if gram in self._postings),
+            key=lambda gram: len(self._postings[gram])
+        )
+
+        # Dice = 2s / (|q| + |c|) >= t needs s >= t|q| / (2 - t) shared trigrams,
+        # so any qualifying name contains one of the rarest len(grams) - s + 1
+        min_shared = max(1, math.ceil(min_dice * len(query_grams) / (2 - min_dice)))
+        if len(grams) < min_shared:
+            return []
+        prefix = [self._postings[gram] for gram in grams[:len(grams) - min_shared + 1]]
+
+        if sum(len(postings) for postings in prefix) > self.SMALL_CANDIDATE_POOL:
+            # Common trigrams: one bincount over all postings beats per-candidate checks
+            counts = np.bincount(np.concatenate([self._postings[gram] for gram in grams]), minlength=len(self._names))
+            candidates = np.flatnonzero(counts >= min_shared)
+            shared = counts[candidates].astype(np.float32)
+        else:
+            # Rare trigrams: count exactly for the few candidates; postings are sorted
+            candidates = np.unique(np.concatenate(prefix))
+            shared = np.zeros(len(candidates), dtype=np.float32)
+            for gram in grams:
+                postings = self._postings[gram]
+                positions = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+                shared += postings[positions] == candidates
+        dice = 2.0 * shared / (len(query_grams) + self._gram_counts[candidates])
+
+        keep = dice >= min_dice
+        candidates, dice = candidates[keep], dice[keep]
+        if len(candidates) > rerank:
+            best = np.argpartition(-dice, rerank - 1)[:rerank]
+            candidates = candidates[best]
+
+        ranked = [
+            FuzzyCandidate(self._names[name_id], self._values[name_id], edit_similarity(query, self._names[name_id]))
+            for name_id in candidates.tolist()
+        ]
+        ranked.sort(key=lambda candidate: candidate.score, reverse=True)
+        return ranked[:limit]
@@ -0,0 +1,106 @@
+"""Cache invalidation pub/sub, in-process or shared by workers through a file."""
+from typing import Callable, Dict, List
+import logging
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+Subscriber = Callable[[str], None]
+
+
+class InvalidationBus:
+    """
+    In-process pub/sub: publish(channel, key) calls every subscriber of channel
+
+    Subscribers are called synchronously, so once publish() returns no
+    local cache still holds the key.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.received = 0
+
+    def subscribe(self, channel: str, callback: Subscriber):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+    def publish(self, channel: str, key: str):
+        self.published += 1
+        self._deliver(channel, key)
+
+    def poll(self):
+        """Pick up messages from other processes; nothing to do in-process"""
+
+    def _deliver(self, channel: str, key: str):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"published": self.published, "received": self.received}
+
+
+class FileInvalidationBus(InvalidationBus):
+    """
+    Cross-worker stand-in for a pub/sub server, backed by an append-only file
+
+    Every uvicorn/gunicorn worker on the host opens the same path. publish()
+    delivers locally and appends one "sender channel key" line; poll() reads
+    lines appended since the last call and delivers those from other
+    workers. Polling is a single stat() when nothing changed, so callers run
+    it before each cache read: a read can't return an entry another worker
+    invalidated before the read started.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._sender = uuid.uuid4().hex
+        self._poll_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Start from the end: older messages concern entries this process never cached
+        self._offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def publish(self, channel: str, key: str):
+        super().publish(channel, key)
+        line = f"{self._sender} {channel} {key}\n".encode("utf-8")
+        # One O_APPEND write per message keeps concurrent writers' lines whole
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def poll(self):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if size == self._offset:
+            return
+
+        with self._poll_lock:
+            if size < self._offset:
+                # Truncated (e.g. rotated by an operator); start over
+                self._offset = 0
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+            # Leave a partially written last line for the next poll
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            self._offset += len(complete)
+
+        for raw in complete.decode("utf-8").splitlines():
+            parts = raw.split(" ", 2)
+            if len(parts) != 3:
+                logger.warning(f"Ignoring malformed invalidation message: {raw!r}")
+                continue
+            sender, channel, key = parts
+            if sender != self._sender:
+                self.received += 1
+                self._deliver(channel, key)
@@ -0,0 +1,174 @@
+"""BM25 inverted index for mixed Chinese/English knowledge chunks."""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import Counter
+from pathlib import Path
+import json
+import math
+import re
+import threading
+
+# ASCII words and numbers, keeping ranges and decimals like "1.6-2.2" intact
+_LATIN_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+# Function words that would otherwise match nearly every Chinese chunk
+_CJK_STOPWORDS = set("的了是在和与或及等也就都而被把对为")
+_LATIN_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "i",
+    "in", "is", "it", "of", "on", "or", "should", "the", "to", "what", "with", "do", "does"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lexical terms
+
+    English words and numbers are lowercased whole tokens. CJK runs are
+    emitted as character unigrams plus overlapping bigrams, so "蛋白质"
+    matches both "蛋白" and "白质" without a segmentation dictionary.
+    """
+    text = text.lower()
+    tokens = [t for t in _LATIN_TOKEN.findall(text) if t not in _LATIN_STOPWORDS]
+
+    for run in _CJK_RUN.findall(text):
+        tokens.extend(ch for ch in run if ch not in _CJK_STOPWORDS)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory BM25 index persisted as JSON next to the vector store
+
+    Each document keeps its text and metadata so lexical hits can be
+    returned without touching the vector store.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._reset()
+        if self.path and self.path.exists():
+            self.load()
+
+    def _reset(self):
+        self.doc_ids: List[str] = []
+        self.contents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_ids: List[str], contents: List[str], metadatas: List[Dict[str, Any]]):
+        """Index a batch of documents"""
+        with self._lock:
+            for doc_id, content, metadata in zip(doc_ids, contents, metadatas):
+                index = len(self.doc_ids)
+                terms = Counter(tokenize(content))
+                for term, tf in terms.items():
+                    self.postings.setdefault(term, {})[index] = tf
+
+                length = sum(terms.values())
+                self.doc_ids.append(doc_id)
+                self.contents.append(content)
+                self.metadatas.append(metadata)
+                self.doc_lengths.append(length)
+                self.total_length += length
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Rank documents by BM25
+
+        Each hit carries the raw BM25 `score` (higher is better) and a
+        `distance` (lower is better) on the vector store's 2 - 2 * cosine
+        scale. The distance is 2 - 2 * score / reference, clamped at 0, where
+        the reference is the score of an average-length document containing
+        each query term once. `coverage` is the fraction of distinct query
+        terms the document contains, which callers use to judge lexical
+        confidence.
+        """
+        query_terms = set(tokenize(query))
+        doc_count = len(self.doc_ids)
+        if not query_terms or doc_count == 0:
+            return []
+
+        avg_length = self.total_length / doc_count
+        scores: Dict[int, float] = {}
+        matched: Counter = Counter()
+        # A term occurring once in an average-length document contributes idf
+        reference_score = 0.0
+
+        for term in query_terms:
+            postings = self.postings.get(term) or {}
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            reference_score += idf
+            for index, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[index] / avg_length)
+                scores[index] = scores.get(index, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[index] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            {
+                "id": self.doc_ids[index],
+                "content": self.contents[index],
+                "metadata": self.metadatas[index],
+                "score": score,
+                "distance": max(0.0, 2.0 - 2.0 * score / reference_score),
+                "coverage": matched[index] / len(query_terms)
+            }
+            for index, score in ranked
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+        if self.path and self.path.exists():
+            self.path.unlink()
+
+    def save(self):
+        """Write the index to disk atomically"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "doc_ids": self.doc_ids,
+                "contents": self.contents,
+                "metadatas": self.metadatas,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings
+            }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def load(self):
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        with self._lock:
+            self.doc_ids = data["doc_ids"]
+            self.contents = data["contents"]
+            self.metadatas = data["metadatas"]
+            self.doc_lengths = data["doc_lengths"]
+            # JSON object keys are strings; restore integer document indices
+            self.postings = {
+                term: {int(index): tf for index, tf in postings.items()}
+                for term, postings in data["postings"].items()
+            }
+            self.total_length = sum(self.doc_lengths)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked id lists; score = sum of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,190 @@
+"""Structured LLM extraction for descriptions the rule parser can't read."""
+from typing import Any, Dict, List, Literal, Optional, Type, TypeVar
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from ..config import get_settings
+from .cache import LRUCache
+from .quantity_engine import FOOD_UNITS
+
+logger = logging.getLogger(__name__)
+
+FoodUnit = Literal[tuple(unit for unit in FOOD_UNITS if unit is not None)]
+
+
+class ExtractedFood(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    name: str = Field(min_length=1, max_length=80, description="Common English food name, singular")
+    quantity: float = Field(gt=0, le=10000)
+    unit: FoodUnit
+    # Estimates for the stated amount; used only when the food isn't in our database
+    calories: float = Field(ge=0, le=10000)
+    protein: float = Field(ge=0, le=1000)
+    carbs: float = Field(ge=0, le=1000)
+    fat: float = Field(ge=0, le=1000)
+    fiber: float = Field(ge=0, le=500)
+
+
+class ExtractedExercise(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    name: str = Field(min_length=1, max_length=80, description="Common English exercise name")
+    duration_minutes: Optional[float] = Field(default=None, gt=0, le=1440)
+    repetitions: Optional[int] = Field(default=None, gt=0, le=10000)
+    met: float = Field(ge=1, le=25, description="Metabolic equivalent of the activity")
+    intensity: Optional[Literal["low", "moderate", "high", "very_high"]] = None
+
+
+class FoodExtraction(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    foods: List[ExtractedFood] = Field(max_length=30)
+
+
+class ExerciseExtraction(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    exercises: List[ExtractedExercise] = Field(max_length=30)
+
+
+ExtractionT = TypeVar("ExtractionT", FoodExtraction, ExerciseExtraction)
+
+EXTRACTION_PROMPT = """Extract every {kind} the user mentions, in any language.
+Reply with one JSON object and nothing else, matching this JSON schema exactly:
+{schema}
+Use English names. If nothing matches, reply with an empty list."""
+
+# What each extraction asks the model to find
+_KIND_DESCRIPTIONS = {"foods": "food or drink", "exercises": "exercise or physical activity"}
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def normalize_description(text: str) -> str:
+    """Cache key for a description: lowercased, whitespace collapsed, edge punctuation dropped"""
+    return " ".join(text.lower().split()).strip(" .,!?;:。，！？；：")
+
+
+class RateLimiter:
+    """
+    Per-key token bucket: `per_minute` calls, refilled continuously
+
+    Buckets live in an LRU so idle users don't accumulate.
+    """
+
+    def __init__(self, per_minute: int, max_keys: int = 10000):
+        self.capacity = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self._buckets = LRUCache(max_entries=max_keys)
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.refill_per_second)
+            allowed = tokens >= 1
+            self._buckets.set(key, (tokens - 1 if allowed else tokens, now))
+            return allowed
+
+
+class LLMExtractor:
+    """
+    Fallback extractor that asks the chat model for schema-checked JSON
+
+    Results are cached by normalized text, so the same description is sent
+    to the model once; callers are rate-limited per user. Anything that
+    fails (limit reached, timeout, invalid JSON or schema) returns None and
+    the caller keeps its rule-based result.
+    """
+
+    def __init__(self, llm: Any = None):
+        settings = get_settings()
+        self.enabled = settings.llm_extraction_enabled and (llm is not None or bool(settings.openai_api_key))
+        self.timeout_seconds = settings.llm_extraction_timeout_seconds
+        self.cache = LRUCache(
+            max_entries=settings.llm_extraction_cache_entries,
+            ttl_seconds=settings.llm_extraction_cache_ttl_seconds
+        )
+        self.rate_limiter = RateLimiter(settings.llm_extraction_per_minute)
+        self._llm = llm
+        self.calls = 0
+        self.failures = 0
+        self.rate_limited = 0
+
+    def _get_llm(self) -> Any:
+        # Built on first escalation so the rule path never pays for the client
+        if self._llm is None:
+            from langchain_openai import ChatOpenAI
+            settings = get_settings()
+            self._llm = ChatOpenAI(
+                openai_api_key=settings.openai_api_key,
+                openai_api_base=os.getenv("OPENAI_API_BASE", "https://api.siliconflow.cn/v1"),
+                model_name=settings.default_model,
+                temperature=0,
+                max_tokens=800,
+                model_kwargs={"response_format": {"type": "json_object"}}
+            )
+        return self._llm
+
+    async def extract_foods(self, text: str, user_id: Optional[str] = None) -> Optional[FoodExtraction]:
+        return await self._extract("foods", FoodExtraction, text, user_id)
+
+    async def extract_exercises(self, text: str, user_id: Optional[str] = None) -> Optional[ExerciseExtraction]:
+        return await self._extract("exercises", ExerciseExtraction, text, user_id)
+
+    async def _extract(self, kind: str, schema: Type[ExtractionT], text: str, user_id: Optional[str]) -> Optional[ExtractionT]:
+        if not self.enabled:
+            return None
+
+        key = (kind, normalize_description(text))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        if not self.rate_limiter.allow(user_id or "anonymous"):
+            self.rate_limited += 1
+            return None
+
+        self.calls += 1
+        try:
+            from langchain.schema import HumanMessage, SystemMessage
+            messages = [
+                SystemMessage(content=EXTRACTION_PROMPT.format(
+                    kind=_KIND_DESCRIPTIONS[kind],
+                    schema=json.dumps(schema.model_json_schema())
+                )),
+                HumanMessage(content=text)
+            ]
+            response = await asyncio.wait_for(self._get_llm().agenerate([messages]), timeout=self.timeout_seconds)
+            raw = response.generations[0][0].text
+            # Some providers wrap the object in prose or code fences despite json mode
+            match = _JSON_OBJECT.search(raw)
+            result = schema.model_validate_json(match.group(0) if match else raw)
+        except (ValidationError, asyncio.TimeoutError) as e:
+            self.failures += 1
+            logger.warning(f"LLM {kind} extraction rejected: {str(e)}")
+            return None
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"LLM {kind} extraction failed: {str(e)}")
+            return None
+
+        self.cache.set(key, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "llm_calls": self.calls,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "cache": self.cache.stats()
+        }
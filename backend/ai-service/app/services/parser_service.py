@@ -1,170 +1,627 @@
-from typing import List, Dict, Optional
+from typing import Any, Awaitable, Callable, List, Dict, NamedTuple, Optional, Tuple
+from pathlib import Path
+import asyncio
+import csv
+import hashlib
+import logging
+import os
+import pickle
 import re
+import time
+import uuid
+
+import numpy as np
 
 from ..models.nutrition import FoodItem, ExerciseItem
+from ..config import get_settings
+from .food_database import FoodDatabase, NUTRIENT_COLUMNS
+from .text_matcher import AhoCorasickMatcher, TextMatch
+from .fuzzy_index import TrigramIndex
+from .quantity_scanner import NumberToken, attach_quantities, scan_numbers
+from .quantity_engine import QuantityEngine
+from .zh_segmenter import CJK_CHAR, ZhSegmentation, ZhSegmenter
+from .llm_extractor import ExtractedExercise, ExtractedFood, LLMExtractor, normalize_description
+from .cache import LRUCache
+from .exercise_engine import DEFAULT_INTENSITY, INTENSITY_WORDS, ExerciseEngine, intensity_for_met
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z][a-z'-]*")
+
+EXACT_MATCH_CONFIDENCE = 0.8
+LLM_EXTRACTION_CONFIDENCE = 0.6  # Food or exercise the model named and we know
+LLM_ESTIMATE_CONFIDENCE = 0.5  # Values estimated by the model itself
+# Words that never name a food on their own; don't fuzzy-match them
+_FUZZY_SKIP_WORDS = {
+    "breakfast", "lunch", "dinner", "snack", "with", "some", "have", "had", "ate", "eaten",
+    "then", "also", "and", "the", "for", "cup", "cups", "slice", "slices", "piece", "pieces",
+    "serving", "servings", "bowl", "glass", "plate", "small", "large", "medium", "half"
+}
+_MAX_FUZZY_WORDS = 3
+
+class FoodMention(NamedTuple):
+    """A food found in a description; estimated foods carry their own nutrients"""
+    row: Optional[int]
+    quantity: Optional[str]
+    number: Optional[NumberToken]
+    confidence: float
+    name: Optional[str] = None
+    nutrients: Optional[Tuple[float, ...]] = None  # For the stated amount, NUTRIENT_COLUMNS order
+
+class ExerciseMention(NamedTuple):
+    """An activity found in a description; activities outside the compendium carry their own MET"""
+    activity: str
+    intensity: str
+    duration: Optional[int]
+    reps: Optional[int]
+    confidence: float
+    met: Optional[float] = None
+
+# Bumped when the matcher classes change shape, so older pickled name indexes are ignored
+NAME_INDEX_REVISION = 1
+
+class FoodNameIndex(NamedTuple):
+    """Matchers over every food name and alias, pickled into the database directory"""
+    matcher: AhoCorasickMatcher
+    fuzzy_index: TrigramIndex
+    zh_names: Dict[str, int]  # Chinese names, for the segmenter's lexicon
+
+# Rough pace for rep-based exercises, and the duration assumed when none is given
+REPS_PER_MINUTE = 20
+DEFAULT_EXERCISE_MINUTES = 10
+DEFAULT_WEIGHT_KG = 70
 
 class ParserService:
     def __init__(self):
-        # Basic food database (simplified for MVP)
-        self.food_database = {
-            "apple": {"calories": 95, "protein": 0.5, "carbs": 25, "fat": 0.3, "fiber": 4},
-            "banana": {"calories": 105, "protein": 1.3, "carbs": 27, "fat": 0.4, "fiber": 3},
-            "bread": {"calories": 80, "protein": 3, "carbs": 15, "fat": 1, "fiber": 2},
-            "chicken breast": {"calories": 165, "protein": 31, "carbs": 0, "fat": 3.6, "fiber": 0},
-            "rice": {"calories": 130, "protein": 2.7, "carbs": 28, "fat": 0.3, "fiber": 0.4},
-            "egg": {"calories": 70, "protein": 6, "carbs": 0.5, "fat": 5, "fiber": 0},
-            "milk": {"calories": 150, "protein": 8, "carbs": 12, "fat": 8, "fiber": 0},
-            "yogurt": {"calories": 100, "protein": 10, "carbs": 12, "fat": 0, "fiber": 0},
-            "oats": {"calories": 150, "protein": 5, "carbs": 27, "fat": 3, "fiber": 4}
-        }
+        settings = get_settings()
+        self.food_aliases_csv = settings.food_aliases_csv
+        self.fuzzy_min_score = settings.food_fuzzy_min_score
         
-        # Exercise database (calories per minute for 70kg person)
-        self.exercise_database = {
-            "running": 10,
-            "walking": 4,
-            "cycling": 8,
-            "swimming": 12,
-            "push-ups": 8,
-            "squats": 6,
-            "planks": 3,
-            "jumping jacks": 9
-        }
+        # MET compendium (activity x intensity)
+        self.exercise_engine = ExerciseEngine.from_csv(settings.met_compendium_csv)
+        
+        # Exercise names and aliases ("ran", "慢跑") -> (activity, intensity the alias implies)
+        self.exercise_names = {name: (name, None) for name in self.exercise_engine.activities}
+        for alias, entry in self._load_exercise_aliases(settings.exercise_aliases_csv).items():
+            self.exercise_names.setdefault(alias, entry)
+        
+        # Built once; finds every mention in a single pass over the text
+        self.exercise_matcher = AhoCorasickMatcher(
+            {alias: entry for alias, entry in self.exercise_names.items() if not CJK_CHAR.search(alias)}
+        )
+        self.intensity_matcher = AhoCorasickMatcher(
+            {word: level for word, level in INTENSITY_WORDS.items() if not CJK_CHAR.search(word)}
+        )
+        
+        # Food composition database, memory-mapped and shared across workers
+        self._open_food_db(FoodDatabase.open_or_build(settings.food_database_csv, settings.food_database_path))
+        
+        # Low-confidence or empty parses escalate to a cached, rate-limited LLM call
+        self.llm_extractor = LLMExtractor()
+        self.escalation_confidence = settings.llm_extraction_min_confidence
+        self.parse_requests = 0
+        self.escalations = 0
+        
+        # Parsed mentions of repeated descriptions ("oats and milk" every morning)
+        self.food_parse_cache = LRUCache(max_entries=settings.parse_cache_entries)
+        self.exercise_parse_cache = LRUCache(max_entries=settings.parse_cache_entries)
+    
+    def _open_food_db(self, food_db: FoodDatabase):
+        """Point the parser at a food database; the matchers over its names load on first use"""
+        self.food_db = food_db
+        self.quantity_engine = QuantityEngine(food_db)
+        self._food_name_index: Optional[FoodNameIndex] = None
+        self._zh_segmenter: Optional[ZhSegmenter] = None
+    
+    @property
+    def food_matcher(self) -> AhoCorasickMatcher:
+        return self._food_names().matcher
+    
+    @property
+    def food_fuzzy_index(self) -> TrigramIndex:
+        return self._food_names().fuzzy_index
     
-    async def parse_food_description(self, text: str) -> List[FoodItem]:
+    @property
+    def zh_segmenter(self) -> ZhSegmenter:
+        # Chinese has no spaces, so its names go to a segmenter that also
+        # reads Chinese numerals and measure words
+        if self._zh_segmenter is None:
+            zh_lexicon = {word: ("intensity", level) for word, level in INTENSITY_WORDS.items() if CJK_CHAR.search(word)}
+            zh_lexicon.update((alias, ("exercise", entry)) for alias, entry in self.exercise_names.items() if CJK_CHAR.search(alias))
+            zh_lexicon.update((name, ("food", row)) for name, row in self._food_names().zh_names.items())
+            self._zh_segmenter = ZhSegmenter(zh_lexicon)
+        return self._zh_segmenter
+    
+    def _food_names(self) -> FoodNameIndex:
+        if self._food_name_index is None:
+            self._food_name_index = self._load_food_name_index()
+        return self._food_name_index
+    
+    def _food_name_index_path(self) -> Optional[Path]:
+        """Pickle of the name index, keyed by database version and alias file contents"""
+        if not self.food_db.version:
+            return None
+        try:
+            aliases = hashlib.sha256(Path(self.food_aliases_csv).read_bytes()).hexdigest()[:12]
+        except FileNotFoundError:
+            aliases = "none"
+        return self.food_db.path / f"name_index-{NAME_INDEX_REVISION}-{self.food_db.version}-{aliases}.pkl"
+    
+    def _load_food_name_index(self) -> FoodNameIndex:
+        """
+        Load the name index pickled next to the database, building it if needed
+        
+        The automaton and trigram index are pure Python and take seconds to
+        build over a full USDA import, so the first worker to need them
+        writes them out and the rest unpickle that file (several times
+        faster). Each worker still holds its own copy in memory.
+        """
+        path = self._food_name_index_path()
+        if path is not None and path.exists():
+            try:
+                with open(path, "rb") as f:
+                    return pickle.load(f)
+            except Exception as e:
+                logger.warning(f"Rebuilding unreadable food name index {path}: {e}")
+        
+        started_at = time.perf_counter()
+        # Canonical names plus aliases (colloquial, plural, Chinese), name -> row
+        food_names = dict(self.food_db.names())
+        for alias, row in self._load_food_aliases(self.food_aliases_csv).items():
+            food_names.setdefault(alias, row)
+        index = FoodNameIndex(
+            matcher=AhoCorasickMatcher({name: row for name, row in food_names.items() if not CJK_CHAR.search(name)}),
+            fuzzy_index=TrigramIndex(list(food_names), list(food_names.values())),
+            zh_names={name: row for name, row in food_names.items() if CJK_CHAR.search(name)}
+        )
+        logger.info(f"Built food name index over {len(food_names)} names in {time.perf_counter() - started_at:.2f}s")
+        
+        if path is not None:
+            tmp_path = path.with_name(f"{path.name}.tmp-{uuid.uuid4().hex}")
+            try:
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not save food name index to {path}: {e}")
+                tmp_path.unlink(missing_ok=True)
+        return index
+    
+    def _reload_food_db_if_changed(self):
+        """
+        Pick up a database rebuilt under this process (new CSV, or
+        scripts/build_food_database.py); costs one stat() per call
+        """
+        if not self.food_db.changed_on_disk():
+            return
+        previous_version = self.food_db.version
+        self._open_food_db(FoodDatabase(str(self.food_db.path)))
+        # Cached mentions hold rows of the old database
+        self.food_parse_cache.clear()
+        logger.info(f"Reloaded food database: version {previous_version} -> {self.food_db.version}")
+    
+    async def parse_food_description(self, text: str, user_id: Optional[str] = None) -> List[FoodItem]:
         """
         Parse food description into FoodItem objects
         """
-        foods = []
-        text_lower = text.lower()
-        
-        # Simple pattern matching for quantities and foods
-        for food_name, nutrition in self.food_database.items():
-            if food_name in text_lower:
-                # Try to extract quantity
-                quantity = self._extract_quantity(text_lower, food_name)
-                multiplier = self._quantity_to_multiplier(quantity)
-                
-                food_item = FoodItem(
-                    name=food_name.title(),
-                    quantity=quantity or "1 serving",
-                    calories=nutrition["calories"] * multiplier,
-                    protein=nutrition["protein"] * multiplier,
-                    carbs=nutrition["carbs"] * multiplier,
-                    fat=nutrition["fat"] * multiplier,
-                    fiber=nutrition.get("fiber", 0) * multiplier,
-                    confidence=0.8
-                )
-                foods.append(food_item)
-        
-        return foods
-    
-    async def parse_exercise_description(self, text: str, user_weight: Optional[float] = None) -> List[ExerciseItem]:
+        foods, _ = await self.parse_food_batch([text], user_id=user_id)
+        return foods[0]
+    
+    async def parse_food_batch(
+        self,
+        texts: List[str],
+        user_id: Optional[str] = None
+    ) -> Tuple[List[List[FoodItem]], np.ndarray]:
         """
-        Parse exercise description into ExerciseItem objects
+        Parse many food descriptions at once
+        
+        Every mention across all texts is converted to grams with one
+        lookup into the quantity engine's table and priced in one matrix
+        product (foods x nutrients scaled by grams eaten). Texts the rules
+        read poorly are re-read by the LLM extractor. Returns the FoodItems
+        per text and a (len(texts), len(NUTRIENT_COLUMNS)) array of per-text
+        totals.
         """
-        exercises = []
-        text_lower = text.lower()
-        weight_kg = user_weight or 70  # Default to 70kg
-        
-        for exercise_name, cals_per_min in self.exercise_database.items():
-            if exercise_name in text_lower:
-                # Extract duration or reps
-                duration = self._extract_duration(text_lower, exercise_name)
-                reps = self._extract_reps(text_lower, exercise_name)
-                
-                if duration:
-                    calories_burned = cals_per_min * duration * (weight_kg / 70)
-                    exercise_item = ExerciseItem(
-                        name=exercise_name.title(),
-                        duration=duration,
-                        calories_burned=round(calories_burned, 1),
-                        intensity="moderate",
-                        confidence=0.8
-                    )
-                elif reps:
-                    # Estimate calories for rep-based exercises
-                    estimated_duration = reps / 20  # Rough estimate: 20 reps per minute
-                    calories_burned = cals_per_min * estimated_duration * (weight_kg / 70)
-                    exercise_item = ExerciseItem(
-                        name=exercise_name.title(),
-                        repetitions=reps,
-                        calories_burned=round(calories_burned, 1),
-                        intensity="moderate",
-                        confidence=0.7
-                    )
-                else:
-                    # Default assumption: 10 minutes
-                    calories_burned = cals_per_min * 10 * (weight_kg / 70)
-                    exercise_item = ExerciseItem(
-                        name=exercise_name.title(),
-                        duration=10,
-                        calories_burned=round(calories_burned, 1),
-                        intensity="moderate",
-                        confidence=0.6
-                    )
-                
-                exercises.append(exercise_item)
+        self._reload_food_db_if_changed()
+        mentions = await self._mentions(
+            texts,
+            self.food_parse_cache,
+            ("food", self.food_db.version),
+            self._food_mentions,
+            self.llm_extractor.extract_foods,
+            lambda extraction: [self._extracted_food_mention(food) for food in extraction.foods],
+            user_id
+        )
         
-        return exercises
+        flat = [mention for text_mentions in mentions for mention in text_mentions]
+        entry_index = np.repeat(np.arange(len(texts)), [len(text_mentions) for text_mentions in mentions])
+        
+        # Estimated foods have no row; price row 0 and overwrite below
+        rows = np.array([mention.row or 0 for mention in flat], dtype=np.intp)
+        grams = self.quantity_engine.grams_batch(
+            rows,
+            [mention.number.value if mention.number else 1.0 for mention in flat],
+            [mention.number.unit if mention.number else None for mention in flat]
+        )
+        amounts = self.food_db.nutrient_matrix[rows].astype(np.float64) * (grams / 100)[:, None]
+        for position, mention in enumerate(flat):
+            if mention.row is None:
+                amounts[position] = mention.nutrients
+        amounts = amounts.round(1)
+        
+        totals = np.zeros((len(texts), len(NUTRIENT_COLUMNS)))
+        np.add.at(totals, entry_index, amounts)
+        
+        foods: List[List[FoodItem]] = [[] for _ in texts]
+        for entry, mention, (calories, protein, carbs, fat, fiber) in zip(entry_index.tolist(), flat, amounts.tolist()):
+            foods[entry].append(FoodItem(
+                name=(mention.name or self.food_db.name(mention.row)).title(),
+                quantity=mention.quantity or self.quantity_engine.describe("1", None, mention.row),
+                calories=calories,
+                protein=protein,
+                carbs=carbs,
+                fat=fat,
+                fiber=fiber,
+                confidence=mention.confidence
+            ))
+        
+        return foods, totals.round(1)
+    
+    async def _mentions(
+        self,
+        texts: List[str],
+        cache: LRUCache,
+        key_prefix: Tuple,
+        parse: Callable[[str], list],
+        extract: Callable[[str, Optional[str]], Awaitable[Any]],
+        from_extraction: Callable[[Any], list],
+        user_id: Optional[str]
+    ) -> List[list]:
+        """
+        Mentions for each text: cached, else parsed by the rules, escalating poor parses
+        
+        Entries are keyed by normalized text (plus the food database version
+        for foods), so a reloaded database never serves stale rows. Mentions don't
+        depend on body weight; calories are priced per request from them.
+        """
+        normalized = [normalize_description(text) for text in texts]
+        keys = [key_prefix + (text,) for text in normalized]
+        self.parse_requests += len(texts)
+        
+        # Each distinct description is parsed and escalated once per batch,
+        # so repeats don't spend the user's LLM budget twice
+        first_index: Dict[Tuple, int] = {}
+        for index, key in enumerate(keys):
+            first_index.setdefault(key, index)
+        resolved = {key: cache.get(key) for key in first_index}
+        misses = [key for key, cached in resolved.items() if cached is None]
+        for key in misses:
+            resolved[key] = parse(normalized[first_index[key]])
+        
+        escalate = [key for key in misses if self._needs_escalation([mention.confidence for mention in resolved[key]])]
+        failed = set()
+        if escalate:
+            self.escalations += len(escalate)
+            extractions = await asyncio.gather(*(extract(texts[first_index[key]], user_id) for key in escalate))
+            for key, extraction in zip(escalate, extractions):
+                if extraction is None:
+                    # Don't pin a poor parse; a later request may escalate successfully
+                    failed.add(key)
+                    continue
+                extracted = from_extraction(extraction)
+                if extracted:
+                    resolved[key] = extracted
+        
+        for key in misses:
+            if key not in failed:
+                cache.set(key, tuple(resolved[key]))
+        return [list(resolved[key]) for key in keys]
+    
+    def _needs_escalation(self, confidences: List[float]) -> bool:
+        return self.llm_extractor.enabled and (not confidences or min(confidences) < self.escalation_confidence)
+    
+    def _food_mentions(self, text_lower: str) -> List[FoodMention]:
+        """
+        Find foods in lowercased text
+        """
+        # One pass over the text; longest non-overlapping mentions win,
+        # then misspelled names are looked up in what's left
+        zh = self._segment_zh(text_lower)
+        exact_matches = self.food_matcher.find_all(text_lower) + self._zh_words(zh, "food")
+        mentions = [(match, EXACT_MATCH_CONFIDENCE) for match in exact_matches]
+        mentions.extend(self._fuzzy_food_matches(text_lower, exact_matches))
+        mentions.sort(key=lambda mention: mention[0].start)
+        
+        # One scan pairs every mention with its number and unit
+        numbers = sorted(scan_numbers(text_lower) + zh.numbers, key=lambda number: number.start)
+        scanned = attach_quantities(text_lower, [match for match, _ in mentions], numbers)
+        
+        found = []
+        for (match, confidence), quantity_token in zip(mentions, (item.number for item in scanned)):
+            # Numbers with a non-food unit ("30 minutes") don't measure the food
+            if quantity_token is not None and not self.quantity_engine.is_food_unit(quantity_token.unit):
+                quantity_token = None
+            quantity = self.quantity_engine.describe(quantity_token.raw, quantity_token.unit, match.value) if quantity_token else None
+            found.append(FoodMention(match.value, quantity, quantity_token, confidence))
+        return found
     
-    def _extract_quantity(self, text: str, food_name: str) -> Optional[str]:
+    def _extracted_food_mention(self, food: ExtractedFood) -> FoodMention:
         """
-        Extract quantity from text
+        Price an LLM-extracted food from the database when we know it
         """
-        # Look for numbers before the food name
-        pattern = r'(\d+\.?\d*)\s*(?:cups?|slices?|pieces?|servings?)?\s*' + re.escape(food_name)
-        match = re.search(pattern, text)
-        if match:
-            return f"{match.group(1)} serving(s)"
+        number = NumberToken(0, 0, f"{food.quantity:g}", food.quantity, food.unit, False)
+        quantity = self.quantity_engine.describe(number.raw, number.unit)
+        row = self._resolve_food_name(food.name)
+        if row is not None:
+            return FoodMention(row, quantity, number, LLM_EXTRACTION_CONFIDENCE)
+        nutrients = (food.calories, food.protein, food.carbs, food.fat, food.fiber)
+        return FoodMention(None, quantity, None, LLM_ESTIMATE_CONFIDENCE, name=food.name.lower(), nutrients=nutrients)
+    
+    def _resolve_food_name(self, name: str) -> Optional[int]:
+        row = self.food_db.lookup(name)
+        if row is not None:
+            return row
+        candidates = self.food_fuzzy_index.search(name.lower(), limit=1)
+        if candidates and candidates[0].score >= self.fuzzy_min_score:
+            return candidates[0].value
         return None
     
-    def _quantity_to_multiplier(self, quantity: Optional[str]) -> float:
+    async def parse_exercise_description(
+        self,
+        text: str,
+        user_weight: Optional[float] = None,
+        user_id: Optional[str] = None
+    ) -> List[ExerciseItem]:
         """
-        Convert quantity string to multiplier
+        Parse exercise description into ExerciseItem objects
         """
-        if not quantity:
-            return 1.0
+        exercises = await self.parse_exercise_batch([text], [user_weight], user_id=user_id)
+        return exercises[0]
+    
+    async def parse_exercise_batch(
+        self,
+        texts: List[str],
+        user_weights: Optional[List[Optional[float]]] = None,
+        user_id: Optional[str] = None
+    ) -> List[List[ExerciseItem]]:
+        """
+        Parse many exercise descriptions at once
+        
+        METs for every activity across all texts come from one lookup into
+        the compendium table, and calories (MET x kg x hours) from one
+        array expression. Texts the rules read poorly are re-read by the
+        LLM extractor.
+        """
+        weights = [weight or DEFAULT_WEIGHT_KG for weight in (user_weights or [None] * len(texts))]
+        # The Chinese segmenter's lexicon includes food names
+        self._reload_food_db_if_changed()
+        mentions = await self._mentions(
+            texts,
+            self.exercise_parse_cache,
+            ("exercise",),
+            self._exercise_mentions,
+            self.llm_extractor.extract_exercises,
+            lambda extraction: [self._extracted_exercise_mention(exercise) for exercise in extraction.exercises],
+            user_id
+        )
+        
+        flat = [mention for text_mentions in mentions for mention in text_mentions]
+        entry_index = np.repeat(np.arange(len(texts)), [len(text_mentions) for text_mentions in mentions])
+        
+        # Activities outside the compendium bring their own MET; look up a placeholder and overwrite
+        placeholder = self.exercise_engine.activities[0]
+        mets = self.exercise_engine.mets(
+            [placeholder if mention.met is not None else mention.activity for mention in flat],
+            [mention.intensity for mention in flat]
+        )
+        for position, mention in enumerate(flat):
+            if mention.met is not None:
+                mets[position] = mention.met
+        minutes = np.array([
+            mention.duration or (mention.reps / REPS_PER_MINUTE if mention.reps else DEFAULT_EXERCISE_MINUTES)
+            for mention in flat
+        ], dtype=np.float64)
+        calories = self.exercise_engine.calories(mets, np.asarray(weights, dtype=np.float64)[entry_index], minutes).round(1)
+        
+        exercises: List[List[ExerciseItem]] = [[] for _ in texts]
+        for entry, mention, calories_burned in zip(entry_index.tolist(), flat, calories.tolist()):
+            exercises[entry].append(ExerciseItem(
+                name=mention.activity.title(),
+                duration=mention.duration or (None if mention.reps else DEFAULT_EXERCISE_MINUTES),
+                repetitions=mention.reps,
+                calories_burned=calories_burned,
+                intensity=mention.intensity,
+                confidence=mention.confidence
+            ))
         
-        # Extract number from quantity
-        match = re.search(r'(\d+\.?\d*)', quantity)
-        if match:
-            return float(match.group(1))
-        return 1.0
+        return exercises
     
-    def _extract_duration(self, text: str, exercise_name: str) -> Optional[int]:
+    def _exercise_mentions(self, text_lower: str) -> List[ExerciseMention]:
         """
-        Extract duration in minutes
+        Find activities in lowercased text with their duration or reps and intensity
         """
-        # Look for patterns like "30 minutes", "for 20 min"
-        patterns = [
-            r'(\d+)\s*(?:minutes?|mins?)',
-            r'for\s*(\d+)',
-            r'(\d+)\s*' + re.escape(exercise_name)
-        ]
+        # One pass over the text for mentions, one for their numbers and units
+        zh = self._segment_zh(text_lower)
+        mentions = sorted(self.exercise_matcher.find_all(text_lower) + self._zh_words(zh, "exercise"))
+        numbers = sorted(scan_numbers(text_lower) + zh.numbers, key=lambda number: number.start)
+        intensity_words = sorted(self.intensity_matcher.find_all(text_lower) + self._zh_words(zh, "intensity"))
         
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                return int(match.group(1))
-        return None
+        found = []
+        for (match, quantity_token), level in zip(
+            attach_quantities(text_lower, mentions, numbers),
+            self._attach_intensities(mentions, intensity_words)
+        ):
+            activity, alias_level = match.value
+            # Extract duration or reps
+            duration = self._extract_duration(quantity_token)
+            reps = None if duration else self._extract_reps(quantity_token)
+            confidence = 0.8 if duration else 0.7 if reps else 0.6
+            found.append(ExerciseMention(activity, level or alias_level or DEFAULT_INTENSITY, duration, reps, confidence))
+        return found
+    
+    def _attach_intensities(self, mentions: List[TextMatch], words: List[TextMatch]) -> List[Optional[str]]:
+        """
+        Intensity level for each mention from the words in its clause
+        
+        A word just before the mention ("easy jog", "brisk walk") wins over
+        one after it ("ran fast"); words never cross into another mention.
+        """
+        levels = []
+        for index, mention in enumerate(mentions):
+            previous_end = mentions[index - 1].end if index else 0
+            next_start = mentions[index + 1].start if index + 1 < len(mentions) else None
+            before = [word for word in words if word.start >= previous_end and word.end <= mention.start]
+            after = [
+                word for word in words
+                if word.start >= mention.end and (next_start is None or word.end <= next_start)
+            ]
+            level = before[-1].value if before else after[0].value if after else None
+            levels.append(level)
+        return levels
+    
+    def _extracted_exercise_mention(self, exercise: ExtractedExercise) -> ExerciseMention:
+        """
+        Use the compendium for LLM-extracted activities we know, the model's MET otherwise
+        """
+        duration = int(round(exercise.duration_minutes)) if exercise.duration_minutes else None
+        reps = None if duration else exercise.repetitions
+        matches = self.exercise_matcher.find_all(exercise.name.lower())
+        if matches:
+            activity, alias_level = matches[0].value
+            intensity = exercise.intensity or alias_level or DEFAULT_INTENSITY
+            return ExerciseMention(activity, intensity, duration, reps, LLM_EXTRACTION_CONFIDENCE)
+        return ExerciseMention(
+            exercise.name.lower(),
+            exercise.intensity or intensity_for_met(exercise.met),
+            duration,
+            reps,
+            LLM_EXTRACTION_CONFIDENCE,
+            met=exercise.met
+        )
     
-    def _extract_reps(self, text: str, exercise_name: str) -> Optional[int]:
+    def _segment_zh(self, text: str) -> ZhSegmentation:
         """
-        Extract repetitions
+        Chinese food/exercise words and quantities; skipped for text without Chinese
         """
-        # Look for patterns like "20 push-ups", "did 15"
-        patterns = [
-            r'(\d+)\s*' + re.escape(exercise_name),
-            r'did\s*(\d+)',
-            r'(\d+)\s*reps?'
+        if not CJK_CHAR.search(text):
+            return ZhSegmentation([], [])
+        return self.zh_segmenter.segment(text)
+    
+    def _zh_words(self, zh: ZhSegmentation, kind: str) -> List[TextMatch]:
+        return [
+            TextMatch(word.start, word.end, word.key, word.value[1])
+            for word in zh.words if word.value[0] == kind
         ]
+    
+    def _fuzzy_food_matches(self, text: str, exact_matches: List[TextMatch]) -> List[Tuple[TextMatch, float]]:
+        """
+        Fuzzy-match runs of words not covered by an exact match
+        
+        Tries the longest phrase (up to three words) at each position first,
+        so "chiken brest" resolves as one food rather than two guesses.
+        """
+        runs: List[List[re.Match]] = []
+        previous_end = None
+        for word in _WORD.finditer(text):
+            if any(match.start < word.end() and word.start() < match.end for match in exact_matches):
+                previous_end = None
+                continue
+            # A run continues only across whitespace
+            if previous_end is not None and not text[previous_end:word.start()].isspace():
+                previous_end = None
+            if previous_end is None:
+                runs.append([])
+            runs[-1].append(word)
+            previous_end = word.end()
         
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                return int(match.group(1))
+        mentions = []
+        for words in runs:
+            position = 0
+            while position < len(words):
+                for size in range(min(_MAX_FUZZY_WORDS, len(words) - position), 0, -1):
+                    first, last = words[position], words[position + size - 1]
+                    phrase = text[first.start():last.end()]
+                    if size == 1 and (len(phrase) < 4 or phrase in _FUZZY_SKIP_WORDS):
+                        continue
+                    candidates = self.food_fuzzy_index.search(phrase, limit=1)
+                    if candidates and candidates[0].score >= self.fuzzy_min_score:
+                        match = TextMatch(first.start(), last.end(), candidates[0].name, candidates[0].value)
+                        mentions.append((match, round(EXACT_MATCH_CONFIDENCE * candidates[0].score, 2)))
+                        position += size
+                        break
+                else:
+                    position += 1
+        return mentions
+    
+    def _load_food_aliases(self, path: str) -> Dict[str, int]:
+        """
+        Map each alias to the row of the food it names
+        """
+        aliases = {}
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                for record in csv.DictReader(f):
+                    row = self.food_db.lookup(record["food"])
+                    if row is None:
+                        logger.warning(f"Alias {record['alias']!r} names unknown food {record['food']!r}")
+                        continue
+                    aliases[" ".join(record["alias"].lower().split())] = row
+        except FileNotFoundError:
+            logger.warning(f"Food aliases file not found: {path}")
+        return aliases
+    
+    def _load_exercise_aliases(self, path: str) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        Map each alias to the exercise it names and the intensity it implies, if any
+        """
+        aliases = {}
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                for record in csv.DictReader(f):
+                    if record["exercise"] not in self.exercise_engine:
+                        logger.warning(f"Alias {record['alias']!r} names unknown exercise {record['exercise']!r}")
+                        continue
+                    intensity = record.get("intensity") or None
+                    aliases[" ".join(record["alias"].lower().split())] = (record["exercise"], intensity)
+        except FileNotFoundError:
+            logger.warning(f"Exercise aliases file not found: {path}")
+        return aliases
+    
+    def _extract_duration(self, number: Optional[NumberToken]) -> Optional[int]:
+        """
+        Extract duration in minutes, e.g. "30 minutes", "for 20", "1 hour"
+        """
+        if number is None:
+            return None
+        if number.unit == "min" or (number.unit is None and number.after_for):
+            return int(round(number.value))
+        if number.unit == "hour":
+            return int(round(number.value * 60))
+        return None
+    
+    def _extract_reps(self, number: Optional[NumberToken]) -> Optional[int]:
+        """
+        Extract repetitions, e.g. "20 push-ups", "did 15", "12 reps", "二十个俯卧撑"
+        """
+        if number is not None and number.unit in (None, "rep", "piece") and not number.after_for:
+            return int(number.value)
         return None
     
+    def stats(self) -> Dict[str, float]:
+        """
+        How often parses escalate to the LLM, and how the fallback fares
+        """
+        return {
+            "requests": self.parse_requests,
+            "escalated": self.escalations,
+            "escalation_rate": round(self.escalations / self.parse_requests, 4) if self.parse_requests else 0.0,
+            "parse_cache": {
+                "food": self.food_parse_cache.stats(),
+                "exercise": self.exercise_parse_cache.stats()
+            },
+            "llm_extraction": self.llm_extractor.stats()
+        }
+    
     def generate_food_suggestions(self, foods: List[FoodItem], total_macros: Dict) -> List[str]:
         """
         Generate food suggestions based on intake
@@ -196,4 +653,8 @@ class ParserService:
         if len(exercises) == 0:
             suggestions.append("I couldn't identify specific exercises. Try describing them more clearly (e.g., 'ran for 30 minutes', 'did 20 push-ups')")
         
-        return suggestions
\ No newline at end of file
+        return suggestions
+
+
+# Singleton instance; the food name matchers load on first use and again when the database is rebuilt
+parser_service = ParserService()
\ No newline at end of file
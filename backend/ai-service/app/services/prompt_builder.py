@@ -0,0 +1,114 @@
+"""Token-budgeted prompt assembly."""
+from typing import Any, Dict, List, Optional, Sequence
+
+from .token_counter import count_tokens, truncate_to_tokens
+
+# Role markers and separators the chat template adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARKER = "…"
+
+
+class PromptBuilder:
+    """
+    Fit prompt sections into a fixed token budget
+
+    Sections are filled in priority order: system prompt, current question,
+    user profile, retrieved chunks (best first), then conversation turns
+    (newest first). The system prompt and question are always kept. The
+    profile and one chunk may be cut short to fit; anything lower-ranked
+    that doesn't fit is dropped.
+    """
+
+    def __init__(self, max_tokens: int, min_chunk_tokens: int = 64):
+        self.max_tokens = max_tokens
+        # Below this, a truncated chunk is more noise than context
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def build(
+        self,
+        system: str,
+        question: str,
+        profile: str = "",
+        chunks: Sequence[str] = (),
+        history: Sequence[Dict[str, str]] = (),
+        reserve_tokens: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Select what fits and report the tokens spent per section
+
+        reserve_tokens covers fixed scaffolding the caller wraps around the
+        sections, such as the instructions around retrieved research.
+        """
+        usage = {
+            "system": count_tokens(system) + MESSAGE_OVERHEAD_TOKENS,
+            "question": count_tokens(question) + MESSAGE_OVERHEAD_TOKENS,
+            "reserved": reserve_tokens,
+            "profile": 0,
+            "chunks": 0,
+            "history": 0
+        }
+        remaining = self.max_tokens - usage["system"] - usage["question"] - reserve_tokens
+
+        fitted_profile = ""
+        if profile and remaining > 0:
+            fitted_profile = self._fit(profile, remaining)
+            usage["profile"] = count_tokens(fitted_profile)
+            remaining -= usage["profile"]
+
+        fitted_chunks: List[str] = []
+        truncated_chunks = 0
+        for chunk in chunks:
+            cost = count_tokens(chunk)
+            if cost <= remaining:
+                fitted_chunks.append(chunk)
+            elif remaining >= self.min_chunk_tokens:
+                fitted_chunks.append(self._fit(chunk, remaining))
+                truncated_chunks += 1
+            else:
+                break
+            spent = count_tokens(fitted_chunks[-1])
+            usage["chunks"] += spent
+            remaining -= spent
+
+        fitted_history: List[Dict[str, str]] = []
+        for turn in reversed(history):
+            cost = count_tokens(turn["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if cost > remaining:
+                break
+            fitted_history.append(turn)
+            usage["history"] += cost
+            remaining -= cost
+        fitted_history.reverse()
+
+        usage["total"] = self.max_tokens - remaining
+        usage["budget"] = self.max_tokens
+        return {
+            "system": system,
+            "question": question,
+            "profile": fitted_profile,
+            "chunks": fitted_chunks,
+            "history": fitted_history,
+            "usage": usage,
+            "truncated_chunks": truncated_chunks,
+            "dropped": {
+                "chunks": len(chunks) - len(fitted_chunks),
+                "history": len(history) - len(fitted_history)
+            }
+        }
+
+    @staticmethod
+    def _fit(text: str, max_tokens: int) -> str:
+        """Cut text to max_tokens, marking the cut"""
+        if count_tokens(text) <= max_tokens:
+            return text
+        return truncate_to_tokens(text, max_tokens - 1) + TRUNCATION_MARKER
+
+
+def prompt_usage_summary(fitted: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    """Flat per-section token counts suitable for API responses and logs"""
+    if not fitted:
+        return None
+    summary = dict(fitted["usage"])
+    summary.update({f"dropped_{key}": value for key, value in fitted["dropped"].items()})
+    summary["truncated_chunks"] = fitted["truncated_chunks"]
+    return summary
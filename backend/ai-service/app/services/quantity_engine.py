@@ -0,0 +1,94 @@
+"""Converts parsed quantities (number + unit) into grams of a specific food."""
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .food_database import FoodDatabase
+
+# Canonical unit -> grams, independent of the food
+MASS_UNITS = {
+    "g": 1.0,
+    "kg": 1000.0,
+    "oz": 28.3495,
+    "lb": 453.592,
+    "jin": 500.0,    # 斤
+    "liang": 50.0    # 两
+}
+# Canonical unit -> millilitres; grams depend on the food's density
+VOLUME_UNITS = {
+    "ml": 1.0,
+    "l": 1000.0,
+    "cup": 240.0,
+    "glass": 240.0,  # 杯
+    "bowl": 250.0,   # 碗, a typical rice bowl
+    "tbsp": 15.0,
+    "tsp": 5.0
+}
+# Units meaning "this many of the food's default serving"
+SERVING_UNITS = ("serving", "slice")
+# Units meaning "this many pieces"; None is a bare count ("2 eggs", "10 almonds")
+PIECE_UNITS = (None, "piece")
+
+FOOD_UNITS = tuple(MASS_UNITS) + tuple(VOLUME_UNITS) + SERVING_UNITS + PIECE_UNITS
+# Display names for units that are counted rather than abbreviated
+_UNIT_LABELS = {
+    None: "serving(s)",
+    "serving": "serving(s)",
+    "piece": "piece(s)",
+    "slice": "slice(s)",
+    "cup": "cup(s)",
+    "glass": "glass(es)",
+    "bowl": "bowl(s)"
+}
+
+
+class QuantityEngine:
+    """
+    Grams of a food for a quantity like "200 g", "2 cups", "1碗" or "3"
+
+    Grams per unit are precomputed for every food into one
+    (foods x units) table when the engine is built: mass units are
+    constants, volume units are millilitres times the food's density,
+    serving units are its serving weight and counts are its piece weight
+    (the serving weight for foods not eaten by the piece). A conversion is
+    then a single table lookup, and a whole batch is one fancy-indexing
+    operation.
+    """
+
+    def __init__(self, food_db: FoodDatabase):
+        self._unit_index: Dict[Optional[str], int] = {unit: i for i, unit in enumerate(FOOD_UNITS)}
+
+        densities = np.asarray(food_db.densities, dtype=np.float64)
+        serving_weights = np.asarray(food_db.serving_weights, dtype=np.float64)
+        piece_weights = np.asarray(food_db.piece_weights, dtype=np.float64)
+        table = np.empty((len(food_db), len(FOOD_UNITS)), dtype=np.float64)
+        for unit, grams in MASS_UNITS.items():
+            table[:, self._unit_index[unit]] = grams
+        for unit, millilitres in VOLUME_UNITS.items():
+            table[:, self._unit_index[unit]] = millilitres * densities
+        for unit in SERVING_UNITS:
+            table[:, self._unit_index[unit]] = serving_weights
+        # Foods with a piece weight are counted by the piece; a bare count of anything else is servings
+        self._counted_by_piece = piece_weights > 0
+        for unit in PIECE_UNITS:
+            table[:, self._unit_index[unit]] = np.where(self._counted_by_piece, piece_weights, serving_weights)
+        self._grams_per_unit = table
+
+    def is_food_unit(self, unit: Optional[str]) -> bool:
+        """Whether unit can measure food (not "min", "rep", ...)"""
+        return unit in self._unit_index
+
+    def grams(self, row: int, value: float, unit: Optional[str]) -> float:
+        """Grams of the food at row in value units"""
+        return value * float(self._grams_per_unit[row, self._unit_index[unit]])
+
+    def grams_batch(self, rows: Sequence[int], values: Sequence[float], units: Sequence[Optional[str]]) -> np.ndarray:
+        """Vectorized grams() over parallel sequences"""
+        unit_ids = np.fromiter((self._unit_index[unit] for unit in units), dtype=np.intp, count=len(units))
+        return np.asarray(values, dtype=np.float64) * self._grams_per_unit[np.asarray(rows, dtype=np.intp), unit_ids]
+
+    def describe(self, raw: str, unit: Optional[str], row: Optional[int] = None) -> str:
+        """Quantity as shown to the user, e.g. "200 g", "2 cup(s)", "10 piece(s)", "3 serving(s)" """
+        if unit is None and row is not None and self._counted_by_piece[row]:
+            unit = "piece"
+        return f"{raw} {_UNIT_LABELS.get(unit, unit)}"
@@ -0,0 +1,144 @@
+"""Single-pass number/unit scanner that pairs quantities with matched mentions."""
+from typing import List, NamedTuple, Optional, Sequence
+import re
+
+from .text_matcher import TextMatch
+
+# Spelling -> canonical unit
+UNIT_ALIASES = {
+    # Time and counts (exercise)
+    "minutes": "min", "minute": "min", "mins": "min", "min": "min", "分钟": "min",
+    "hours": "hour", "hour": "hour", "hrs": "hour", "hr": "hour", "h": "hour", "小时": "hour",
+    "reps": "rep", "rep": "rep", "times": "rep", "次": "rep",
+    "sets": "set", "set": "set", "组": "set",
+    # Mass
+    "grams": "g", "gram": "g", "g": "g", "克": "g",
+    "kilograms": "kg", "kilogram": "kg", "kgs": "kg", "kg": "kg", "公斤": "kg", "千克": "kg",
+    "ounces": "oz", "ounce": "oz", "oz": "oz",
+    "pounds": "lb", "pound": "lb", "lbs": "lb", "lb": "lb",
+    "斤": "jin", "两": "liang",
+    # Volume
+    "millilitres": "ml", "milliliters": "ml", "ml": "ml", "毫升": "ml",
+    "litres": "l", "liters": "l", "litre": "l", "liter": "l", "升": "l",
+    "cups": "cup", "cup": "cup",
+    "tablespoons": "tbsp", "tablespoon": "tbsp", "tbsp": "tbsp", "tbs": "tbsp", "勺": "tbsp", "汤匙": "tbsp",
+    "teaspoons": "tsp", "teaspoon": "tsp", "tsp": "tsp", "茶匙": "tsp",
+    "bowls": "bowl", "bowl": "bowl", "碗": "bowl",
+    "glasses": "glass", "glass": "glass", "杯": "glass",
+    # Portions
+    "slices": "slice", "slice": "slice", "片": "slice",
+    "pieces": "piece", "piece": "piece", "个": "piece", "块": "piece", "只": "piece",
+    "servings": "serving", "serving": "serving", "份": "serving"
+}
+
+# Number words read as quantities: "two eggs", "half a banana", "a dozen eggs"
+WORD_NUMBERS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20, "thirty": 30,
+    "forty": 40, "fifty": 50, "sixty": 60, "ninety": 90, "hundred": 100,
+    "half": 0.5, "quarter": 0.25, "couple": 2, "dozen": 12
+}
+
+_UNITS = "|".join(sorted(UNIT_ALIASES, key=len, reverse=True))
+# One precompiled pattern for every number in the text, with its unit if any.
+# Longer spellings come first so "minutes" isn't read as "min" + "utes".
+# "a"/"an" counts as 1 only before a unit ("a cup of milk"), and "half a cup"
+# reads as half of the unit.
+_NUMBER_UNIT = re.compile(
+    r"(?P<for>\bfor\s+)?(?P<number>"
+    r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?"
+    r"|\b(?:" + "|".join(sorted(WORD_NUMBERS, key=len, reverse=True)) + r")\b"
+    r"|\ban?(?=\s+(?:" + _UNITS + r")(?![a-z]))"
+    r")"
+    r"(?:\s*(?:an?\s+)?(?P<unit>" + _UNITS + r"))?"
+    r"(?![a-z])"
+)
+# What may sit between a quantity and the mention it counts: "2 slices of bread", "half a banana"
+_LEADS_INTO = re.compile(r"\s*(?:of\s+)?(?:an?\s+)?")
+
+
+def parse_number(raw: str) -> float:
+    """Value of a scanned number: "2", "2.5", "1/2", "1 1/2", "two", "half", "a" """
+    if raw in ("a", "an"):
+        return 1.0
+    if raw in WORD_NUMBERS:
+        return float(WORD_NUMBERS[raw])
+    whole, _, fraction = raw.rpartition(" ")
+    if "/" in fraction:
+        numerator, denominator = fraction.split("/")
+        return float(whole or 0) + float(numerator) / float(denominator)
+    return float(raw)
+
+
+class NumberToken(NamedTuple):
+    start: int
+    end: int
+    raw: str
+    value: float
+    unit: Optional[str]
+    after_for: bool  # "for 20", which reads as a duration
+
+
+class ScannedQuantity(NamedTuple):
+    """A mention with the number (and unit) that belongs to it, if any"""
+    mention: TextMatch
+    number: Optional[NumberToken]
+
+
+def scan_numbers(text: str) -> List[NumberToken]:
+    """Every number in text with its normalized unit, in one regex pass"""
+    tokens = []
+    for match in _NUMBER_UNIT.finditer(text):
+        raw = match.group("number")
+        value = parse_number(raw)
+        tokens.append(NumberToken(
+            match.start("number"),
+            match.end(),
+            # Shown to the user, so words and fractions are written as numbers
+            raw if raw[-1].isdigit() and "/" not in raw else f"{value:g}",
+            value,
+            UNIT_ALIASES.get(match.group("unit")) if match.group("unit") else None,
+            match.group("for") is not None
+        ))
+    return tokens
+
+
+def attach_quantities(
+    text: str,
+    mentions: Sequence[TextMatch],
+    numbers: Optional[List[NumberToken]] = None
+) -> List[ScannedQuantity]:
+    """
+    Pair each mention with its quantity
+
+    A number directly before a mention ("2 slices of bread", "20 push-ups")
+    belongs to it. Otherwise the first number after the mention and before
+    the next one ("ran for 30 minutes") is used, unless that number directly
+    precedes the next mention. Numbers never cross into another mention's
+    clause, so "ran for 30 minutes and did 20 push-ups" keeps them apart.
+    """
+    numbers = scan_numbers(text) if numbers is None else numbers
+    ordered = sorted(mentions, key=lambda mention: mention.start)
+
+    def leads_into(number: NumberToken, mention: TextMatch) -> bool:
+        return number.end <= mention.start and _LEADS_INTO.fullmatch(text, number.end, mention.start) is not None
+
+    scanned = []
+    for index, mention in enumerate(ordered):
+        previous_end = ordered[index - 1].end if index else 0
+        next_mention = ordered[index + 1] if index + 1 < len(ordered) else None
+        next_start = next_mention.start if next_mention else len(text)
+
+        before = next((n for n in numbers if n.start >= previous_end and leads_into(n, mention)), None)
+        after = None
+        if before is None:
+            after = next(
+                (
+                    n for n in numbers
+                    if n.start >= mention.end and n.end <= next_start
+                    and not (next_mention and leads_into(n, next_mention))
+                ),
+                None
+            )
+        scanned.append(ScannedQuantity(mention, before or after))
+    return scanned
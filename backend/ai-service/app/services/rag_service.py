@@ -8,10 +8,11 @@ from langchain.document_loaders import TextLoader, PyPDFLoader
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import Chroma
 from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
 from langchain.schema import Document
 
 from ..config import get_settings
+from .vector_index import NumpyVectorStore
+from .conversation_store import ConversationStore
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +21,16 @@ class RAGService:
         self.settings = get_settings()
         self.embeddings = None
         self.vector_store = None
+        self.retriever = None
         self.qa_chain = None
+        self.is_ready = False
+        # Per-conversation history, bounded in count, age and length
+        self.conversations = ConversationStore(
+            max_conversations=self.settings.conversation_max_active,
+            ttl_seconds=self.settings.conversation_ttl_seconds,
+            max_messages=self.settings.conversation_max_messages,
+            spill_dir=self.settings.conversation_spill_dir
+        )
         self._initialize_rag()
         
     def _initialize_rag(self):
@@ -34,23 +44,55 @@ class RAGService:
             )
             
             # Initialize or load vector store
-            persist_directory = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
-            
-            if os.path.exists(persist_directory):
-                # Load existing vector store
-                self.vector_store = Chroma(
-                    persist_directory=persist_directory,
-                    embedding_function=self.embeddings
-                )
-                logger.info(f"Loaded existing vector store from {persist_directory}")
+            if self.settings.vector_store_backend == "numpy":
+                self._initialize_numpy_store()
             else:
-                # Create new vector store with initial documents
-                self.vector_store = Chroma(
-                    persist_directory=persist_directory,
-                    embedding_function=self.embeddings
-                )
-                self._load_initial_knowledge()
-                
+                self._initialize_chroma()
+            
+            # Retriever used by the single-LLM-call chat path
+            self.retriever = self.vector_store.as_retriever(
+                search_kwargs={"k": self.settings.retrieval_top_k}
+            )
+            
+            logger.info("RAG system initialized successfully")
+        
+        except Exception as e:
+            logger.error(f"Failed to initialize RAG system: {str(e)}")
+            raise
+    
+    def _initialize_chroma(self):
+        """Open the embedded Chroma store, seeding it on first run"""
+        persist_directory = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
+        
+        if os.path.exists(persist_directory):
+            # Load existing vector store
+            self.vector_store = Chroma(
+                persist_directory=persist_directory,
+                embedding_function=self.embeddings
+            )
+            logger.info(f"Loaded existing vector store from {persist_directory}")
+        else:
+            # Create new vector store with initial documents
+            self.vector_store = Chroma(
+                persist_directory=persist_directory,
+                embedding_function=self.embeddings
+            )
+            self._load_initial_knowledge()
+    
+    def _initialize_numpy_store(self):
+        """Open the memory-mapped NumPy index, seeding it on first run"""
+        self.vector_store = NumpyVectorStore(
+            persist_directory=self.settings.vector_store_path,
+            embedding_function=self.embeddings
+        )
+        if self.vector_store.count() == 0:
+            self._load_initial_knowledge()
+    
+    def _get_qa_chain(self) -> ConversationalRetrievalChain:
+        """
+        Build the conversational chain lazily; only the legacy path needs it
+        """
+        if self.qa_chain is None:
             # Initialize LLM with SiliconFlow
             llm = ChatOpenAI(
                 openai_api_key=self.settings.openai_api_key,
@@ -60,28 +102,14 @@ class RAGService:
                 max_tokens=self.settings.max_tokens
             )
             
-            # Create conversational retrieval chain
-            memory = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True,
-                output_key="answer"
-            )
-            
+            # Create conversational retrieval chain; history is passed per call
             self.qa_chain = ConversationalRetrievalChain.from_llm(
                 llm=llm,
-                retriever=self.vector_store.as_retriever(
-                    search_kwargs={"k": 5}
-                ),
-                memory=memory,
+                retriever=self.retriever,
                 return_source_documents=True,
                 verbose=True
             )
-            
-            logger.info("RAG system initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize RAG system: {str(e)}")
-            raise
+        return self.qa_chain
     
     def _load_initial_knowledge(self):
         """Load initial fat loss knowledge into vector store"""
@@ -149,16 +177,82 @@ class RAGService:
         self.vector_store.persist()
         logger.info(f"Loaded {len(documents)} initial documents into vector store")
     
-    async def get_relevant_context(self, query: str, conversation_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    async def embed_query(self, query: str) -> Optional[List[float]]:
+        """
+        Embed a query once so callers can reuse the vector for caching and retrieval
+        """
+        try:
+            return await self.embeddings.aembed_query(query)
+        except Exception as e:
+            logger.error(f"Error embedding query: {str(e)}")
+            return None
+    
+    async def retrieve_context(self, query: str, embedding: Optional[List[float]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the top-k knowledge chunks for a query without any LLM call
+        
+        Pass a precomputed query embedding to skip embedding the query again.
+        """
+        try:
+            if embedding is not None:
+                documents = await self.vector_store.asimilarity_search_by_vector(
+                    embedding, k=self.settings.retrieval_top_k
+                )
+            else:
+                documents = await self.retriever.aget_relevant_documents(query)
+            
+            sources = []
+            topics = []
+            chunks = []
+            
+            for doc in documents:
+                if "sources" in doc.metadata:
+                    sources.extend(doc.metadata["sources"].split(", "))
+                if "topic" in doc.metadata:
+                    topics.append(doc.metadata["topic"])
+                chunks.append(doc.page_content.strip())
+            
+            return {
+                "content": "\n\n".join(chunks),
+                "chunks": chunks,
+                "sources": list(set(sources)),  # Remove duplicates
+                "topics": list(set(topics))
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in RAG retrieval: {str(e)}")
+            return None
+    
+    async def get_relevant_context(
+        self,
+        query: str,
+        conversation_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Get relevant context using LangChain's conversational retrieval
+        
+        This runs the chain's condense and answer LLM calls; chat uses
+        retrieve_context instead.
         """
         try:
+            history = self.conversations.get_history(
+                conversation_id,
+                owner=user_id,
+                max_tokens=self.settings.conversation_history_tokens
+            )
+            chat_history = [
+                (history[i]["content"], history[i + 1]["content"])
+                for i in range(0, len(history) - 1, 2)
+                if history[i]["role"] == "user"
+            ]
+            
             # Use the QA chain to get answer with sources
-            result = await self.qa_chain.acall({
+            result = await self._get_qa_chain().acall({
                 "question": query,
-                "chat_history": []  # Memory handles this internally
+                "chat_history": chat_history
             })
+            self.conversations.add_turn(conversation_id, query, result.get("answer", ""), owner=user_id)
             
             # Extract sources from source documents
             sources = []
@@ -230,9 +324,51 @@ class RAGService:
         # This is a simplified version - in production, you'd query the vector store metadata
         return ["caloric_deficit", "protein_intake", "exercise_types", "metabolic_adaptation", "meal_timing"]
     
-    def clear_conversation_memory(self, conversation_id: Optional[str] = None):
+    def clear_conversation_memory(self, conversation_id: Optional[str] = None, user_id: Optional[str] = None) -> int:
         """
         Clear conversation memory for a fresh start
+        
+        Clears one conversation, or all of the user's conversations when no
+        conversation_id is given. Returns how many were cleared.
+        """
+        return self.conversations.clear(conversation_id, owner=user_id)
+    
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Touch the vector store so the first request doesn't pay for lazy loading
+        """
+        try:
+            document_count = self._document_count()
+            self.is_ready = True
+            logger.info(f"RAG engine warm with {document_count} chunks")
+            return {"status": "ready", "document_count": document_count}
+        except Exception as e:
+            self.is_ready = False
+            logger.error(f"RAG warm-up failed: {str(e)}")
+            return {"status": "error", "error": str(e)}
+    
+    def _document_count(self) -> int:
+        """
+        Number of chunks in whichever vector store backend is active
         """
-        if self.qa_chain and hasattr(self.qa_chain, 'memory'):
-            self.qa_chain.memory.clear()
\ No newline at end of file
+        if isinstance(self.vector_store, NumpyVectorStore):
+            return self.vector_store.count()
+        return self.vector_store._collection.count()
+    
+    def close(self):
+        """
+        Flush the vector store and release the engine on shutdown
+        """
+        self.is_ready = False
+        try:
+            if self.vector_store is not None:
+                self.vector_store.persist()
+        except Exception as e:
+            logger.error(f"Failed to persist vector store on shutdown: {str(e)}")
+        
+        self.conversations.close()
+        self.qa_chain = None
+        self.retriever = None
+        self.vector_store = None
+        self.embeddings = None
+        logger.info("RAG engine closed")
\ No newline at end of file
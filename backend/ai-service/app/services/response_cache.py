@@ -0,0 +1,159 @@
+"""Semantic cache for chat responses to near-duplicate questions."""
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from collections import OrderedDict, deque
+import itertools
+import threading
+import time
+
+import numpy as np
+
+
+def profile_bucket(user_profile: Optional[Dict[str, Any]]) -> str:
+    """
+    Coarse key for the profile fields used in the system prompt
+
+    Users whose answers would be personalized the same way share a bucket:
+    same goal, gender and activity level, age by decade, weight by 10 kg.
+    """
+    if not user_profile:
+        return "anonymous"
+
+    def band(value: Any, width: int) -> str:
+        try:
+            return str(int(float(value) // width * width))
+        except (TypeError, ValueError):
+            return "?"
+
+    return "|".join([
+        str(user_profile.get("goal", "?")),
+        str(user_profile.get("gender", "?")),
+        str(user_profile.get("activity_level", "?")),
+        band(user_profile.get("age"), 10),
+        band(user_profile.get("weight"), 10)
+    ])
+
+
+class SemanticResponseCache:
+    """
+    Response cache looked up by embedding similarity within a profile bucket
+
+    Entries expire after ttl_seconds; past max_entries the least recently
+    used entry is evicted. _entries is kept in LRU order, so expiry walks a
+    separate creation-ordered queue and stops at the first fresh entry.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: int = 3600, max_entries: int = 2048):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        # (created_at, entry_id) in creation order; ids evicted early are skipped
+        self._created: Deque[Tuple[float, int]] = deque()
+        self._buckets: Dict[str, List[int]] = {}
+        # Stacked unit vectors per bucket, rebuilt lazily after changes
+        self._matrices: Dict[str, np.ndarray] = {}
+        self._ids = itertools.count()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _remove(self, entry_id: int):
+        """Drop one entry (caller holds the lock)"""
+        entry = self._entries.pop(entry_id)
+        bucket = entry["bucket"]
+        self._buckets[bucket].remove(entry_id)
+        self._matrices.pop(bucket, None)
+        if not self._buckets[bucket]:
+            del self._buckets[bucket]
+
+    def _expire(self, now: float):
+        """Drop expired entries, oldest first (caller holds the lock)"""
+        while self._created and now - self._created[0][0] > self.ttl_seconds:
+            _, entry_id = self._created.popleft()
+            if entry_id in self._entries:
+                self._remove(entry_id)
+
+    def lookup(self, embedding: List[float], bucket: str) -> Optional[Dict[str, Any]]:
+        """Return the most similar fresh entry in the bucket above the threshold"""
+        query = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            self._expire(now)
+            entry_ids = self._buckets.get(bucket)
+            if not entry_ids:
+                self.misses += 1
+                return None
+
+            matrix = self._matrices.get(bucket)
+            if matrix is None:
+                matrix = np.stack([self._entries[entry_id]["vector"] for entry_id in entry_ids])
+                self._matrices[bucket] = matrix
+
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry_id = entry_ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            entry = self._entries[entry_id]
+            return {
+                "content": entry["content"],
+                "sources": list(entry["sources"]),
+                "similarity": similarity
+            }
+
+    def store(self, embedding: List[float], bucket: str, content: str, sources: List[str]):
+        """Cache a generated response"""
+        vector = self._normalize(embedding)
+
+        now = time.time()
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {
+                "vector": vector,
+                "bucket": bucket,
+                "content": content,
+                "sources": list(sources),
+                "created_at": now
+            }
+            self._created.append((now, entry_id))
+            self._buckets.setdefault(bucket, []).append(entry_id)
+            self._matrices.pop(bucket, None)
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.evictions += 1
+            # LRU evictions leave their ids queued; drop them before the queue outgrows the cache
+            if len(self._created) > 2 * self.max_entries:
+                self._created = deque(item for item in self._created if item[1] in self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._created.clear()
+            self._buckets.clear()
+            self._matrices.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
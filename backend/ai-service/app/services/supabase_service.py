@@ -1,11 +1,18 @@
 """Supabase service for authentication and database operations."""
 import os
-from typing import Optional, Dict, Any, List
+import asyncio
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, NamedTuple, Callable
 from datetime import datetime
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 from pydantic_settings import BaseSettings
 import logging
 
+from .cache import LRUCache
+from .invalidation import FileInvalidationBus, InvalidationBus
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,6 +21,14 @@ class SupabaseSettings(BaseSettings):
     supabase_url: str = ""
     supabase_key: str = ""
     supabase_jwt_secret: str = ""
+    # Blocking supabase-py calls run on a bounded pool sized to the HTTP connection pool
+    supabase_max_workers: int = 16
+    supabase_timeout_seconds: float = 10.0
+    # Read-through profile cache; writes from this service update it directly
+    profile_cache_entries: int = 10000
+    profile_cache_ttl_seconds: float = 300.0
+    # Shared file so workers on one host invalidate each other's profile caches
+    profile_invalidation_path: Optional[str] = None
     
     class Config:
         env_file = ".env"
@@ -22,34 +37,237 @@ class SupabaseSettings(BaseSettings):
 
 settings = SupabaseSettings()
 
+PROFILE_CHANNEL = "user_profiles"
+_MISSING = object()
+
+# Mirrors of the CHECK constraints in supabase_migrations.sql, so a bad row is
+# rejected on its own instead of failing the whole bulk insert
+MEAL_TYPES = {"breakfast", "lunch", "dinner", "snack", "other"}
+EXERCISE_INTENSITIES = {"low", "moderate", "high", "very_high"}
+
+
+class BulkInsertResult(NamedTuple):
+    """Rows stored by a bulk insert, and {"index", "error"} for each input row that wasn't"""
+    rows: List[Dict[str, Any]]
+    errors: List[Dict[str, Any]]
+
+
+def _row_error(row: Dict[str, Any], required: tuple, non_negative: tuple, positive: tuple = ()) -> Optional[str]:
+    for column in required:
+        if row.get(column) in (None, ""):
+            return f"{column} is required"
+    for column in non_negative:
+        if row.get(column) is not None and row[column] < 0:
+            return f"{column} must not be negative"
+    for column in positive:
+        if row.get(column) is not None and row[column] <= 0:
+            return f"{column} must be positive"
+    return None
+
+
+def nutrition_row_error(row: Dict[str, Any]) -> Optional[str]:
+    """Why a nutrition_logs row would be rejected, or None"""
+    error = _row_error(row, ("description", "food_name", "calories"), ("calories", "protein", "carbs", "fat", "fiber"))
+    if error is None and row.get("meal_type") not in (None, *MEAL_TYPES):
+        error = f"unknown meal_type {row['meal_type']!r}"
+    return error
+
+
+def exercise_row_error(row: Dict[str, Any]) -> Optional[str]:
+    """Why an exercise_logs row would be rejected, or None"""
+    error = _row_error(row, ("description", "exercise_name"), ("calories_burned",), ("duration_minutes",))
+    if error is None and row.get("intensity") not in (None, *EXERCISE_INTENSITIES):
+        error = f"unknown intensity {row['intensity']!r}"
+    return error
+
 
 class SupabaseService:
-    """Service for interacting with Supabase."""
+    """
+    Service for interacting with Supabase.
+    
+    supabase-py is synchronous, so every query is executed on a dedicated,
+    bounded thread pool and awaited: the event loop keeps serving other
+    requests while a call is in flight, and at most `supabase_max_workers`
+    calls reach the database at once. One client (and its keep-alive HTTP
+    connections) is shared by all calls. Each call is bounded by
+    `supabase_timeout_seconds`, both on the HTTP request and on the await.
+    
+    Profiles are read through an in-process TTL/LRU cache, which also
+    remembers users that have no profile yet. Profile writes
+    publish an invalidation (to other workers too, when
+    `profile_invalidation_path` is set) and then store the written row.
+    """
     
     def __init__(self):
         """Initialize Supabase client."""
+        self.timeout_seconds = settings.supabase_timeout_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.profile_cache = LRUCache(
+            max_entries=settings.profile_cache_entries,
+            ttl_seconds=settings.profile_cache_ttl_seconds
+        )
+        # Bumped on every invalidation so a read that raced a write isn't cached
+        self._profile_generation = 0
+        # Users with a timed-out profile write still running on a pool thread
+        self._late_profile_writes: Counter = Counter()
+        if settings.profile_invalidation_path:
+            self.invalidation_bus: InvalidationBus = FileInvalidationBus(settings.profile_invalidation_path)
+        else:
+            self.invalidation_bus = InvalidationBus()
+        self.invalidation_bus.subscribe(PROFILE_CHANNEL, self._evict_profile)
         if not settings.supabase_url or not settings.supabase_key:
             logger.warning("Supabase credentials not configured")
             self.client = None
         else:
             self.client: Client = create_client(
                 settings.supabase_url,
-                settings.supabase_key
+                settings.supabase_key,
+                options=ClientOptions(postgrest_client_timeout=settings.supabase_timeout_seconds)
+            )
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.supabase_max_workers,
+                thread_name_prefix="supabase"
             )
     
     def is_configured(self) -> bool:
         """Check if Supabase is properly configured."""
         return self.client is not None
     
+    async def _execute(self, query: Any) -> Any:
+        """Run a built query's blocking execute() on the pool, bounded by the call timeout."""
+        return await self._await_call(self._executor.submit(query.execute))
+    
+    async def _await_call(self, future: Future) -> Any:
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Supabase call timed out after {self.timeout_seconds}s") from None
+    
+    async def _execute_profile_write(self, user_id: str, query: Any) -> Any:
+        """
+        _execute() for profile writes. A write that outlives its await (timeout,
+        cancelled request) keeps running on its thread: until it lands the user
+        isn't cached, and when it does the profile is invalidated again.
+        """
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(query.execute)
+        try:
+            return await self._await_call(future)
+        finally:
+            if not future.done():
+                self._late_profile_writes[user_id] += 1
+                future.add_done_callback(lambda _: self._on_loop(loop, self._late_profile_write_landed, user_id))
+    
+    @staticmethod
+    def _on_loop(loop: asyncio.AbstractEventLoop, callback: Callable[..., None], *args: Any):
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The loop closed (shutdown); nothing is left to invalidate
+            pass
+    
+    def _late_profile_write_landed(self, user_id: str):
+        self._late_profile_writes[user_id] -= 1
+        if self._late_profile_writes[user_id] <= 0:
+            del self._late_profile_writes[user_id]
+        self._store_profile(user_id, None)
+    
+    def _evict_profile(self, user_id: str):
+        self._profile_generation += 1
+        self.profile_cache.pop(user_id)
+    
+    def _store_profile(self, user_id: str, profile: Optional[Dict[str, Any]]):
+        """Write-through after a profile write: drop other workers' copies, keep ours."""
+        self.invalidation_bus.publish(PROFILE_CHANNEL, user_id)
+        if profile is not None:
+            self.profile_cache.set(user_id, profile)
+    
+    async def _insert_bulk(
+        self,
+        table: str,
+        user_id: str,
+        rows: List[Dict[str, Any]],
+        row_error: Callable[[Dict[str, Any]], Optional[str]]
+    ) -> BulkInsertResult:
+        """
+        Insert rows in one request, reporting failures per row.
+        
+        Rows that fail validation are left out up front. If the database still
+        rejects the statement (which fails as a whole), the remaining rows are
+        retried one by one, concurrently, so only the offending rows are lost.
+        A timeout isn't retried: the insert may have landed.
+        """
+        if not self.is_configured() or not rows:
+            return BulkInsertResult([], [])
+        
+        now = datetime.utcnow().isoformat()
+        errors: List[Dict[str, Any]] = []
+        pending = []
+        for index, row in enumerate(rows):
+            error = row_error(row)
+            if error is not None:
+                errors.append({"index": index, "error": error})
+            else:
+                pending.append((index, {"user_id": user_id, "logged_at": now, **row}))
+        if not pending:
+            return BulkInsertResult([], errors)
+        
+        try:
+            response = await self._execute(self.client.table(table).insert([data for _, data in pending]))
+            return BulkInsertResult(response.data or [], errors)
+        except TimeoutError as e:
+            logger.error(f"Error bulk inserting into {table}: {e}")
+            errors.extend({"index": index, "error": str(e)} for index, _ in pending)
+            return BulkInsertResult([], sorted(errors, key=lambda error: error["index"]))
+        except Exception as e:
+            logger.warning(f"Bulk insert into {table} rejected, retrying row by row: {e}")
+        
+        results = await asyncio.gather(
+            *(self._execute(self.client.table(table).insert(data)) for _, data in pending),
+            return_exceptions=True
+        )
+        stored = []
+        for (index, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                errors.append({"index": index, "error": str(result)})
+            else:
+                stored.extend(result.data or [])
+        return BulkInsertResult(stored, sorted(errors, key=lambda error: error["index"]))
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "configured": self.is_configured(),
+            "profile_cache": self.profile_cache.stats(),
+            "profile_invalidations": self.invalidation_bus.stats()
+        }
+    
+    def close(self) -> None:
+        """Stop the query pool; in-flight calls finish first."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
     # User Profile CRUD Operations
     async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get user profile by user ID."""
+        """Get user profile by user ID, from the profile cache when possible."""
         if not self.is_configured():
             return None
         
+        self.invalidation_bus.poll()
+        cached = self.profile_cache.get(user_id, _MISSING)
+        if cached is not _MISSING:
+            return dict(cached) if cached else None
+        
         try:
-            response = self.client.table("user_profiles").select("*").eq("user_id", user_id).single().execute()
-            return response.data
+            generation = self._profile_generation
+            # limit(1) rather than single(): no profile is an ordinary answer, not an error
+            response = await self._execute(self.client.table("user_profiles").select("*").eq("user_id", user_id).limit(1))
+            profile = response.data[0] if response.data else None
+            # None is cached too, so users without a profile don't cost a round trip
+            # per message; creating the profile invalidates it like any other write
+            if generation == self._profile_generation and user_id not in self._late_profile_writes:
+                self.profile_cache.set(user_id, profile)
+            return dict(profile) if profile else None
         except Exception as e:
             logger.error(f"Error fetching user profile: {e}")
             return None
@@ -66,10 +284,14 @@ class SupabaseService:
                 "created_at": datetime.utcnow().isoformat(),
                 "updated_at": datetime.utcnow().isoformat()
             }
-            response = self.client.table("user_profiles").insert(data).execute()
-            return response.data[0] if response.data else None
+            response = await self._execute_profile_write(user_id, self.client.table("user_profiles").insert(data))
+            profile = response.data[0] if response.data else None
+            self._store_profile(user_id, profile)
+            return dict(profile) if profile else None
         except Exception as e:
             logger.error(f"Error creating user profile: {e}")
+            # The write may still land (e.g. a timeout); don't serve the old copy meanwhile
+            self._store_profile(user_id, None)
             return None
     
     async def update_user_profile(self, user_id: str, profile_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -82,10 +304,14 @@ class SupabaseService:
                 **profile_data,
                 "updated_at": datetime.utcnow().isoformat()
             }
-            response = self.client.table("user_profiles").update(data).eq("user_id", user_id).execute()
-            return response.data[0] if response.data else None
+            response = await self._execute_profile_write(user_id, self.client.table("user_profiles").update(data).eq("user_id", user_id))
+            profile = response.data[0] if response.data else None
+            self._store_profile(user_id, profile)
+            return dict(profile) if profile else None
         except Exception as e:
             logger.error(f"Error updating user profile: {e}")
+            # The write may still land (e.g. a timeout); don't serve the old copy meanwhile
+            self._store_profile(user_id, None)
             return None
     
     # Weight History Operations
@@ -101,7 +327,7 @@ class SupabaseService:
                 "unit": unit,
                 "recorded_at": datetime.utcnow().isoformat()
             }
-            response = self.client.table("weight_history").insert(data).execute()
+            response = await self._execute(self.client.table("weight_history").insert(data))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error recording weight: {e}")
@@ -113,7 +339,7 @@ class SupabaseService:
             return []
         
         try:
-            response = self.client.table("weight_history").select("*").eq("user_id", user_id).order("recorded_at", desc=True).limit(limit).execute()
+            response = await self._execute(self.client.table("weight_history").select("*").eq("user_id", user_id).order("recorded_at", desc=True).limit(limit))
             return response.data or []
         except Exception as e:
             logger.error(f"Error fetching weight history: {e}")
@@ -125,7 +351,7 @@ class SupabaseService:
             return None
         
         try:
-            response = self.client.table("weight_history").select("*").eq("user_id", user_id).order("recorded_at", desc=True).limit(1).execute()
+            response = await self._execute(self.client.table("weight_history").select("*").eq("user_id", user_id).order("recorded_at", desc=True).limit(1))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error fetching latest weight: {e}")
@@ -143,12 +369,16 @@ class SupabaseService:
                 **nutrition_data,
                 "logged_at": datetime.utcnow().isoformat()
             }
-            response = self.client.table("nutrition_logs").insert(data).execute()
+            response = await self._execute(self.client.table("nutrition_logs").insert(data))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error logging nutrition: {e}")
             return None
     
+    async def log_nutrition_bulk(self, user_id: str, rows: List[Dict[str, Any]]) -> BulkInsertResult:
+        """Log many nutrition rows with a single insert; errors are reported per row."""
+        return await self._insert_bulk("nutrition_logs", user_id, rows, nutrition_row_error)
+    
     async def get_nutrition_logs(self, user_id: str, date: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get nutrition logs for a user."""
         if not self.is_configured():
@@ -163,7 +393,7 @@ class SupabaseService:
                 end_datetime = f"{date}T23:59:59"
                 query = query.gte("logged_at", start_datetime).lte("logged_at", end_datetime)
             
-            response = query.order("logged_at", desc=True).execute()
+            response = await self._execute(query.order("logged_at", desc=True))
             return response.data or []
         except Exception as e:
             logger.error(f"Error fetching nutrition logs: {e}")
@@ -181,12 +411,16 @@ class SupabaseService:
                 **exercise_data,
                 "logged_at": datetime.utcnow().isoformat()
             }
-            response = self.client.table("exercise_logs").insert(data).execute()
+            response = await self._execute(self.client.table("exercise_logs").insert(data))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error logging exercise: {e}")
             return None
     
+    async def log_exercise_bulk(self, user_id: str, rows: List[Dict[str, Any]]) -> BulkInsertResult:
+        """Log many exercise rows with a single insert; errors are reported per row."""
+        return await self._insert_bulk("exercise_logs", user_id, rows, exercise_row_error)
+    
     async def get_exercise_logs(self, user_id: str, date: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get exercise logs for a user."""
         if not self.is_configured():
@@ -201,12 +435,31 @@ class SupabaseService:
                 end_datetime = f"{date}T23:59:59"
                 query = query.gte("logged_at", start_datetime).lte("logged_at", end_datetime)
             
-            response = query.order("logged_at", desc=True).execute()
+            response = await self._execute(query.order("logged_at", desc=True))
             return response.data or []
         except Exception as e:
             logger.error(f"Error fetching exercise logs: {e}")
             return []
 
+    
+    # Daily Rollup Operations
+    async def get_daily_rollup(self, user_id: str, date: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's totals for one day (YYYY-MM-DD) from daily_activity_rollups.
+        
+        Returns an empty dict when nothing was logged that day, and None when
+        the rollup can't be read, so callers can fall back to the logs.
+        """
+        if not self.is_configured():
+            return None
+        
+        try:
+            response = await self._execute(self.client.table("daily_activity_rollups").select("*").eq("user_id", user_id).eq("day", date).limit(1))
+            return response.data[0] if response.data else {}
+        except Exception as e:
+            logger.error(f"Error fetching daily rollup: {e}")
+            return None
+
 
 # Singleton instance
 supabase_service = SupabaseService()
\ No newline at end of file
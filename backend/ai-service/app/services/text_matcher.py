@@ -0,0 +1,126 @@
+"""Aho-Corasick dictionary matcher for finding food and exercise mentions."""
+from typing import Any, Dict, List, NamedTuple, Optional
+from collections import deque
+
+
+class TextMatch(NamedTuple):
+    """One dictionary hit; text[start:end] == key"""
+    start: int
+    end: int
+    key: str
+    value: Any
+
+
+class AhoCorasickMatcher:
+    """
+    Multi-pattern matcher built once from a {pattern: value} dictionary
+
+    find_all scans the text in a single pass regardless of dictionary size
+    and returns leftmost-longest, non-overlapping matches, so "chicken
+    breast" wins over "chicken". Latin matches must start at a word
+    boundary ("egg" does not match inside "nutmeg"); the end is left open
+    so plurals like "eggs" still match. Patterns and text should already be
+    lowercased by the caller.
+    """
+
+    def __init__(self, patterns: Dict[str, Any]):
+        self._keys: List[str] = []
+        self._values: List[Any] = []
+        # Trie transitions, failure links, longest pattern ending at each node,
+        # and the nearest node on the failure chain that ends a pattern
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[int] = [-1]
+        self._dict_link: List[int] = [0]
+
+        for key, value in patterns.items():
+            if key:
+                self._insert(key, value)
+        self._build_links()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _insert(self, key: str, value: Any):
+        node = 0
+        for char in key:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(-1)
+                self._dict_link.append(0)
+            node = next_node
+        self._output[node] = len(self._keys)
+        self._keys.append(key)
+        self._values.append(value)
+
+    def _build_links(self):
+        """Breadth-first pass computing failure and dictionary-suffix links"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+
+                suffix = self._fail[child]
+                self._dict_link[child] = suffix if self._output[suffix] >= 0 else self._dict_link[suffix]
+                queue.append(child)
+
+    @staticmethod
+    def _at_word_start(text: str, start: int) -> bool:
+        if start == 0:
+            return True
+        previous = text[start - 1]
+        # Only Latin letters glue words together; CJK text has no spaces
+        return not (previous.isascii() and previous.isalpha())
+
+    def iter_all(self, text: str):
+        """Every (possibly overlapping) occurrence, in order of end offset"""
+        goto, fail, output, dict_link, keys = self._goto, self._fail, self._output, self._dict_link, self._keys
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            hit = node if output[node] >= 0 else dict_link[node]
+            while hit:
+                index = output[hit]
+                end = position + 1
+                yield end - len(keys[index]), end, index
+                hit = dict_link[hit]
+
+    def find_all(self, text: str) -> List[TextMatch]:
+        """Leftmost-longest, non-overlapping matches in text order"""
+        candidates = [
+            (start, -(end - start), end, index)
+            for start, end, index in self.iter_all(text)
+            if self._at_word_start(text, start)
+        ]
+        candidates.sort()
+
+        matches: List[TextMatch] = []
+        covered_until = 0
+        for start, _, end, index in candidates:
+            if start < covered_until:
+                continue
+            matches.append(TextMatch(start, end, self._keys[index], self._values[index]))
+            covered_until = end
+        return matches
+
+    def get(self, key: str, default: Optional[Any] = None) -> Any:
+        """Exact lookup of a pattern's value"""
+        node = 0
+        for char in key:
+            node = self._goto[node].get(char)
+            if node is None:
+                return default
+        index = self._output[node]
+        return self._values[index] if index >= 0 else default
@@ -0,0 +1,37 @@
+"""Cheap token estimates for prompt budgeting."""
+import math
+import re
+
+_CJK_CHAR = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate how many tokens a text costs
+
+    The DeepSeek/Qwen tokenizers spend roughly one token per CJK character
+    and one per ~4 characters of English, so mixed text is counted in two
+    parts. This errs slightly high, which is the safe side for budgets.
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_CHAR.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text that fits in max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    # Token cost grows monotonically with prefix length, so bisect on it
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
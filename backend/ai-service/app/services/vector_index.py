@@ -0,0 +1,244 @@
+"""In-process NumPy vector index, a lightweight alternative to Chroma."""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.vectorstore import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Vector store backed by a memory-mapped float32 matrix
+
+    Layout of persist_directory:
+        vectors.f32     row-major (count x dim) unit-normalized float32 vectors
+        metadata.jsonl  one {"id", "text", "metadata"} record per row
+        index.json      header with dim and row count
+
+    Scores follow Chroma's default squared-L2 distance (lower is better), so
+    thresholds tuned against Chroma keep working. For unit vectors that is
+    2 - 2 * cosine similarity.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    METADATA_FILE = "metadata.jsonl"
+    HEADER_FILE = "index.json"
+
+    def __init__(self, persist_directory: str, embedding_function: Embeddings):
+        self.persist_directory = Path(persist_directory)
+        self.embedding_function = embedding_function
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._dim: Optional[int] = None
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    def _load(self):
+        """Map the vector file and read the metadata sidecar"""
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        header_path = self.persist_directory / self.HEADER_FILE
+        vectors_path = self.persist_directory / self.VECTORS_FILE
+        metadata_path = self.persist_directory / self.METADATA_FILE
+        if not header_path.exists():
+            # Rows from an append that crashed before its first header
+            vectors_path.unlink(missing_ok=True)
+            metadata_path.unlink(missing_ok=True)
+            return
+
+        header = json.loads(header_path.read_text())
+        self._dim = header["dim"]
+        count = header["count"]
+
+        metadata_end = 0
+        with metadata_path.open("rb") as f:
+            for line in f:
+                if len(self._ids) >= count or not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                self._ids.append(record["id"])
+                self._texts.append(record["text"])
+                self._metadatas.append(record["metadata"])
+                metadata_end += len(line)
+
+        # Rows past the header come from an append that crashed before
+        # updating it; cut them off so the next append lines up again
+        row_bytes = self._dim * np.dtype(np.float32).itemsize
+        count = min(count, len(self._ids), vectors_path.stat().st_size // row_bytes)
+        del self._ids[count:], self._texts[count:], self._metadatas[count:]
+        if count != header["count"]:
+            logger.warning(f"Vector index header says {header['count']} rows but only {count} are complete")
+            metadata_end = 0
+            with metadata_path.open("rb") as f:
+                for _ in range(count):
+                    metadata_end += len(f.readline())
+            self._write_header(count)
+        with vectors_path.open("r+b") as f:
+            f.truncate(count * row_bytes)
+        with metadata_path.open("r+b") as f:
+            f.truncate(metadata_end)
+
+        self._remap(count)
+        logger.info(f"Loaded NumPy vector index with {count} vectors from {self.persist_directory}")
+
+    def _write_header(self, count: int):
+        """Replace the header atomically; it marks how many rows are committed"""
+        header_path = self.persist_directory / self.HEADER_FILE
+        tmp_path = header_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"dim": self._dim, "count": count}))
+        os.replace(tmp_path, header_path)
+
+    def _remap(self, count: int):
+        """(Re)open the memory map over the first `count` rows"""
+        if count == 0:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(
+            self.persist_directory / self.VECTORS_FILE,
+            dtype=np.float32,
+            mode="r",
+            shape=(count, self._dim)
+        )
+
+    def count(self) -> int:
+        """Number of stored vectors"""
+        return len(self._ids)
+
+    def get_all(self) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """Ids, texts and metadata of every stored row"""
+        return list(self._ids), list(self._texts), [dict(m) for m in self._metadatas]
+
+    def add_vectors(
+        self,
+        vectors: np.ndarray,
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Append precomputed embeddings to the index"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("vectors must be a (len(texts) x dim) matrix")
+        if self._dim is not None and vectors.shape[1] != self._dim:
+            raise ValueError(f"Expected {self._dim}-dimensional vectors, got {vectors.shape[1]}")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        with self._lock:
+            self._dim = vectors.shape[1]
+            # Drop the map before growing the file it points at
+            self._matrix = None
+
+            with (self.persist_directory / self.VECTORS_FILE).open("ab") as f:
+                f.write(vectors.tobytes(order="C"))
+            with (self.persist_directory / self.METADATA_FILE).open("a", encoding="utf-8") as f:
+                for id_, text, metadata in zip(ids, texts, metadatas):
+                    f.write(json.dumps({"id": id_, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+
+            # The header commits the new rows; _load truncates anything a crash
+            # left past it, so later appends stay aligned
+            self._write_header(len(self._ids))
+            self._remap(len(self._ids))
+
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding_function.embed_documents(texts)
+        return self.add_vectors(np.asarray(vectors), texts, metadatas, kwargs.get("ids"))
+
+    def _top_k(self, embedding: List[float], k: int) -> List[Tuple[int, float]]:
+        """Vectorized cosine top-k, returned as (row, squared-L2 distance)"""
+        matrix = self._matrix
+        if matrix is None or k <= 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarities = matrix @ query
+
+        k = min(k, len(similarities))
+        if k < len(similarities):
+            candidates = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            candidates = np.arange(len(similarities))
+        ranked = candidates[np.argsort(-similarities[candidates])]
+        return [(int(row), float(2.0 - 2.0 * similarities[row])) for row in ranked]
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=self._texts[row], metadata=dict(self._metadatas[row])), distance)
+            for row, distance in self._top_k(embedding, k)
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def persist(self):
+        """Writes are flushed on add; kept for parity with Chroma"""
+        pass
+
+    def delete_collection(self):
+        """Remove all vectors and metadata from disk"""
+        with self._lock:
+            self._matrix = None
+            self._dim = None
+            self._ids, self._texts, self._metadatas = [], [], []
+            shutil.rmtree(self.persist_directory, ignore_errors=True)
+            self.persist_directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        persist_directory: str = "./knowledge_base/embeddings",
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        store = cls(persist_directory=persist_directory, embedding_function=embedding)
+        store.add_texts(texts, metadatas)
+        return store
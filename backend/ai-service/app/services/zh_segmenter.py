@@ -0,0 +1,152 @@
+"""Dictionary-driven maximum-match segmenter for Chinese food and exercise text."""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import re
+
+from .quantity_scanner import UNIT_ALIASES, NumberToken
+from .text_matcher import TextMatch
+
+CJK_CHAR = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+ZH_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+ZH_MULTIPLIERS = {"十": 10, "百": 100, "千": 1000, "万": 10000}
+HALF = "半"
+# 两 is 2 only at the start of a numeral; after one ("三两") it is the liang unit
+LIANG = "两"
+# Chinese measure words (个, 碗, 分钟, ...) -> canonical unit, shared with the number scanner
+ZH_MEASURE_WORDS = {word: unit for word, unit in UNIT_ALIASES.items() if CJK_CHAR.match(word)}
+_MAX_MEASURE_LEN = max(len(word) for word in ZH_MEASURE_WORDS)
+_ARABIC_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+_END = ""  # Trie key marking a complete word
+
+
+def parse_zh_number(numeral: str) -> Optional[float]:
+    """
+    Value of a Chinese numeral: "三" -> 3, "十二" -> 12, "两百五十" -> 250, "半" -> 0.5
+
+    Returns None for anything else, including "三两" (three liang, not a number).
+    """
+    if numeral == HALF:
+        return 0.5
+    total = section = digit = 0
+    has_digit = False
+    for position, char in enumerate(numeral):
+        if char == LIANG and position > 0:
+            return None
+        if char in ZH_DIGITS:
+            digit, has_digit = ZH_DIGITS[char], True
+        elif char == "万":
+            total += (section + digit) * 10000
+            section, digit, has_digit = 0, 0, False
+        elif char in ZH_MULTIPLIERS:
+            # "十二" leaves out the leading 一
+            section += (digit if has_digit else 1) * ZH_MULTIPLIERS[char]
+            digit, has_digit = 0, False
+        else:
+            return None
+    return float(total + section + digit)
+
+
+class ZhSegmentation(NamedTuple):
+    """Lexicon words found in the text, and the quantities written with Chinese numerals"""
+    words: List[TextMatch]
+    numbers: List[NumberToken]
+
+
+class ZhSegmenter:
+    """
+    Forward maximum-match segmenter over a {word: value} lexicon
+
+    The lexicon lives in a dict trie built once. At each position the
+    longest lexicon word wins; otherwise a run of Chinese numerals
+    (两, 三十, 半) followed by a measure word (个, 碗, 分钟) becomes a
+    NumberToken with the measure word's canonical unit, so "两个鸡蛋" reads
+    as 2 pieces of egg. Arabic numbers are left to the number scanner;
+    a measure word right after one ("3两") is consumed as its unit rather
+    than read as a numeral.
+    """
+
+    def __init__(self, lexicon: Dict[str, Any]):
+        self._trie: Dict[str, Any] = {}
+        for word, value in lexicon.items():
+            if not word:
+                continue
+            node = self._trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[_END] = (word, value)
+        self._size = sum(1 for word in lexicon if word)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _longest_word(self, text: str, start: int) -> Optional[Tuple[int, str, Any]]:
+        node, found = self._trie, None
+        for position in range(start, len(text)):
+            node = node.get(text[position])
+            if node is None:
+                break
+            if _END in node:
+                found = (position + 1, *node[_END])
+        return found
+
+    @staticmethod
+    def _measure_word(text: str, start: int) -> Optional[Tuple[int, str]]:
+        for length in range(min(_MAX_MEASURE_LEN, len(text) - start), 0, -1):
+            unit = ZH_MEASURE_WORDS.get(text[start:start + length])
+            if unit is not None:
+                return start + length, unit
+        return None
+
+    @staticmethod
+    def _numeral_end(text: str, start: int) -> int:
+        if text.startswith(HALF, start):
+            return start + 1
+        end = start
+        while end < len(text) and (text[end] in ZH_DIGITS or text[end] in ZH_MULTIPLIERS):
+            if text[end] == LIANG and end > start:
+                break
+            end += 1
+        return end
+
+    def segment(self, text: str) -> ZhSegmentation:
+        words: List[TextMatch] = []
+        numbers: List[NumberToken] = []
+        position = 0
+        while position < len(text):
+            word = self._longest_word(text, position)
+            numeral_end = self._numeral_end(text, position)
+
+            # A lexicon word at least as long as the numeral wins ("三明治" is a food)
+            if word is not None and word[0] - position >= numeral_end - position:
+                end, key, value = word
+                words.append(TextMatch(position, end, key, value))
+                position = end
+                continue
+
+            arabic = _ARABIC_NUMBER.match(text, position)
+            if arabic is not None:
+                # "3两", "200克": the measure word is this number's unit, not a numeral
+                measure = self._measure_word(text, arabic.end())
+                position = measure[0] if measure else arabic.end()
+                continue
+
+            if numeral_end > position:
+                value = parse_zh_number(text[position:numeral_end])
+                measure = self._measure_word(text, numeral_end)
+                if value is not None and measure is not None:
+                    end, unit = measure
+                    # "一个半" is one and a half
+                    if text.startswith(HALF, end) and value >= 1:
+                        value, end = value + 0.5, end + 1
+                    numbers.append(NumberToken(position, end, f"{value:g}", value, unit, False))
+                    position = end
+                    continue
+                if value is not None and self._longest_word(text, numeral_end) is not None:
+                    # Numeral straight before a word: "两鸡蛋"
+                    numbers.append(NumberToken(position, numeral_end, f"{value:g}", value, None, False))
+                position = numeral_end
+                continue
+
+            position += 1
+        return ZhSegmentation(words, numbers)
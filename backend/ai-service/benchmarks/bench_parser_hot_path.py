@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark the parser hot path: finding mentions and their quantities
+
+The old path scanned every dictionary entry with `name in text` and, for
+each hit, built and ran per-entry regexes (`re.escape(name)` plus the
+duration/rep patterns). Once the dictionary holds more distinct patterns
+than the `re` module's cache, every call recompiles. The new path finds
+mentions with the Aho-Corasick matcher and reads every number and unit
+with one precompiled scanner pass.
+
+Reports mention+quantity extraction latency per description, without
+building response models, so only the hot path is measured.
+
+Usage:
+    python benchmarks/bench_parser_hot_path.py --sizes 10 100 1000 10000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.text_matcher import AhoCorasickMatcher
+from app.services.quantity_scanner import attach_quantities, scan_numbers
+
+SYLLABLES = ["ba", "ko", "ri", "mu", "sa", "te", "lo", "ne", "chi", "pa", "do", "ve", "qu", "zan", "mel"]
+FOODS = ["bread", "apple", "milk", "chicken breast", "rice", "yogurt", "oats", "banana", "egg"]
+EXERCISES = ["running", "walking", "cycling", "swimming", "push-ups", "squats", "planks", "jumping jacks"]
+DESCRIPTIONS = [
+    "for breakfast i had 2 slices of bread, 1 apple and a cup of milk",
+    "lunch was chicken breast 2 servings with rice and a side of yogurt",
+    "i ate oats with 1 banana and 2 egg after running for 30 minutes",
+    "did 20 push-ups and 15 squats, then walking for 45 mins",
+]
+
+
+def synthetic_names(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        names.add(" ".join(words))
+    return sorted(names)
+
+
+def old_hot_path(dictionary, exercises, text):
+    """The per-entry scan and per-call regexes ParserService used to run"""
+    found = []
+    for name in dictionary:
+        if name in text:
+            match = re.search(r'(\d+\.?\d*)\s*(?:cups?|slices?|pieces?|servings?)?\s*' + re.escape(name), text)
+            found.append((name, match.group(1) if match else None))
+    for name in exercises:
+        if name in text:
+            duration = None
+            for pattern in (r'(\d+)\s*(?:minutes?|mins?)', r'for\s*(\d+)', r'(\d+)\s*' + re.escape(name)):
+                match = re.search(pattern, text)
+                if match:
+                    duration = int(match.group(1))
+                    break
+            reps = None
+            for pattern in (r'(\d+)\s*' + re.escape(name), r'did\s*(\d+)', r'(\d+)\s*reps?'):
+                match = re.search(pattern, text)
+                if match:
+                    reps = int(match.group(1))
+                    break
+            found.append((name, duration, reps))
+    return found
+
+
+def new_hot_path(food_matcher, exercise_matcher, text):
+    """One automaton pass per dictionary, one scanner pass for numbers"""
+    numbers = scan_numbers(text)
+    return (
+        attach_quantities(text, food_matcher.find_all(text), numbers)
+        + attach_quantities(text, exercise_matcher.find_all(text), numbers)
+    )
+
+
+def time_per_call(fn, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for text in DESCRIPTIONS:
+            fn(text)
+    return (time.perf_counter() - started) * 1000 / (repeats * len(DESCRIPTIONS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    exercises = {name: None for name in EXERCISES}
+    exercise_matcher = AhoCorasickMatcher(exercises)
+    print(f"{'entries':>8} {'old ms':>9} {'new ms':>9} {'speedup':>8}")
+    for size in args.sizes:
+        dictionary = {name: None for name in FOODS + synthetic_names(max(size - len(FOODS), 0))}
+        food_matcher = AhoCorasickMatcher(dictionary)
+
+        old_ms = time_per_call(lambda text: old_hot_path(dictionary, exercises, text), args.repeats)
+        new_ms = time_per_call(lambda text: new_hot_path(food_matcher, exercise_matcher, text), args.repeats)
+        print(f"{len(dictionary):>8} {old_ms:>9.4f} {new_ms:>9.4f} {old_ms / new_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
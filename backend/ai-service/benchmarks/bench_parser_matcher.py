@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark dictionary matching as the food database grows
+
+Compares the old per-entry substring scan (`name in text` for every entry)
+with the Aho-Corasick matcher ParserService now uses, over synthetic
+dictionaries of increasing size. Reports build time and per-description
+matching latency.
+
+Usage:
+    python benchmarks/bench_parser_matcher.py --sizes 10 100 1000 10000 50000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.text_matcher import AhoCorasickMatcher
+
+SYLLABLES = ["ba", "ko", "ri", "mu", "sa", "te", "lo", "ne", "chi", "pa", "do", "ve", "qu", "zan", "mel"]
+# (description, foods it mentions)
+DESCRIPTIONS = [
+    ("for breakfast i had 2 slices of bread, an apple and a cup of milk", {"bread", "apple", "milk"}),
+    ("lunch was 200g chicken breast with rice and a side of yogurt", {"chicken breast", "rice", "yogurt"}),
+    ("i ate oats with banana and two eggs after my run", {"oats", "banana", "egg"}),
+]
+
+
+def synthetic_names(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        names.add(" ".join(words))
+    return sorted(names)
+
+
+def naive_scan(dictionary, text):
+    return [name for name in dictionary if name in text]
+
+
+def time_per_call(fn, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for text, _ in DESCRIPTIONS:
+            fn(text)
+    return (time.perf_counter() - started) * 1000 / (repeats * len(DESCRIPTIONS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 50000])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    real_foods = sorted(set().union(*(expected for _, expected in DESCRIPTIONS)))
+    print(f"{'entries':>8} {'build ms':>9} {'naive ms':>9} {'automaton ms':>13} {'speedup':>8}")
+    for size in args.sizes:
+        dictionary = {name: None for name in real_foods + synthetic_names(max(size - len(real_foods), 0))}
+
+        started = time.perf_counter()
+        matcher = AhoCorasickMatcher(dictionary)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        for text, expected in DESCRIPTIONS:
+            found = {match.key for match in matcher.find_all(text)}
+            assert expected <= found, f"missed {expected - found} in {text!r}"
+
+        naive_ms = time_per_call(lambda text: naive_scan(dictionary, text), args.repeats)
+        automaton_ms = time_per_call(matcher.find_all, args.repeats)
+        print(f"{len(dictionary):>8} {build_ms:>9.1f} {naive_ms:>9.4f} {automaton_ms:>13.4f} {naive_ms / automaton_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
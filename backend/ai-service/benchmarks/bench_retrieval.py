@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Compare vector, lexical (BM25) and hybrid retrieval on the preset knowledge
+
+Seeds a throwaway knowledge base with PRESET_KNOWLEDGE, runs a labelled
+query set through RAGKnowledgeManager.search_knowledge in each mode and
+prints recall@k, mean latency and how many embedding calls each mode made.
+Embeddings are served from the on-disk cache after the first run.
+
+Usage:
+    SILICONFLOW_API_KEY=... python benchmarks/bench_retrieval.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_knowledge_manager import RAGKnowledgeManager, setup_default_knowledge
+
+# (query, title of the chunk that should be retrieved)
+LABELLED_QUERIES = [
+    ("TEF", "蛋白质摄入量与减脂期肌肉保持"),
+    ("EPOC", "HIIT训练与传统有氧运动的减脂效果对比"),
+    ("蛋白质 1.6-2.2克", "蛋白质摄入量与减脂期肌肉保持"),
+    ("蛋白质摄入量", "蛋白质摄入量与减脂期肌肉保持"),
+    ("减脂平台期怎么突破", "减脂平台期的生理机制与突破策略"),
+    ("HIIT训练效果", "HIIT训练与传统有氧运动的减脂效果对比"),
+    ("力量训练能保持肌肉吗", "力量训练在减脂中的关键作用"),
+    ("每周减多少公斤比较安全", "热量缺口与减脂的科学原理"),
+    ("how much protein should I eat", "蛋白质摄入量与减脂期肌肉保持"),
+    ("why did my weight loss stall", "减脂平台期的生理机制与突破策略"),
+]
+
+MODES = ["vector", "lexical", "hybrid"]
+
+
+def main(k: int = 3):
+    api_key = os.getenv("SILICONFLOW_API_KEY")
+    if not api_key:
+        print("Set SILICONFLOW_API_KEY to run this benchmark")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = RAGKnowledgeManager(
+            api_key,
+            knowledge_dir=str(Path(tmp) / "knowledge_base"),
+            chroma_dir=str(Path(tmp) / "chroma_db"),
+            # Share the embedding cache across runs so only the first run pays
+            embedding_cache_path="./knowledge_base/embedding_cache.sqlite3"
+        )
+        asyncio.run(setup_default_knowledge(manager))
+
+        print(f"{'mode':<8} {'recall@' + str(k):>9} {'mean ms':>9} {'embed calls':>12}")
+        for mode in MODES:
+            hits = 0
+            latencies = []
+            lookups_before = manager.embedding_cache.misses + manager.embedding_cache.hits
+
+            for query, expected_title in LABELLED_QUERIES:
+                started = time.perf_counter()
+                results = manager.search_knowledge(query, k=k, score_threshold=2.0, mode=mode)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if any(r["metadata"].get("title") == expected_title for r in results):
+                    hits += 1
+
+            embed_calls = manager.embedding_cache.misses + manager.embedding_cache.hits - lookups_before
+            recall = hits / len(LABELLED_QUERIES)
+            print(f"{mode:<8} {recall:>9.2f} {sum(latencies) / len(latencies):>9.2f} {embed_calls:>12}")
+
+        asyncio.run(manager.aclose())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark event-loop responsiveness while database calls are in flight
+
+supabase-py's execute() blocks. The old data layer called it straight
+from `async def` methods, so each query froze the event loop for its
+whole round trip and concurrent requests ran one after another. The
+service now runs every query on a bounded thread pool and awaits it.
+
+A fake client stands in for Supabase, sleeping `--latency-ms` per query
+like a network round trip. While `--calls` get_user_profile() calls run
+concurrently, a heartbeat task ticks every millisecond; its worst delay
+is the longest the loop was unable to serve anything else.
+
+Usage:
+    python benchmarks/bench_supabase_concurrency.py --calls 100 --latency-ms 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.supabase_service import SupabaseService
+
+HEARTBEAT_SECONDS = 0.001
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable query whose execute() blocks like an HTTP round trip"""
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+
+    def __getattr__(self, name):
+        # table(), select(), eq(), single(), ... all keep building the same query
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        time.sleep(self.latency_seconds)
+        return FakeResponse({"user_id": "user", "age": 30})
+
+
+class FakeClient:
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+
+    def table(self, name):
+        return FakeQuery(self.latency_seconds)
+
+
+class BlockingSupabaseService(SupabaseService):
+    """The previous behaviour: execute() called directly on the event loop"""
+
+    async def _execute(self, query):
+        return query.execute()
+
+
+def make_service(cls, latency_seconds: float, workers: int) -> SupabaseService:
+    service = cls()
+    service.client = FakeClient(latency_seconds)
+    service._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="supabase")
+    return service
+
+
+async def run(service: SupabaseService, calls: int):
+    lags = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            lags.append(time.perf_counter() - started - HEARTBEAT_SECONDS)
+
+    ticker = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(service.get_user_profile(f"user-{i}") for i in range(calls)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker
+    assert all(results), "every call should return the fake profile"
+    return elapsed, max(lags, default=0.0), len(lags)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    latency_seconds = args.latency_ms / 1000
+    print(f"{args.calls} concurrent calls, {args.latency_ms:g} ms per query, {args.workers} workers")
+    print(f"{'data layer':>12} {'total ms':>10} {'max loop lag ms':>16} {'heartbeats':>11}")
+    for label, cls in (("blocking", BlockingSupabaseService), ("thread pool", SupabaseService)):
+        service = make_service(cls, latency_seconds, args.workers)
+        try:
+            elapsed, max_lag, beats = asyncio.run(run(service, args.calls))
+        finally:
+            service.close()
+        print(f"{label:>12} {elapsed * 1000:>10.1f} {max_lag * 1000:>16.1f} {beats:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark the NumPy vector index against embedded Chroma
+
+Builds both stores from the same random unit vectors, then measures each
+backend in a fresh subprocess: open time, query latency (p50/p95) and peak
+RSS. No embedding API calls are made.
+
+Usage:
+    python benchmarks/bench_vector_store.py --count 20000 --dim 1024 --queries 200
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.vector_index import NumpyVectorStore
+
+
+def random_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(workdir: Path, count: int, dim: int):
+    vectors = random_vectors(count, dim, seed=0)
+    texts = [f"chunk {i}" for i in range(count)]
+    metadatas = [{"title": f"doc {i // 10}", "source": "benchmark"} for i in range(count)]
+
+    started = time.perf_counter()
+    NumpyVectorStore(str(workdir / "numpy"), embedding_function=None).add_vectors(vectors, texts, metadatas)
+    print(f"Built NumPy index in {time.perf_counter() - started:.2f}s")
+
+    import chromadb
+    started = time.perf_counter()
+    client = chromadb.PersistentClient(path=str(workdir / "chroma"))
+    collection = client.get_or_create_collection("benchmark")
+    # Chroma caps the size of a single add call
+    for start in range(0, count, 5000):
+        end = min(start + 5000, count)
+        collection.add(
+            ids=[str(i) for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            documents=texts[start:end],
+            metadatas=metadatas[start:end]
+        )
+    print(f"Built Chroma collection in {time.perf_counter() - started:.2f}s")
+
+
+def measure(backend: str, workdir: Path, dim: int, queries: int, k: int):
+    query_vectors = random_vectors(queries, dim, seed=1)
+
+    started = time.perf_counter()
+    if backend == "numpy":
+        store = NumpyVectorStore(str(workdir / "numpy"), embedding_function=None)
+        search = lambda vector: store.similarity_search_by_vector_with_score(vector.tolist(), k=k)
+    else:
+        import chromadb
+        collection = chromadb.PersistentClient(path=str(workdir / "chroma")).get_collection("benchmark")
+        search = lambda vector: collection.query(query_embeddings=[vector.tolist()], n_results=k)
+    open_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for vector in query_vectors:
+        started = time.perf_counter()
+        search(vector)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+    print(json.dumps({
+        "backend": backend,
+        "open_ms": round(open_ms, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "peak_rss_mb": round(rss_mb, 1)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--measure", choices=["numpy", "chroma"], help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, Path(args.workdir), args.dim, args.queries, args.k)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        build(workdir, args.count, args.dim)
+
+        results = []
+        for backend in ("numpy", "chroma"):
+            # A fresh process per backend so RSS and open time aren't shared
+            output = subprocess.run(
+                [sys.executable, __file__, "--measure", backend, "--workdir", str(workdir),
+                 "--dim", str(args.dim), "--queries", str(args.queries), "--k", str(args.k)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"\n{args.count} vectors x {args.dim} dims, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<8} {'open ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['backend']:<8} {r['open_ms']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['peak_rss_mb']:>12}")
+
+
+if __name__ == "__main__":
+    main()
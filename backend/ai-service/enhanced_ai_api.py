@@ -5,17 +5,24 @@
 
 from fastapi import FastAPI, HTTPException, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import bcrypt
 import jwt
 from datetime import datetime, timedelta
 import uuid
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 import httpx
+import asyncio
+import json
 import logging
+import time
 
 # 导入RAG知识库管理器
 from rag_knowledge_manager import RAGKnowledgeManager, setup_default_knowledge
+from app.services.conversation_store import ConversationStore
+from app.services.prompt_builder import PromptBuilder, prompt_usage_summary
+from app.services.token_counter import count_tokens
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -51,15 +58,29 @@ DEFAULT_MODEL = "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B"
 # 全局RAG管理器
 rag_manager = None
 
-# 会话记忆存储
-conversation_memory = {}
+# 会话记忆存储：按conversation_id隔离，LRU/TTL限制内存占用
+conversation_store = ConversationStore(max_conversations=1000, ttl_seconds=86400, max_messages=20)
+HISTORY_TOKEN_BUDGET = 1500  # 发送给模型的历史对话token上限
+
+# 提示词总token预算：按 系统提示 > 用户信息 > 检索片段 > 历史对话 的优先级填充
+MAX_CONTEXT_TOKENS = 4000
+prompt_builder = PromptBuilder(max_tokens=MAX_CONTEXT_TOKENS)
+
+RAG_INSTRUCTIONS = """
+
+请基于上述科学研究回答用户问题。确保：
+1. 引用具体的研究发现
+2. 提供基于证据的建议
+3. 保持科学性和准确性
+4. 如果研究结果之间有矛盾，请说明
+"""
 
 async def initialize_rag():
     """初始化RAG系统"""
     global rag_manager
     try:
         logger.info("Initializing RAG knowledge manager...")
-        rag_manager = RAGKnowledgeManager(OPENAI_API_KEY)
+        rag_manager = await asyncio.to_thread(RAGKnowledgeManager, OPENAI_API_KEY)
         
         # 检查是否需要设置默认知识库
         stats = rag_manager.get_knowledge_stats()
@@ -78,41 +99,56 @@ async def initialize_rag():
 async def startup_event():
     await initialize_rag()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if rag_manager:
+        await rag_manager.aclose()
+
+async def build_rag_messages(
+    messages: List[Dict[str, str]],
+    user_query: str,
+    user_profile: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, str]], List[str], int, Dict[str, int]]:
+    """RAG检索相关知识，在token预算内组装提示词，返回(消息, 来源, 命中文档数, 各部分token用量)"""
+    # 1. RAG检索相关知识（向量检索是同步调用，放到线程中执行）
+    relevant_docs = []
+    if rag_manager:
+        relevant_docs = await asyncio.to_thread(rag_manager.search_knowledge, user_query, k=3, score_threshold=0.7)
+    
+    # 2. 按优先级裁剪：messages为[system, 历史对话..., 当前问题]
+    system_message = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    history = messages[1:-1] if system_message else messages[:-1]
+    chunks = [
+        f"### {doc['metadata']['title']}\n来源：{doc['metadata']['source']}\n{doc['content']}"
+        for doc in relevant_docs
+    ]
+    fitted = prompt_builder.build(
+        system=system_message,
+        question=user_query,
+        profile=f"\n\n用户信息：{user_profile}" if user_profile else "",
+        chunks=chunks,
+        history=history,
+        reserve_tokens=count_tokens(RAG_INSTRUCTIONS) if chunks else 0
+    )
+    
+    # 3. 构建增强的system prompt（只引用放得下的研究片段）
+    enhanced_system = system_message + fitted["profile"]
+    if fitted["chunks"]:
+        enhanced_system += "\n\n## 相关科学研究：\n" + "\n\n".join(fitted["chunks"]) + RAG_INSTRUCTIONS
+    sources = [doc['metadata']['title'] for doc in relevant_docs[:len(fitted["chunks"])]]
+    
+    messages = [{"role": "system", "content": enhanced_system}, *fitted["history"], messages[-1]]
+    return messages, sources, len(relevant_docs), prompt_usage_summary(fitted)
+
 # AI API客户端
-async def call_ai_with_rag(messages: List[Dict[str, str]], user_query: str) -> Dict[str, Any]:
+async def call_ai_with_rag(
+    messages: List[Dict[str, str]],
+    user_query: str,
+    user_profile: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """调用AI API，集成RAG检索"""
     try:
-        # 1. RAG检索相关知识
-        relevant_docs = []
-        if rag_manager:
-            relevant_docs = rag_manager.search_knowledge(user_query, k=3, score_threshold=0.7)
-        
-        # 2. 构建增强的system prompt
-        system_message = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
-        
-        if relevant_docs:
-            rag_context = "\n\n## 相关科学研究：\n"
-            sources = []
-            for doc in relevant_docs:
-                rag_context += f"### {doc['metadata']['title']}\n"
-                rag_context += f"来源：{doc['metadata']['source']}\n"
-                rag_context += f"{doc['content']}\n\n"
-                sources.append(doc['metadata']['title'])
-            
-            # 更新system message
-            enhanced_system = f"""{system_message}
-
-{rag_context}
-
-请基于上述科学研究回答用户问题。确保：
-1. 引用具体的研究发现
-2. 提供基于证据的建议
-3. 保持科学性和准确性
-4. 如果研究结果之间有矛盾，请说明
-"""
-            messages[0]["content"] = enhanced_system
-        else:
-            sources = []
+        messages, sources, rag_docs_found, prompt_usage = await build_rag_messages(messages, user_query, user_profile)
         
         # 3. 调用AI API
         headers = {
@@ -142,7 +178,8 @@ async def call_ai_with_rag(messages: List[Dict[str, str]], user_query: str) -> D
                 return {
                     "response": ai_response,
                     "sources": sources,
-                    "rag_docs_found": len(relevant_docs),
+                    "rag_docs_found": rag_docs_found,
+                    "prompt_usage": prompt_usage,
                     "success": True
                 }
             else:
@@ -159,6 +196,53 @@ async def call_ai_with_rag(messages: List[Dict[str, str]], user_query: str) -> D
             "error": str(e)
         }
 
+async def stream_ai_completion(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """流式调用AI API，逐个产出token；提前关闭迭代器会断开上游连接"""
+    headers = {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    data = {
+        "model": DEFAULT_MODEL,
+        "messages": messages,
+        "temperature": 0.7,
+        "max_tokens": 1500,
+        "stream": True
+    }
+    
+    async with httpx.AsyncClient() as client:
+        async with client.stream(
+            "POST",
+            f"{OPENAI_API_BASE}/chat/completions",
+            headers=headers,
+            json=data,
+            timeout=httpx.Timeout(30.0, read=60.0)
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"AI API stream error: {response.status_code} - {body.decode(errors='ignore')}")
+                raise Exception("AI API call failed")
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                
+                choices = json.loads(payload).get("choices") or []
+                if not choices:
+                    continue
+                # 只转发正文内容，推理模型的reasoning_content不下发
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    yield token
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """格式化SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 # 请求模型
 class LoginRequest(BaseModel):
     email: str
@@ -238,17 +322,10 @@ async def login(request: LoginRequest):
         }
     }
 
-@app.post("/api/chat/message")
-async def chat_message(request: MessageRequest, user_id: str = Depends(verify_token)):
-    """增强版AI聊天接口 - 集成真正的RAG检索"""
-    try:
-        # 获取或创建会话
-        conv_id = request.conversation_id or str(uuid.uuid4())
-        if conv_id not in conversation_memory:
-            conversation_memory[conv_id] = []
-        
-        # 构建系统提示
-        system_prompt = """你是一位专业的科学减脂专家。你的回答应该：
+def build_chat_messages(request: MessageRequest, conv_id: str, user_id: str) -> List[Dict[str, str]]:
+    """构建系统提示和对话历史"""
+    # 构建系统提示
+    system_prompt = """你是一位专业的科学减脂专家。你的回答应该：
 1. 基于科学研究和证据
 2. 考虑用户的个人情况
 3. 提供具体可行的建议
@@ -257,35 +334,41 @@ async def chat_message(request: MessageRequest, user_id: str = Depends(verify_to
 
 当引用科学研究时，请明确指出研究来源和关键发现。"""
 
-        if request.user_profile:
-            system_prompt += f"\n\n用户信息：{request.user_profile}"
+    # 构建对话历史
+    messages = [{"role": "system", "content": system_prompt}]
+    
+    # 添加历史对话（最近几轮，只读取当前用户自己的会话；用户信息和检索片段由build_rag_messages按预算加入）
+    recent_history = conversation_store.get_history(conv_id, owner=user_id, max_tokens=HISTORY_TOKEN_BUDGET)
+    messages.extend(recent_history)
+    
+    # 添加当前用户消息
+    messages.append({"role": "user", "content": request.message})
+    return messages
 
-        # 构建对话历史
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # 添加历史对话（最近5轮）
-        recent_history = conversation_memory[conv_id][-10:]  # 最近5轮对话
-        messages.extend(recent_history)
-        
-        # 添加当前用户消息
-        messages.append({"role": "user", "content": request.message})
+def remember_turn(conv_id: str, user_id: str, user_message: str, ai_response: str):
+    """更新会话记忆（会话长度由conversation_store限制）"""
+    conversation_store.add_turn(conv_id, user_message, ai_response, owner=user_id)
+
+@app.post("/api/chat/message")
+async def chat_message(request: MessageRequest, user_id: str = Depends(verify_token)):
+    """增强版AI聊天接口 - 集成真正的RAG检索"""
+    try:
+        # 获取或创建会话
+        conv_id = request.conversation_id or str(uuid.uuid4())
+        messages = build_chat_messages(request, conv_id, user_id)
         
         # 调用增强的AI（集成RAG）
-        result = await call_ai_with_rag(messages, request.message)
+        result = await call_ai_with_rag(messages, request.message, request.user_profile)
         
         # 更新会话记忆
-        conversation_memory[conv_id].append({"role": "user", "content": request.message})
-        conversation_memory[conv_id].append({"role": "assistant", "content": result["response"]})
-        
-        # 限制会话长度
-        if len(conversation_memory[conv_id]) > 20:
-            conversation_memory[conv_id] = conversation_memory[conv_id][-20:]
+        remember_turn(conv_id, user_id, request.message, result["response"])
         
         return {
             "response": result["response"],
             "conversation_id": conv_id,
             "sources": result["sources"],
             "rag_docs_found": result["rag_docs_found"],
+            "prompt_usage": result.get("prompt_usage"),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -300,6 +383,58 @@ async def chat_message(request: MessageRequest, user_id: str = Depends(verify_to
             "error": str(e)
         }
 
+@app.post("/api/chat/message/stream")
+async def chat_message_stream(request: MessageRequest, user_id: str = Depends(verify_token)):
+    """流式AI聊天接口 - 以SSE逐token返回，最后发送done事件（来源、会话ID、耗时）"""
+    conv_id = request.conversation_id or str(uuid.uuid4())
+    
+    async def event_stream():
+        started_at = time.perf_counter()
+        first_token_at = None
+        tokens = []
+        
+        try:
+            messages = build_chat_messages(request, conv_id, user_id)
+            messages, sources, rag_docs_found, prompt_usage = await build_rag_messages(
+                messages, request.message, request.user_profile
+            )
+            
+            async for token in stream_ai_completion(messages):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                tokens.append(token)
+                yield sse_event("token", {"content": token})
+        except asyncio.CancelledError:
+            # 客户端断开时Starlette会取消生成器，上游连接随之关闭
+            logger.info(f"Client disconnected, cancelled stream for conversation {conv_id}")
+            raise
+        except Exception as e:
+            logger.error(f"Chat stream error: {str(e)}", exc_info=True)
+            yield sse_event("error", {"message": "抱歉，我现在无法处理您的请求。请稍后再试。", "error": str(e)})
+            return
+        
+        # 更新会话记忆
+        remember_turn(conv_id, user_id, request.message, "".join(tokens))
+        
+        finished_at = time.perf_counter()
+        yield sse_event("done", {
+            "conversation_id": conv_id,
+            "sources": sources,
+            "rag_docs_found": rag_docs_found,
+            "prompt_usage": prompt_usage,
+            "timestamp": datetime.now().isoformat(),
+            "timing": {
+                "time_to_first_token_ms": round((first_token_at - started_at) * 1000, 1) if first_token_at else None,
+                "total_ms": round((finished_at - started_at) * 1000, 1)
+            }
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/profile/setup")
 async def profile_setup(request: ProfileSetupRequest, user_id: str = Depends(verify_token)):
     """个人资料设置和TDEE计算"""
@@ -370,7 +505,8 @@ async def upload_knowledge(request: DocumentUploadRequest, user_id: str = Depend
     if not rag_manager:
         raise HTTPException(status_code=500, detail="RAG system not initialized")
     
-    success = rag_manager.add_document_from_text(
+    success = await asyncio.to_thread(
+        rag_manager.add_document_from_text,
         text=request.content,
         title=request.title,
         source=request.source,
@@ -401,7 +537,7 @@ async def search_knowledge(query: str, k: int = 5, user_id: str = Depends(verify
     if not rag_manager:
         raise HTTPException(status_code=500, detail="RAG system not initialized")
     
-    results = rag_manager.search_knowledge(query, k=k)
+    results = await asyncio.to_thread(rag_manager.search_knowledge, query, k=k)
     return {
         "query": query,
         "results": results,
@@ -414,7 +550,7 @@ async def clear_knowledge(user_id: str = Depends(verify_token)):
     if not rag_manager:
         raise HTTPException(status_code=500, detail="RAG system not initialized")
     
-    success = rag_manager.clear_knowledge_base()
+    success = await asyncio.to_thread(rag_manager.clear_knowledge_base)
     if success:
         return {"message": "Knowledge base cleared successfully"}
     else:
@@ -7,6 +7,14 @@ RAG知识库管理系统
 import os
 import httpx
 import asyncio
+import hashlib
+import uuid
+import sqlite3
+import random
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 import json
@@ -20,51 +28,393 @@ from langchain.schema import Document
 from langchain.vectorstores import Chroma
 from langchain.embeddings.base import Embeddings
 
+from app.services.vector_index import NumpyVectorStore
+from app.services.lexical_index import BM25Index, reciprocal_rank_fusion
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class EmbeddingCache:
+    """
+    磁盘持久化的嵌入向量缓存
+    
+    以(模型, 文本SHA-256)为键，向量按float32紧凑二进制存储在SQLite中；
+    超过容量上限时按最近使用时间(LRU)淘汰。
+    """
+    
+    # SQLite单条语句的参数个数有限（旧版本为999），IN查询按此分批
+    QUERY_BATCH = 500
+    
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        
+        row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        self._size_bytes = row[0]
+    
+    @staticmethod
+    def _key(model: str, text: str) -> bytes:
+        """计算内容寻址的缓存键"""
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+    
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """批量查询缓存，未命中的位置返回None"""
+        keys = [self._key(model, text) for text in texts]
+        found: Dict[bytes, List[float]] = {}
+        
+        with self._lock:
+            unique_keys = list(set(keys))
+            for i in range(0, len(unique_keys), self.QUERY_BATCH):
+                batch = unique_keys[i:i + self.QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+            
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for result in results if result is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        
+        return results
+    
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """批量写入缓存，并在超出容量时淘汰最久未使用的条目"""
+        now = time.time()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            rows[self._key(model, text)] = array("f", vector).tobytes()
+        
+        with self._lock:
+            # 被覆盖条目的大小，与get_many一样分批查询
+            keys = list(rows)
+            existing = 0
+            for i in range(0, len(keys), self.QUERY_BATCH):
+                batch = keys[i:i + self.QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                existing += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchone()[0]
+            
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, blob, now) for key, blob in rows.items()]
+            )
+            self._size_bytes += sum(len(blob) for blob in rows.values()) - existing
+            
+            if self._size_bytes > self.max_bytes:
+                self._evict(self._size_bytes - self.max_bytes)
+            self._conn.commit()
+    
+    def _evict(self, bytes_to_free: int):
+        """按LRU顺序淘汰条目，直到释放足够空间（调用方持有锁）"""
+        freed = 0
+        victims = []
+        cursor = self._conn.execute(
+            "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used ASC"
+        )
+        for key, size in cursor:
+            victims.append((key,))
+            freed += size
+            if freed >= bytes_to_free:
+                break
+        cursor.close()
+        
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self._size_bytes -= freed
+        logger.info(f"Embedding cache evicted {len(victims)} entries ({freed} bytes)")
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": self._size_bytes,
+            "max_bytes": self.max_bytes
+        }
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
 class SiliconFlowEmbeddings(Embeddings):
-    """SiliconFlow API的嵌入向量实现"""
+    """
+    SiliconFlow API的嵌入向量实现
+    
+    输入按提供方限制切分批次，以有限并发发送，429/5xx自动重试。
+    异步代码应使用aembed_documents/aembed_query；同步接口只能在事件循环之外调用。
+    """
     
-    def __init__(self, api_key: str, base_url: str = "https://api.siliconflow.cn/v1"):
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+    
+    def __init__(self,
+                 api_key: str,
+                 base_url: str = "https://api.siliconflow.cn/v1",
+                 cache: Optional[EmbeddingCache] = None,
+                 batch_size: int = 32,
+                 max_concurrency: int = 4,
+                 max_retries: int = 3,
+                 timeout: float = 60.0):
         self.api_key = api_key
         self.base_url = base_url
         self.model = "BAAI/bge-m3"  # BGE-M3嵌入模型
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        
+        # 长连接客户端，按需创建并在整个进程内复用
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._client_lock = threading.Lock()
     
-    async def _call_api(self, texts: List[str]) -> List[List[float]]:
-        """调用SiliconFlow嵌入API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
+    def _client_kwargs(self) -> Dict[str, Any]:
+        """连接池和请求头配置"""
+        return {
+            "base_url": self.base_url,
+            "headers": {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            "timeout": self.timeout,
+            "limits": httpx.Limits(
+                max_connections=self.max_concurrency * 2,
+                max_keepalive_connections=self.max_concurrency
+            )
         }
+    
+    async def _get_async_client(self) -> httpx.AsyncClient:
+        """获取绑定当前事件循环的异步连接池"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            # 连接不能跨事件循环复用，循环变化时重建，并关闭旧连接池
+            old_client, old_loop = self._async_client, self._async_client_loop
+            self._async_client = httpx.AsyncClient(**self._client_kwargs())
+            self._async_client_loop = loop
+            if old_client is not None:
+                await self._close_stale_client(old_client, old_loop)
+        return self._async_client
+    
+    async def _close_stale_client(self, client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]):
+        """旧循环仍在运行时交给它关闭连接，否则在当前循环关闭"""
+        try:
+            if loop is not None and loop.is_running() and not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            else:
+                await client.aclose()
+        except Exception as e:
+            # 旧循环已关闭时传输层无法再调度，套接字随对象回收释放
+            logger.warning(f"Failed to close stale embedding client: {e}")
+    
+    def _get_sync_client(self) -> httpx.Client:
+        """获取同步连接池和批次线程池"""
+        with self._client_lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(**self._client_kwargs())
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix="embeddings"
+                )
+            return self._sync_client
+    
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        """按提供方单次请求上限切分输入"""
+        return [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+    
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """指数退避，优先遵循Retry-After"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return 0.5 * (2 ** attempt) + random.uniform(0, 0.25)
+    
+    def _parse_response(self, response: httpx.Response) -> List[List[float]]:
+        """解析嵌入结果，按index还原输入顺序"""
+        result = response.json()
+        items = sorted(result["data"], key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in items]
+    
+    async def _post_batch(self, texts: List[str]) -> List[List[float]]:
+        """发送单个批次，429/5xx及网络错误时重试"""
+        client = await self._get_async_client()
         
-        data = {
-            "model": self.model,
-            "input": texts
-        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post("/embeddings", json={"model": self.model, "input": texts})
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise Exception(f"Embedding API call failed: {e}")
+                await asyncio.sleep(self._retry_delay(attempt))
+                continue
+            
+            if response.status_code == 200:
+                return self._parse_response(response)
+            if response.status_code in self.RETRYABLE_STATUS and attempt < self.max_retries:
+                logger.warning(f"Embedding API returned {response.status_code}, retrying (attempt {attempt + 1})")
+                await asyncio.sleep(self._retry_delay(attempt, response))
+                continue
+            
+            logger.error(f"Embedding API error: {response.status_code} - {response.text}")
+            raise Exception(f"Embedding API call failed: {response.status_code}")
+    
+    def _post_batch_sync(self, texts: List[str]) -> List[List[float]]:
+        """同步版本的_post_batch，供线程池调用"""
+        client = self._get_sync_client()
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{self.base_url}/embeddings",
-                headers=headers,
-                json=data
-            )
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = client.post("/embeddings", json={"model": self.model, "input": texts})
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise Exception(f"Embedding API call failed: {e}")
+                time.sleep(self._retry_delay(attempt))
+                continue
             
             if response.status_code == 200:
-                result = response.json()
-                return [item["embedding"] for item in result["data"]]
-            else:
-                logger.error(f"Embedding API error: {response.status_code} - {response.text}")
-                raise Exception(f"Embedding API call failed: {response.status_code}")
+                return self._parse_response(response)
+            if response.status_code in self.RETRYABLE_STATUS and attempt < self.max_retries:
+                logger.warning(f"Embedding API returned {response.status_code}, retrying (attempt {attempt + 1})")
+                time.sleep(self._retry_delay(attempt, response))
+                continue
+            
+            logger.error(f"Embedding API error: {response.status_code} - {response.text}")
+            raise Exception(f"Embedding API call failed: {response.status_code}")
+    
+    async def _call_api(self, texts: List[str]) -> List[List[float]]:
+        """调用SiliconFlow嵌入API（分批、有限并发）"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def run(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._post_batch(batch)
+        
+        results = await asyncio.gather(*(run(batch) for batch in self._batches(texts)))
+        return [embedding for batch in results for embedding in batch]
+    
+    def _call_api_sync(self, texts: List[str]) -> List[List[float]]:
+        """同步调用嵌入API，批次在线程池中并发发送"""
+        self._get_sync_client()
+        results = self._executor.map(self._post_batch_sync, self._batches(texts))
+        return [embedding for batch in results for embedding in batch]
+    
+    @staticmethod
+    def _ensure_off_event_loop():
+        """同步接口会阻塞线程，禁止在事件循环线程中调用"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        raise RuntimeError(
+            "SiliconFlowEmbeddings sync API called on a running event loop; "
+            "use aembed_documents/aembed_query or run it in a worker thread"
+        )
+    
+    def _missing_texts(self, texts: List[str], embeddings: List[Optional[List[float]]]) -> List[str]:
+        """未命中缓存的文本（去重，保持顺序）"""
+        return list(dict.fromkeys(text for text, emb in zip(texts, embeddings) if emb is None))
+    
+    def _merge(self,
+               texts: List[str],
+               embeddings: List[Optional[List[float]]],
+               missing: List[str],
+               fetched: List[List[float]]) -> List[List[float]]:
+        """写回缓存并合并命中与新请求的结果"""
+        self.cache.put_many(self.model, missing, fetched)
+        by_text = dict(zip(missing, fetched))
+        return [emb if emb is not None else by_text[text] for text, emb in zip(texts, embeddings)]
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """嵌入多个文档"""
-        return asyncio.run(self._call_api(texts))
+        """嵌入多个文档（先查缓存，只为未命中的文本调用API）"""
+        self._ensure_off_event_loop()
+        if not texts:
+            return []
+        if not self.cache:
+            return self._call_api_sync(texts)
+        
+        embeddings = self.cache.get_many(self.model, texts)
+        missing = self._missing_texts(texts, embeddings)
+        if not missing:
+            return embeddings
+        return self._merge(texts, embeddings, missing, self._call_api_sync(missing))
     
     def embed_query(self, text: str) -> List[float]:
         """嵌入查询文本"""
-        embeddings = asyncio.run(self._call_api([text]))
+        embeddings = self.embed_documents([text])
         return embeddings[0]
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """异步嵌入多个文档"""
+        if not texts:
+            return []
+        if not self.cache:
+            return await self._call_api(texts)
+        
+        embeddings = await asyncio.to_thread(self.cache.get_many, self.model, texts)
+        missing = self._missing_texts(texts, embeddings)
+        if not missing:
+            return embeddings
+        fetched = await self._call_api(missing)
+        return await asyncio.to_thread(self._merge, texts, embeddings, missing, fetched)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """异步嵌入查询文本"""
+        embeddings = await self.aembed_documents([text])
+        return embeddings[0]
+    
+    def close(self):
+        """关闭连接池"""
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._executor.shutdown(wait=False)
+            self._sync_client = None
+            self._executor = None
+    
+    async def aclose(self):
+        """关闭异步和同步连接池"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
+        self.close()
 
 
 class RAGKnowledgeManager:
@@ -73,18 +423,29 @@ class RAGKnowledgeManager:
     def __init__(self, 
                  api_key: str,
                  knowledge_dir: str = "./knowledge_base",
-                 chroma_dir: str = "./chroma_db"):
+                 chroma_dir: str = "./chroma_db",
+                 embedding_cache_path: Optional[str] = None,
+                 vector_backend: str = "chroma",
+                 vector_store_path: Optional[str] = None):
         
         self.api_key = api_key
         self.knowledge_dir = Path(knowledge_dir)
         self.chroma_dir = Path(chroma_dir)
+        # "chroma"使用嵌入式Chroma，"numpy"使用内存映射的NumPy索引
+        self.vector_backend = vector_backend
+        self.vector_store_path = Path(vector_store_path or self.knowledge_dir / "embeddings")
         
         # 创建目录
         self.knowledge_dir.mkdir(exist_ok=True)
         self.chroma_dir.mkdir(exist_ok=True)
         
+        # 嵌入缓存放在向量库目录之外，重建索引时可以直接复用
+        self.embedding_cache = EmbeddingCache(
+            embedding_cache_path or str(self.knowledge_dir / "embedding_cache.sqlite3")
+        )
+        
         # 初始化组件
-        self.embeddings = SiliconFlowEmbeddings(api_key)
+        self.embeddings = SiliconFlowEmbeddings(api_key, cache=self.embedding_cache)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
@@ -94,21 +455,77 @@ class RAGKnowledgeManager:
         
         # 初始化向量数据库
         self.vectorstore = None
+        self.lexical_index = None
         self._init_vectorstore()
     
     def _init_vectorstore(self):
-        """初始化Chroma向量数据库"""
+        """初始化向量数据库（Chroma或NumPy索引）"""
         try:
-            self.vectorstore = Chroma(
-                persist_directory=str(self.chroma_dir),
-                embedding_function=self.embeddings,
-                collection_name="fat_loss_research"
-            )
-            logger.info(f"Vectorstore initialized with {self.vectorstore._collection.count()} documents")
+            if self.vector_backend == "numpy":
+                self.vectorstore = NumpyVectorStore(
+                    persist_directory=str(self.vector_store_path),
+                    embedding_function=self.embeddings
+                )
+            else:
+                self.vectorstore = Chroma(
+                    persist_directory=str(self.chroma_dir),
+                    embedding_function=self.embeddings,
+                    collection_name="fat_loss_research"
+                )
+            logger.info(f"Vectorstore initialized with {self._count()} documents")
+            self._init_lexical_index()
         except Exception as e:
             logger.error(f"Failed to initialize vectorstore: {e}")
             self.vectorstore = None
     
+    def _init_lexical_index(self):
+        """加载与向量库并存的BM25倒排索引，旧知识库缺失时从向量库重建"""
+        index_dir = self.vector_store_path if self.vector_backend == "numpy" else self.chroma_dir
+        self.lexical_index = BM25Index(str(index_dir / "bm25_index.json"))
+        
+        if len(self.lexical_index) == 0 and self._count() > 0:
+            if isinstance(self.vectorstore, NumpyVectorStore):
+                ids, contents, metadatas = self.vectorstore.get_all()
+            else:
+                records = self.vectorstore._collection.get(include=["documents", "metadatas"])
+                ids, contents, metadatas = records["ids"], records["documents"], records["metadatas"]
+            self.lexical_index.add(ids, contents, metadatas)
+            self.lexical_index.save()
+            logger.info(f"Rebuilt lexical index with {len(ids)} chunks")
+    
+    def _add_chunks(self, chunks: List[Document]):
+        """切片同时写入向量库和BM25索引，两者共用切片ID"""
+        ids = [str(uuid.uuid4()) for _ in chunks]
+        self.vectorstore.add_documents(chunks, ids=ids)
+        self.vectorstore.persist()
+        
+        self.lexical_index.add(
+            ids,
+            [chunk.page_content for chunk in chunks],
+            [chunk.metadata for chunk in chunks]
+        )
+        self.lexical_index.save()
+    
+    def _count(self) -> int:
+        """向量库中的切片数量"""
+        if isinstance(self.vectorstore, NumpyVectorStore):
+            return self.vectorstore.count()
+        return self.vectorstore._collection.count()
+    
+    def _text_chunks(self, text: str, title: str, source: str, category: str) -> List[Document]:
+        """创建文档对象并切片"""
+        document = Document(
+            page_content=text,
+            metadata={
+                "title": title,
+                "source": source,
+                "category": category,
+                "added_at": datetime.now().isoformat(),
+                "length": len(text)
+            }
+        )
+        return self.text_splitter.split_documents([document])
+    
     def add_document_from_text(self, 
                               text: str, 
                               title: str, 
@@ -116,25 +533,12 @@ class RAGKnowledgeManager:
                               category: str = "research") -> bool:
         """从文本添加文档到知识库"""
         try:
-            # 创建文档对象
-            document = Document(
-                page_content=text,
-                metadata={
-                    "title": title,
-                    "source": source,
-                    "category": category,
-                    "added_at": datetime.now().isoformat(),
-                    "length": len(text)
-                }
-            )
-            
             # 文档切片
-            chunks = self.text_splitter.split_documents([document])
+            chunks = self._text_chunks(text, title, source, category)
             
             # 添加到向量数据库
             if self.vectorstore:
-                self.vectorstore.add_documents(chunks)
-                self.vectorstore.persist()
+                self._add_chunks(chunks)
                 logger.info(f"Added document '{title}' with {len(chunks)} chunks")
                 return True
             else:
@@ -145,43 +549,72 @@ class RAGKnowledgeManager:
             logger.error(f"Failed to add document: {e}")
             return False
     
+    def add_documents_from_texts(self, documents: List[Dict[str, str]], category: str = "research") -> int:
+        """
+        批量导入文本（每项含content、title、source），返回导入的文档数
+        
+        与批量导入文件相同，所有切片一次写入向量库，BM25索引也只保存一次。
+        """
+        if not self.vectorstore:
+            logger.error("Vectorstore not initialized")
+            return 0
+        
+        all_chunks = []
+        for document in documents:
+            all_chunks.extend(self._text_chunks(document["content"], document["title"], document.get("source", "manual"), category))
+        if not all_chunks:
+            return 0
+        
+        try:
+            self._add_chunks(all_chunks)
+            logger.info(f"Bulk added {len(documents)} documents with {len(all_chunks)} chunks")
+            return len(documents)
+        except Exception as e:
+            logger.error(f"Failed to bulk add documents: {e}")
+            return 0
+    
+    def _load_file_chunks(self, file_path: str, title: Optional[str] = None) -> Optional[List[Document]]:
+        """加载并切分单个文件，不支持或不存在时返回None"""
+        file_path = Path(file_path)
+        if not file_path.exists():
+            logger.error(f"File not found: {file_path}")
+            return None
+        
+        # 根据文件类型选择加载器
+        if file_path.suffix.lower() == '.pdf':
+            loader = PyPDFLoader(str(file_path))
+        elif file_path.suffix.lower() in ['.txt', '.md']:
+            loader = TextLoader(str(file_path))
+        else:
+            logger.error(f"Unsupported file type: {file_path.suffix}")
+            return None
+        
+        # 加载文档
+        documents = loader.load()
+        
+        # 更新元数据
+        for doc in documents:
+            doc.metadata.update({
+                "title": title or file_path.stem,
+                "source": str(file_path),
+                "category": "research",
+                "added_at": datetime.now().isoformat()
+            })
+        
+        # 文档切片
+        return self.text_splitter.split_documents(documents)
+    
     def add_document_from_file(self, file_path: str, title: Optional[str] = None) -> bool:
         """从文件添加文档到知识库"""
         try:
-            file_path = Path(file_path)
-            if not file_path.exists():
-                logger.error(f"File not found: {file_path}")
-                return False
-            
-            # 根据文件类型选择加载器
-            if file_path.suffix.lower() == '.pdf':
-                loader = PyPDFLoader(str(file_path))
-            elif file_path.suffix.lower() in ['.txt', '.md']:
-                loader = TextLoader(str(file_path))
-            else:
-                logger.error(f"Unsupported file type: {file_path.suffix}")
+            chunks = self._load_file_chunks(file_path, title)
+            if chunks is None:
                 return False
             
-            # 加载文档
-            documents = loader.load()
-            
-            # 更新元数据
-            for doc in documents:
-                doc.metadata.update({
-                    "title": title or file_path.stem,
-                    "source": str(file_path),
-                    "category": "research",
-                    "added_at": datetime.now().isoformat()
-                })
-            
-            # 文档切片
-            chunks = self.text_splitter.split_documents(documents)
-            
             # 添加到向量数据库
             if self.vectorstore:
-                self.vectorstore.add_documents(chunks)
-                self.vectorstore.persist()
-                logger.info(f"Added file '{file_path.name}' with {len(chunks)} chunks")
+                self._add_chunks(chunks)
+                logger.info(f"Added file '{Path(file_path).name}' with {len(chunks)} chunks")
                 return True
             else:
                 logger.error("Vectorstore not initialized")
@@ -191,29 +624,119 @@ class RAGKnowledgeManager:
             logger.error(f"Failed to add file: {e}")
             return False
     
+    def add_documents_from_files(self, file_paths: List[str]) -> int:
+        """
+        批量导入文件，返回成功导入的文件数
+        
+        所有文件的切片一次性交给向量库，嵌入请求按批次并发发送，
+        而不是逐个文件串行调用API。
+        """
+        if not self.vectorstore:
+            logger.error("Vectorstore not initialized")
+            return 0
+        
+        all_chunks = []
+        loaded = 0
+        for file_path in file_paths:
+            try:
+                chunks = self._load_file_chunks(file_path)
+            except Exception as e:
+                logger.error(f"Failed to load file {file_path}: {e}")
+                continue
+            if chunks:
+                all_chunks.extend(chunks)
+                loaded += 1
+        
+        if not all_chunks:
+            return 0
+        
+        try:
+            self._add_chunks(all_chunks)
+            logger.info(f"Bulk added {loaded} files with {len(all_chunks)} chunks")
+            return loaded
+        except Exception as e:
+            logger.error(f"Failed to bulk add files: {e}")
+            return 0
+    
     def search_knowledge(self, 
                         query: str, 
                         k: int = 5,
-                        score_threshold: float = 0.5) -> List[Dict[str, Any]]:
-        """搜索相关知识"""
+                        score_threshold: float = 0.5,
+                        mode: str = "hybrid",
+                        lexical_skip_coverage: float = 0.8,
+                        min_lexical_coverage: float = 0.5) -> List[Dict[str, Any]]:
+        """
+        搜索相关知识
+        
+        mode为"vector"、"lexical"或"hybrid"（默认）。混合模式先查BM25：
+        最佳词法命中覆盖了查询的绝大部分词项时直接返回，不调用嵌入API；
+        否则与向量检索结果做倒数排名融合(RRF)。
+        
+        各模式返回的score都是距离（越小越相关），与向量库的2 - 2 * 余弦相似度同尺度。
+        """
         try:
             if not self.vectorstore:
                 logger.error("Vectorstore not initialized")
                 return []
             
+            lexical_hits = []
+            if mode in ("lexical", "hybrid"):
+                lexical_hits = [
+                    hit for hit in self.lexical_index.search(query, k=k * 2)
+                    if hit["coverage"] >= min_lexical_coverage
+                ]
+                
+                if mode == "lexical" or (lexical_hits and lexical_hits[0]["coverage"] >= lexical_skip_coverage):
+                    results = [
+                        {
+                            "content": hit["content"],
+                            "metadata": hit["metadata"],
+                            "score": hit["distance"],
+                            "retrieval": "lexical"
+                        }
+                        for hit in lexical_hits[:k]
+                    ]
+                    logger.info(f"Found {len(results)} lexical matches for query: '{query[:50]}...'")
+                    return results
+            
             # 相似度搜索
-            results = self.vectorstore.similarity_search_with_score(query, k=k)
+            results = self.vectorstore.similarity_search_with_score(query, k=k * 2 if mode == "hybrid" else k)
             
             # 过滤低相关性结果
-            filtered_results = []
+            vector_hits = []
             for doc, score in results:
                 if score <= score_threshold:  # Chroma uses distance, lower is better
-                    filtered_results.append({
+                    vector_hits.append({
                         "content": doc.page_content,
                         "metadata": doc.metadata,
-                        "score": score
+                        "score": score,
+                        "retrieval": "vector"
                     })
             
+            if mode == "vector" or not lexical_hits:
+                filtered_results = vector_hits[:k]
+            else:
+                # 以内容为键融合两路排名，同一切片只保留一条
+                # score与其他模式一致取距离（越小越相关），用两路中较小者；排序按RRF
+                candidates = {}
+                distances = [(hit, hit["distance"]) for hit in lexical_hits] + [(hit, hit["score"]) for hit in vector_hits]
+                for hit, distance in distances:
+                    candidate = candidates.setdefault(hit["content"], {
+                        "content": hit["content"],
+                        "metadata": hit["metadata"],
+                        "score": distance
+                    })
+                    candidate["score"] = min(candidate["score"], distance)
+                
+                fused = reciprocal_rank_fusion([
+                    [hit["content"] for hit in lexical_hits],
+                    [hit["content"] for hit in vector_hits]
+                ])
+                filtered_results = [
+                    {**candidates[content], "retrieval": "hybrid"}
+                    for content, _ in fused[:k]
+                ]
+            
             logger.info(f"Found {len(filtered_results)} relevant documents for query: '{query[:50]}...'")
             return filtered_results
             
@@ -227,12 +750,15 @@ class RAGKnowledgeManager:
             if not self.vectorstore:
                 return {"status": "not_initialized", "count": 0}
             
-            count = self.vectorstore._collection.count()
+            count = self._count()
             return {
                 "status": "ready",
                 "total_chunks": count,
+                "vector_backend": self.vector_backend,
                 "collection_name": "fat_loss_research",
-                "embedding_model": "BAAI/bge-m3"
+                "embedding_model": "BAAI/bge-m3",
+                "lexical_chunks": len(self.lexical_index),
+                "embedding_cache": self.embedding_cache.stats()
             }
         except Exception as e:
             logger.error(f"Failed to get stats: {e}")
@@ -243,6 +769,7 @@ class RAGKnowledgeManager:
         try:
             if self.vectorstore:
                 self.vectorstore.delete_collection()
+                self.lexical_index.clear()
                 logger.info("Knowledge base cleared")
                 self._init_vectorstore()  # 重新初始化
                 return True
@@ -250,6 +777,11 @@ class RAGKnowledgeManager:
         except Exception as e:
             logger.error(f"Failed to clear knowledge base: {e}")
             return False
+    
+    async def aclose(self):
+        """释放嵌入连接池和缓存"""
+        await self.embeddings.aclose()
+        self.embedding_cache.close()
 
 
 # 预设的减脂科学知识
@@ -365,17 +897,17 @@ async def setup_default_knowledge(manager: RAGKnowledgeManager):
     """设置默认知识库"""
     logger.info("Setting up default knowledge base...")
     
-    for knowledge in PRESET_KNOWLEDGE:
-        success = manager.add_document_from_text(
-            text=knowledge["content"],
-            title=knowledge["title"],
-            source=knowledge["source"],
-            category="scientific_research"
-        )
-        if success:
-            logger.info(f"Added: {knowledge['title']}")
-        else:
-            logger.error(f"Failed to add: {knowledge['title']}")
+    # 一次批量写入：嵌入请求并发发送，BM25索引只保存一次；
+    # 写入向量库会同步调用嵌入API，放到线程中避免阻塞事件循环
+    added = await asyncio.to_thread(
+        manager.add_documents_from_texts,
+        PRESET_KNOWLEDGE,
+        category="scientific_research"
+    )
+    if added:
+        logger.info(f"Added {added} preset documents")
+    else:
+        logger.error("Failed to add preset documents")
     
     stats = manager.get_knowledge_stats()
     logger.info(f"Knowledge base setup complete: {stats}")
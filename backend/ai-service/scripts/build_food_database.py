@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Build the parser's memory-mapped food database
+
+From the shipped CSV (name, calories, protein, carbs, fat, fiber per 100 g,
+serving_g, density_g_ml, piece_g):
+    python scripts/build_food_database.py --csv data/foods.csv
+
+From a USDA FoodData Central CSV download (food.csv, food_nutrient.csv and
+optionally food_portion.csv and measure_unit.csv in one directory):
+    python scripts/build_food_database.py --usda-dir ~/Downloads/FoodData_Central_csv
+
+The output directory defaults to Settings.food_database_path. The service
+also builds from the shipped CSV on first start, so this is only needed for
+a full USDA import.
+"""
+import argparse
+import csv
+import hashlib
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import get_settings
+from app.services.food_database import DEFAULT_SERVING_G, FoodDatabase
+
+# FoodData Central nutrient ids for NUTRIENT_COLUMNS
+USDA_NUTRIENT_IDS = {
+    "1008": "calories",  # Energy (kcal)
+    "1003": "protein",
+    "1005": "carbs",     # Carbohydrate, by difference
+    "1004": "fat",       # Total lipid
+    "1079": "fiber"      # Fiber, total dietary
+}
+USDA_DATA_TYPES = {"foundation_food", "sr_legacy_food", "survey_fndds_food"}
+US_CUP_ML = 236.6
+# Portion units and modifiers that describe one whole item ("1 medium", "1 piece")
+PIECE_UNIT_NAMES = {"piece", "each", "unit", "item"}
+PIECE_MODIFIERS = ("medium", "piece", "whole", "each", "large", "small")
+
+
+def usda_records(usda_dir: Path):
+    """Join the FoodData Central tables into one record per food"""
+    foods = {}
+    with open(usda_dir / "food.csv", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["data_type"] in USDA_DATA_TYPES:
+                foods[row["fdc_id"]] = {"name": row["description"], "serving_g": DEFAULT_SERVING_G}
+
+    # food_nutrient.csv has tens of millions of rows; stream it
+    with open(usda_dir / "food_nutrient.csv", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            food = foods.get(row["fdc_id"])
+            column = USDA_NUTRIENT_IDS.get(row["nutrient_id"])
+            if food is not None and column and row["amount"]:
+                food[column] = float(row["amount"])
+
+    # Cup portions give each food's density for volume conversions, and
+    # single-item portions its piece weight for counts ("2 eggs")
+    cup_unit_ids, piece_unit_ids = set(), set()
+    unit_path = usda_dir / "measure_unit.csv"
+    if unit_path.exists():
+        with open(unit_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                unit_name = row["name"].strip().lower()
+                if unit_name == "cup":
+                    cup_unit_ids.add(row["id"])
+                elif unit_name in PIECE_UNIT_NAMES:
+                    piece_unit_ids.add(row["id"])
+
+    portion_path = usda_dir / "food_portion.csv"
+    if portion_path.exists():
+        with open(portion_path, newline="", encoding="utf-8") as f:
+            seen = set()
+            for row in csv.DictReader(f):
+                food = foods.get(row["fdc_id"])
+                if food is None or not row.get("gram_weight"):
+                    continue
+                # First listed portion is the common household serving
+                if row["fdc_id"] not in seen:
+                    food["serving_g"] = float(row["gram_weight"])
+                    seen.add(row["fdc_id"])
+                if "density_g_ml" not in food and row.get("measure_unit_id") in cup_unit_ids and float(row.get("amount") or 0) > 0:
+                    food["density_g_ml"] = float(row["gram_weight"]) / (float(row["amount"]) * US_CUP_ML)
+                amount = float(row.get("amount") or 0)
+                is_piece = row.get("measure_unit_id") in piece_unit_ids or (row.get("modifier") or "").strip().lower().startswith(PIECE_MODIFIERS)
+                if "piece_g" not in food and is_piece and amount > 0:
+                    food["piece_g"] = float(row["gram_weight"]) / amount
+
+    return [food for food in foods.values() if "calories" in food]
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV in the shipped data/foods.csv format")
+    source.add_argument("--usda-dir", help="Directory of an extracted FoodData Central CSV download")
+    parser.add_argument("--out", default=settings.food_database_path, help="Output directory")
+    args = parser.parse_args()
+
+    if args.csv:
+        db = FoodDatabase.from_csv(args.csv, args.out)
+    else:
+        usda_dir = Path(args.usda_dir).expanduser()
+        digest = hashlib.sha256((usda_dir / "food.csv").read_bytes()).hexdigest()[:12]
+        db = FoodDatabase.build(usda_records(usda_dir), args.out, source=f"USDA FoodData Central ({usda_dir.name})", version=digest)
+
+    print(f"Wrote {len(db)} foods to {args.out} (version {db.version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -64,6 +64,25 @@ CREATE TABLE IF NOT EXISTS exercise_logs (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Daily Activity Rollups Table
+-- One row per user per (UTC) day, kept current by the triggers below so the
+-- daily summary is a primary-key read instead of a scan of the day's logs
+CREATE TABLE IF NOT EXISTS daily_activity_rollups (
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+    day DATE NOT NULL,
+    total_calories DECIMAL(9,2) NOT NULL DEFAULT 0,
+    total_protein DECIMAL(8,2) NOT NULL DEFAULT 0,
+    total_carbs DECIMAL(8,2) NOT NULL DEFAULT 0,
+    total_fat DECIMAL(8,2) NOT NULL DEFAULT 0,
+    total_fiber DECIMAL(8,2) NOT NULL DEFAULT 0,
+    nutrition_log_count INTEGER NOT NULL DEFAULT 0,
+    total_calories_burned DECIMAL(9,2) NOT NULL DEFAULT 0,
+    total_duration_minutes INTEGER NOT NULL DEFAULT 0,
+    exercise_log_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, day)
+);
+
 -- Indexes for better performance
 CREATE INDEX idx_user_profiles_user_id ON user_profiles(user_id);
 CREATE INDEX idx_weight_history_user_id ON weight_history(user_id);
@@ -78,6 +97,7 @@ ALTER TABLE user_profiles ENABLE ROW LEVEL SECURITY;
 ALTER TABLE weight_history ENABLE ROW LEVEL SECURITY;
 ALTER TABLE nutrition_logs ENABLE ROW LEVEL SECURITY;
 ALTER TABLE exercise_logs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE daily_activity_rollups ENABLE ROW LEVEL SECURITY;
 
 -- User Profiles RLS
 CREATE POLICY "Users can view own profile" ON user_profiles
@@ -122,6 +142,10 @@ CREATE POLICY "Users can update own exercise logs" ON exercise_logs
 CREATE POLICY "Users can delete own exercise logs" ON exercise_logs
     FOR DELETE USING (auth.uid() = user_id);
 
+-- Daily Activity Rollups RLS (written only by the rollup triggers)
+CREATE POLICY "Users can view own daily rollups" ON daily_activity_rollups
+    FOR SELECT USING (auth.uid() = user_id);
+
 -- Trigger to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -132,4 +156,147 @@ END;
 $$ language 'plpgsql';
 
 CREATE TRIGGER update_user_profiles_updated_at BEFORE UPDATE
-    ON user_profiles FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+    ON user_profiles FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Daily rollup maintenance
+-- Adds a (possibly negative) delta to one user-day, creating the row on first use
+CREATE OR REPLACE FUNCTION bump_daily_rollup(
+    p_user_id UUID, p_day DATE,
+    p_calories DECIMAL, p_protein DECIMAL, p_carbs DECIMAL, p_fat DECIMAL, p_fiber DECIMAL, p_nutrition_logs INTEGER,
+    p_calories_burned DECIMAL, p_duration_minutes INTEGER, p_exercise_logs INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO daily_activity_rollups AS r (
+        user_id, day, total_calories, total_protein, total_carbs, total_fat, total_fiber, nutrition_log_count,
+        total_calories_burned, total_duration_minutes, exercise_log_count
+    )
+    VALUES (
+        p_user_id, p_day, p_calories, p_protein, p_carbs, p_fat, p_fiber, p_nutrition_logs,
+        p_calories_burned, p_duration_minutes, p_exercise_logs
+    )
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        total_calories = r.total_calories + EXCLUDED.total_calories,
+        total_protein = r.total_protein + EXCLUDED.total_protein,
+        total_carbs = r.total_carbs + EXCLUDED.total_carbs,
+        total_fat = r.total_fat + EXCLUDED.total_fat,
+        total_fiber = r.total_fiber + EXCLUDED.total_fiber,
+        nutrition_log_count = r.nutrition_log_count + EXCLUDED.nutrition_log_count,
+        total_calories_burned = r.total_calories_burned + EXCLUDED.total_calories_burned,
+        total_duration_minutes = r.total_duration_minutes + EXCLUDED.total_duration_minutes,
+        exercise_log_count = r.exercise_log_count + EXCLUDED.exercise_log_count,
+        updated_at = NOW();
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Only the triggers may write rollups; keep the helper out of the public RPC API
+REVOKE EXECUTE ON FUNCTION bump_daily_rollup(UUID, DATE, DECIMAL, DECIMAL, DECIMAL, DECIMAL, DECIMAL, INTEGER, DECIMAL, INTEGER, INTEGER)
+    FROM PUBLIC, anon, authenticated;
+
+-- Statement-level triggers: a bulk insert of N logs costs one upsert per
+-- user-day it touches, not N. Updates subtract the old rows and add the new
+-- ones, which also handles a log moving to another day.
+CREATE OR REPLACE FUNCTION rollup_nutrition_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_daily_rollup(user_id, day, -calories, -protein, -carbs, -fat, -fiber, -entries, 0, 0, 0)
+        FROM (
+            SELECT user_id, (logged_at AT TIME ZONE 'UTC')::date AS day,
+                   SUM(calories) AS calories, COALESCE(SUM(protein), 0) AS protein, COALESCE(SUM(carbs), 0) AS carbs,
+                   COALESCE(SUM(fat), 0) AS fat, COALESCE(SUM(fiber), 0) AS fiber, COUNT(*)::integer AS entries
+            FROM old_logs GROUP BY 1, 2
+        ) AS delta;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_daily_rollup(user_id, day, calories, protein, carbs, fat, fiber, entries, 0, 0, 0)
+        FROM (
+            SELECT user_id, (logged_at AT TIME ZONE 'UTC')::date AS day,
+                   SUM(calories) AS calories, COALESCE(SUM(protein), 0) AS protein, COALESCE(SUM(carbs), 0) AS carbs,
+                   COALESCE(SUM(fat), 0) AS fat, COALESCE(SUM(fiber), 0) AS fiber, COUNT(*)::integer AS entries
+            FROM new_logs GROUP BY 1, 2
+        ) AS delta;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION rollup_exercise_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_daily_rollup(user_id, day, 0, 0, 0, 0, 0, 0, -calories_burned, -duration_minutes, -entries)
+        FROM (
+            SELECT user_id, (logged_at AT TIME ZONE 'UTC')::date AS day,
+                   COALESCE(SUM(calories_burned), 0) AS calories_burned,
+                   COALESCE(SUM(duration_minutes), 0)::integer AS duration_minutes, COUNT(*)::integer AS entries
+            FROM old_logs GROUP BY 1, 2
+        ) AS delta;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_daily_rollup(user_id, day, 0, 0, 0, 0, 0, 0, calories_burned, duration_minutes, entries)
+        FROM (
+            SELECT user_id, (logged_at AT TIME ZONE 'UTC')::date AS day,
+                   COALESCE(SUM(calories_burned), 0) AS calories_burned,
+                   COALESCE(SUM(duration_minutes), 0)::integer AS duration_minutes, COUNT(*)::integer AS entries
+            FROM new_logs GROUP BY 1, 2
+        ) AS delta;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Transition tables allow one event per trigger
+CREATE TRIGGER rollup_nutrition_logs_insert AFTER INSERT
+    ON nutrition_logs REFERENCING NEW TABLE AS new_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_nutrition_logs();
+
+CREATE TRIGGER rollup_nutrition_logs_update AFTER UPDATE
+    ON nutrition_logs REFERENCING OLD TABLE AS old_logs NEW TABLE AS new_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_nutrition_logs();
+
+CREATE TRIGGER rollup_nutrition_logs_delete AFTER DELETE
+    ON nutrition_logs REFERENCING OLD TABLE AS old_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_nutrition_logs();
+
+CREATE TRIGGER rollup_exercise_logs_insert AFTER INSERT
+    ON exercise_logs REFERENCING NEW TABLE AS new_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_exercise_logs();
+
+CREATE TRIGGER rollup_exercise_logs_update AFTER UPDATE
+    ON exercise_logs REFERENCING OLD TABLE AS old_logs NEW TABLE AS new_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_exercise_logs();
+
+CREATE TRIGGER rollup_exercise_logs_delete AFTER DELETE
+    ON exercise_logs REFERENCING OLD TABLE AS old_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_exercise_logs();
+
+-- Backfill rollups from logs written before the triggers existed (safe to re-run)
+INSERT INTO daily_activity_rollups (
+    user_id, day, total_calories, total_protein, total_carbs, total_fat, total_fiber, nutrition_log_count,
+    total_calories_burned, total_duration_minutes, exercise_log_count
+)
+SELECT user_id, day, SUM(calories), SUM(protein), SUM(carbs), SUM(fat), SUM(fiber), SUM(nutrition_logs),
+       SUM(calories_burned), SUM(duration_minutes), SUM(exercise_logs)
+FROM (
+    SELECT user_id, (logged_at AT TIME ZONE 'UTC')::date AS day, calories,
+           COALESCE(protein, 0) AS protein, COALESCE(carbs, 0) AS carbs, COALESCE(fat, 0) AS fat,
+           COALESCE(fiber, 0) AS fiber, 1 AS nutrition_logs, 0 AS calories_burned, 0 AS duration_minutes, 0 AS exercise_logs
+    FROM nutrition_logs
+    UNION ALL
+    SELECT user_id, (logged_at AT TIME ZONE 'UTC')::date, 0, 0, 0, 0, 0, 0,
+           COALESCE(calories_burned, 0), COALESCE(duration_minutes, 0), 1
+    FROM exercise_logs
+) AS logs
+GROUP BY user_id, day
+ON CONFLICT (user_id, day) DO UPDATE SET
+    total_calories = EXCLUDED.total_calories,
+    total_protein = EXCLUDED.total_protein,
+    total_carbs = EXCLUDED.total_carbs,
+    total_fat = EXCLUDED.total_fat,
+    total_fiber = EXCLUDED.total_fiber,
+    nutrition_log_count = EXCLUDED.nutrition_log_count,
+    total_calories_burned = EXCLUDED.total_calories_burned,
+    total_duration_minutes = EXCLUDED.total_duration_minutes,
+    exercise_log_count = EXCLUDED.exercise_log_count,
+    updated_at = NOW();
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Behaviour tests for per-owner conversation history
+
+Run with: python -m pytest test_conversation_store.py
+"""
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.conversation_store import ConversationStore
+
+
+def test_turns_are_kept_per_owner():
+    store = ConversationStore()
+    assert store.add_turn("c1", "hi", "hello", owner="alice")
+    assert store.get_history("c1", owner="alice") == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+    assert store.get_history("c1", owner="bob") == []
+
+
+def test_another_owner_cannot_overwrite_a_conversation():
+    store = ConversationStore()
+    store.add_turn("c1", "hi", "hello", owner="alice")
+    assert not store.add_turn("c1", "mine now", "ok", owner="bob")
+    assert [message["content"] for message in store.get_history("c1", owner="alice")] == ["hi", "hello"]
+
+
+def test_spilled_conversations_keep_their_owner(tmp_path):
+    store = ConversationStore(max_conversations=1, spill_dir=str(tmp_path))
+    store.add_turn("c1", "hi", "hello", owner="alice")
+    store.add_turn("c2", "hey", "hi there", owner="bob")  # Evicts c1 to disk
+    assert not store.add_turn("c1", "mine now", "ok", owner="bob")
+    assert [message["content"] for message in store.get_history("c1", owner="alice")] == ["hi", "hello"]
+
+
+def test_history_is_trimmed_to_max_messages():
+    store = ConversationStore(max_messages=4)
+    for turn in range(5):
+        store.add_turn("c1", f"q{turn}", f"a{turn}", owner="alice")
+    assert [message["content"] for message in store.get_history("c1", owner="alice")] == ["q3", "a3", "q4", "a4"]
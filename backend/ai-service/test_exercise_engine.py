@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Behaviour tests for MET lookups and exercise energy
+
+Run with: python -m pytest test_exercise_engine.py
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.exercise_engine import ExerciseEngine, intensity_for_met
+
+COMPENDIUM = Path(__file__).parent / "data" / "met_compendium.csv"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return ExerciseEngine({
+        "running": {"low": 7.0, "moderate": 9.8, "high": 11.8, "very_high": 14.5},
+        "yoga": {"low": 2.5},
+        "rowing": {"low": 4.8, "high": 8.5},
+    })
+
+
+def test_listed_levels(engine):
+    assert engine.met("running", "low") == 7.0
+    assert engine.met("running") == 9.8
+
+
+def test_missing_levels_take_the_nearest_listed_level(engine):
+    assert [engine.met("yoga", level) for level in ("low", "moderate", "high", "very_high")] == [2.5] * 4
+    # moderate is equally close to low and high; ties go to the lower level
+    assert engine.met("rowing", "moderate") == 4.8
+    assert engine.met("rowing", "very_high") == 8.5
+
+
+def test_mets_is_a_vectorized_met(engine):
+    activities = ["running", "yoga", "rowing"]
+    intensities = ["high", "moderate", "low"]
+    assert engine.mets(activities, intensities).tolist() == [engine.met(a, i) for a, i in zip(activities, intensities)]
+
+
+def test_calories_are_met_kg_hours():
+    calories = ExerciseEngine.calories(np.array([9.8, 3.8]), np.array([70.0, 80.0]), np.array([30.0, 15.0]))
+    assert calories.tolist() == pytest.approx([9.8 * 70 * 0.5, 3.8 * 80 * 0.25])
+
+
+@pytest.mark.parametrize("met, level", [(2.0, "low"), (3.0, "moderate"), (5.9, "moderate"), (6.0, "high"), (9.0, "very_high")])
+def test_intensity_for_met(met, level):
+    assert intensity_for_met(met) == level
+
+
+def test_shipped_compendium_is_complete():
+    engine = ExerciseEngine.from_csv(str(COMPENDIUM))
+    assert "running" in engine and "push-ups" in engine
+    assert not np.isnan(engine.met_table).any()
+    # Each activity gets harder (or stays the same) with intensity
+    assert (np.diff(engine.met_table, axis=1) >= 0).all()
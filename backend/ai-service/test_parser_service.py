@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Behaviour tests for the parser's mention cache and LLM escalation
+
+A fake chat model stands in for the LLM, so no API key or network is used.
+Run with: python -m pytest test_parser_service.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+HERE = Path(__file__).parent
+# Absolute data paths, and a scratch database, before the settings are first read
+os.environ.setdefault("FOOD_DATABASE_CSV", str(HERE / "data" / "foods.csv"))
+os.environ.setdefault("FOOD_ALIASES_CSV", str(HERE / "data" / "food_aliases.csv"))
+os.environ.setdefault("MET_COMPENDIUM_CSV", str(HERE / "data" / "met_compendium.csv"))
+os.environ.setdefault("EXERCISE_ALIASES_CSV", str(HERE / "data" / "exercise_aliases.csv"))
+os.environ.setdefault("FOOD_DATABASE_PATH", str(Path(tempfile.mkdtemp()) / "food_db"))
+
+# Add the parent directory to the path
+sys.path.insert(0, str(HERE))
+
+from app.services.food_database import FoodDatabase
+from app.services.llm_extractor import LLMExtractor
+from app.services.parser_service import ParserService
+
+UNREADABLE = "zzqx blorp with a side of vrumf"
+EGGS_REPLY = {"foods": [{"name": "egg", "quantity": 2, "unit": "piece", "calories": 143, "protein": 12.6, "carbs": 0.7, "fat": 9.5, "fiber": 0}]}
+UNKNOWN_FOOD_REPLY = {"foods": [{"name": "vrumf cake", "quantity": 1, "unit": "serving", "calories": 320, "protein": 4, "carbs": 40, "fat": 15, "fiber": 1}]}
+KAYAK_REPLY = {"exercises": [{"name": "sea kayaking", "duration_minutes": 60, "met": 5.0, "intensity": "moderate"}]}
+
+
+class FakeLLM:
+    """Answers every extraction with a canned reply and counts the calls"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    async def agenerate(self, batches):
+        self.calls += 1
+        text = self.reply if isinstance(self.reply, str) else json.dumps(self.reply)
+        return SimpleNamespace(generations=[[SimpleNamespace(text=text)]])
+
+
+def make_parser(reply):
+    parser = ParserService()
+    llm = FakeLLM(reply)
+    parser.llm_extractor = LLMExtractor(llm=llm)
+    return parser, llm
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_rule_parse_is_cached_by_normalized_text():
+    parser, llm = make_parser(EGGS_REPLY)
+    first = run(parser.parse_food_description("2 eggs and 1 cup of milk"))
+    second = run(parser.parse_food_description("  2 Eggs and 1 cup of milk. "))
+    assert [food.name for food in first] == ["Egg", "Milk"]
+    assert [food.model_dump() for food in second] == [food.model_dump() for food in first]
+    assert parser.food_parse_cache.stats()["hits"] == 1
+    assert llm.calls == 0
+
+
+def test_unreadable_text_escalates_once_and_is_cached():
+    parser, llm = make_parser(EGGS_REPLY)
+    foods = run(parser.parse_food_description(UNREADABLE, user_id="user"))
+    assert [(food.name, food.calories) for food in foods] == [("Egg", 143.0)]
+    run(parser.parse_food_description(UNREADABLE, user_id="user"))
+    assert llm.calls == 1
+    assert parser.escalations == 1
+
+
+def test_repeated_text_in_one_batch_escalates_once():
+    parser, llm = make_parser(EGGS_REPLY)
+    foods, totals = run(parser.parse_food_batch([UNREADABLE, UNREADABLE, UNREADABLE.upper()], user_id="user"))
+    assert llm.calls == 1
+    assert [len(entry) for entry in foods] == [1, 1, 1]
+    assert totals[:, 0].tolist() == [143.0, 143.0, 143.0]
+
+
+def test_foods_outside_the_database_use_the_model_estimate():
+    parser, _ = make_parser(UNKNOWN_FOOD_REPLY)
+    [food] = run(parser.parse_food_description(UNREADABLE))
+    assert (food.name, food.calories, food.fat) == ("Vrumf Cake", 320.0, 15.0)
+    assert food.confidence < 0.6
+
+
+def test_failed_escalation_is_not_cached():
+    parser, llm = make_parser("not json at all")
+    assert run(parser.parse_food_description(UNREADABLE)) == []
+    run(parser.parse_food_description(UNREADABLE))
+    assert llm.calls == 2
+    assert parser.llm_extractor.failures == 2
+
+
+def test_exercise_escalation_prices_the_model_met():
+    parser, llm = make_parser(KAYAK_REPLY)
+    [exercise] = run(parser.parse_exercise_description("an hour of blorping on the sea", user_weight=80))
+    assert exercise.calories_burned == pytest.approx(5.0 * 80 * 1.0)
+    # Cached mentions are re-priced for another body weight without a new call
+    [lighter] = run(parser.parse_exercise_description("an hour of blorping on the sea", user_weight=60))
+    assert lighter.calories_burned == pytest.approx(5.0 * 60 * 1.0)
+    assert llm.calls == 1
+
+
+@pytest.mark.parametrize("text, name, reps, duration", [
+    ("ran for 30 minutes", "Running", None, 30),
+    ("did twenty push-ups", "Push-Ups", 20, None),
+    ("俯卧撑二十个", "Push-Ups", 20, None),
+    ("慢跑三十分钟", "Running", None, 30),
+])
+def test_exercise_rules(text, name, reps, duration):
+    parser, llm = make_parser(KAYAK_REPLY)
+    [exercise] = run(parser.parse_exercise_description(text))
+    assert (exercise.name, exercise.repetitions, exercise.duration) == (name, reps, duration)
+    assert llm.calls == 0
+
+
+@pytest.mark.parametrize("text, name, calories", [
+    ("10 almonds", "Almonds", 69.5),
+    ("二两米饭", "White Rice", 130.0),
+    ("三两牛肉", "Beef", 375.0),
+    ("米饭一碗", "White Rice", 217.8),
+])
+def test_food_rules(text, name, calories):
+    parser, llm = make_parser(EGGS_REPLY)
+    [food] = run(parser.parse_food_description(text))
+    assert (food.name, food.calories) == (name, calories)
+    assert llm.calls == 0
+
+
+def test_rebuilt_food_database_is_picked_up(tmp_path):
+    parser, _ = make_parser(EGGS_REPLY)
+    [before] = run(parser.parse_food_description("10 almonds"))
+    shipped = Path(os.environ["FOOD_DATABASE_CSV"])
+    rows = shipped.read_text(encoding="utf-8").splitlines()
+    header = rows[0].split(",")
+    calories = header.index("calories")
+    for index, line in enumerate(rows):
+        fields = line.split(",")
+        if fields[0] == "almonds":
+            fields[calories] = str(float(fields[calories]) * 2)
+            rows[index] = ",".join(fields)
+    doubled = tmp_path / "foods.csv"
+    doubled.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    try:
+        FoodDatabase.from_csv(str(doubled), str(parser.food_db.path))
+        [after] = run(parser.parse_food_description("10 almonds"))
+        assert after.calories == pytest.approx(before.calories * 2, abs=0.1)
+    finally:
+        FoodDatabase.from_csv(str(shipped), str(parser.food_db.path))
+
+
+@pytest.mark.parametrize("text, quantity", [
+    ("2 eggs", "2 piece(s)"),
+    ("两个鸡蛋", "2 piece(s)"),
+    ("an egg for breakfast", "1 piece(s)"),
+    ("rice for lunch", "1 serving(s)"),
+    ("2 cups of milk", "2 cup(s)"),
+])
+def test_quantities_read_the_same_in_any_language(text, quantity):
+    parser, _ = make_parser(EGGS_REPLY)
+    [food] = run(parser.parse_food_description(text))
+    assert food.quantity == quantity
+
+
+def test_name_index_is_built_once_and_loaded_from_the_database_directory():
+    first, _ = make_parser(EGGS_REPLY)
+    run(first.parse_food_description("2 eggs"))
+    path = first._food_name_index_path()
+    assert path.exists()
+    second, _ = make_parser(EGGS_REPLY)
+    assert second.food_matcher.get("egg") == first.food_matcher.get("egg") is not None
+    assert [word.key for word in second.zh_segmenter.segment("两个鸡蛋").words] == ["鸡蛋"]
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Behaviour tests for quantity scanning and gram conversion
+
+Run with: python -m pytest test_quantity_parsing.py
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.food_database import FoodDatabase
+from app.services.quantity_engine import QuantityEngine
+from app.services.quantity_scanner import attach_quantities, parse_number, scan_numbers
+from app.services.text_matcher import AhoCorasickMatcher
+
+FOODS = [
+    {"name": "almonds", "calories": 579, "serving_g": 28, "density_g_ml": 0.6, "piece_g": 1.2},
+    {"name": "egg", "calories": 143, "serving_g": 100, "density_g_ml": 1.03, "piece_g": 50},
+    {"name": "milk", "calories": 61, "serving_g": 244, "density_g_ml": 1.03},
+    {"name": "apple", "calories": 52, "serving_g": 182, "density_g_ml": 0.6, "piece_g": 182},
+    {"name": "rice", "calories": 130, "serving_g": 158, "density_g_ml": 0.67},
+]
+
+
+@pytest.fixture(scope="module")
+def food_db(tmp_path_factory):
+    return FoodDatabase.build(FOODS, str(tmp_path_factory.mktemp("food_db") / "db"))
+
+
+@pytest.fixture(scope="module")
+def engine(food_db):
+    return QuantityEngine(food_db)
+
+
+@pytest.mark.parametrize("text, raw, value, unit", [
+    ("200 g chicken", "200", 200, "g"),
+    ("2.5kg", "2.5", 2.5, "kg"),
+    ("1/2 cup", "0.5", 0.5, "cup"),
+    ("1 1/2 cups", "1.5", 1.5, "cup"),
+    ("two eggs", "2", 2, None),
+    ("half a banana", "0.5", 0.5, None),
+    ("half a cup of milk", "0.5", 0.5, "cup"),
+    ("a cup of milk", "1", 1, "cup"),
+    ("a dozen eggs", "12", 12, None),
+    ("3两", "3", 3, "liang"),
+    ("30 mins", "30", 30, "min"),
+])
+def test_scan_numbers(text, raw, value, unit):
+    [number] = scan_numbers(text)
+    assert (number.raw, number.value, number.unit) == (raw, value, unit)
+
+
+@pytest.mark.parametrize("text", ["ate a hamburger", "ran for a while", "someone"])
+def test_articles_and_words_without_quantities(text):
+    assert scan_numbers(text) == []
+
+
+def test_for_marks_durations():
+    [number] = scan_numbers("ran for thirty minutes")
+    assert number.after_for and number.value == 30 and number.unit == "min"
+
+
+@pytest.mark.parametrize("raw, value", [("2", 2), ("0.25", 0.25), ("3/4", 0.75), ("2 1/2", 2.5), ("quarter", 0.25), ("an", 1)])
+def test_parse_number(raw, value):
+    assert parse_number(raw) == value
+
+
+def test_attach_quantities_keeps_clauses_apart():
+    text = "ran for 30 minutes and did 20 push-ups"
+    matcher = AhoCorasickMatcher({"ran": "running", "push-ups": "push-ups"})
+    scanned = attach_quantities(text, matcher.find_all(text))
+    assert [(item.mention.value, item.number.value, item.number.unit) for item in scanned] == [
+        ("running", 30, "min"),
+        ("push-ups", 20, None),
+    ]
+
+
+def test_attach_quantities_leading_number_wins():
+    text = "2 slices of bread and half a banana"
+    matcher = AhoCorasickMatcher({"bread": "bread", "banana": "banana"})
+    scanned = attach_quantities(text, matcher.find_all(text))
+    assert [(item.number.value, item.number.unit) for item in scanned] == [(2, "slice"), (0.5, None)]
+
+
+@pytest.mark.parametrize("food, value, unit, grams", [
+    # Counts use the piece weight, not the serving
+    ("almonds", 10, None, 12.0),
+    ("almonds", 3, "piece", 3.6),
+    ("almonds", 1, "serving", 28.0),
+    ("egg", 2, None, 100.0),
+    ("egg", 0.5, None, 25.0),
+    # Foods without a piece weight count in servings
+    ("rice", 2, None, 316.0),
+    # A piece that is also the serving still counts by the piece
+    ("apple", 2, None, 364.0),
+    # Mass units are independent of the food
+    ("rice", 200, "g", 200.0),
+    ("rice", 2, "liang", 100.0),
+    ("rice", 1, "jin", 500.0),
+    # Volume units scale by density
+    ("milk", 1, "cup", 240 * 1.03),
+    ("rice", 1, "bowl", 250 * 0.67),
+])
+def test_grams(food_db, engine, food, value, unit, grams):
+    assert engine.grams(food_db.lookup(food), value, unit) == pytest.approx(grams, rel=1e-4)
+
+
+def test_grams_batch_matches_grams(food_db, engine):
+    cases = [("almonds", 10, None), ("milk", 2, "cup"), ("egg", 3, "piece"), ("rice", 150, "g")]
+    rows = [food_db.lookup(food) for food, _, _ in cases]
+    expected = [engine.grams(row, value, unit) for row, (_, value, unit) in zip(rows, cases)]
+    batch = engine.grams_batch(rows, [value for _, value, _ in cases], [unit for _, _, unit in cases])
+    assert batch.tolist() == pytest.approx(expected)
+
+
+def test_ten_almonds_is_a_handful(food_db, engine):
+    row = food_db.lookup("almonds")
+    calories = food_db.nutrients(row)[0] * engine.grams(row, 10, None) / 100
+    assert calories == pytest.approx(69.5, abs=0.5)
+
+
+def test_describe(food_db, engine):
+    assert engine.describe("10", None, food_db.lookup("almonds")) == "10 piece(s)"
+    assert engine.describe("2", None, food_db.lookup("rice")) == "2 serving(s)"
+    assert engine.describe("2", None, food_db.lookup("apple")) == "2 piece(s)"
+    assert engine.describe("200", "g") == "200 g"
+    assert engine.describe("2", "glass") == "2 glass(es)"
+    assert not engine.is_food_unit("min")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Behaviour tests for the Chinese segmenter and numeral parsing
+
+Run with: python -m pytest test_zh_segmenter.py
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.quantity_scanner import scan_numbers
+from app.services.zh_segmenter import ZhSegmenter, parse_zh_number
+
+LEXICON = {"米饭": "rice", "鸡蛋": "egg", "牛肉": "beef", "三明治": "sandwich", "俯卧撑": "push-ups", "慢跑": "running"}
+segmenter = ZhSegmenter(LEXICON)
+
+
+def quantities(text):
+    """(value, unit) of every quantity, Chinese numerals from the segmenter and Arabic ones from the scanner"""
+    numbers = segmenter.segment(text).numbers + scan_numbers(text)
+    return sorted((number.start, number.value, number.unit) for number in numbers)
+
+
+@pytest.mark.parametrize("numeral, value", [
+    ("三", 3), ("十", 10), ("十二", 12), ("二十", 20), ("一百十", 110),
+    ("两百五十", 250), ("两", 2), ("半", 0.5), ("一万二千", 12000)
+])
+def test_parse_zh_number(numeral, value):
+    assert parse_zh_number(numeral) == value
+
+
+@pytest.mark.parametrize("text", ["一两", "三两", "鸡蛋"])
+def test_parse_zh_number_rejects_non_numerals(text):
+    assert parse_zh_number(text) is None
+
+
+@pytest.mark.parametrize("text, value, unit", [
+    # 两 is the liang unit after a numeral, and 2 only when it starts one
+    ("2两米饭", 2, "liang"),
+    ("一两米饭", 1, "liang"),
+    ("二两米饭", 2, "liang"),
+    ("三两牛肉", 3, "liang"),
+    ("两个鸡蛋", 2, "piece"),
+    ("两鸡蛋", 2, None),
+    ("一个半鸡蛋", 1.5, "piece"),
+    ("200克牛肉", 200, "g"),
+    # Measure words at the very end of the text
+    ("米饭一碗", 1, "bowl"),
+    ("鸡蛋两个", 2, "piece"),
+    ("俯卧撑二十个", 20, "piece"),
+    ("慢跑三十分钟", 30, "min"),
+])
+def test_quantities(text, value, unit):
+    assert [(found_value, found_unit) for _, found_value, found_unit in quantities(text)] == [(value, unit)]
+
+
+def test_measure_word_token_ends_inside_text():
+    for text in ("米饭一碗", "鸡蛋两个", "俯卧撑二十个"):
+        assert all(number.end <= len(text) for number in segmenter.segment(text).numbers)
+
+
+def test_lexicon_word_beats_numeral():
+    words = segmenter.segment("三明治").words
+    assert [(word.key, word.value) for word in words] == [("三明治", "sandwich")]
+    assert segmenter.segment("三明治").numbers == []
+
+
+def test_words_are_found_around_numbers():
+    keys = [word.key for word in segmenter.segment("两个鸡蛋和一碗米饭").words]
+    assert keys == ["鸡蛋", "米饭"]